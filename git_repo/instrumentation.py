@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+
+'''
+Instrumentation of the commands, for `--stats` and `--profile`
+
+When enabled, a `Stats` collector records the HTTP requests of the services,
+the git commands run through git-python and the time spent importing, setting up
+the service and running the action. It can print a summary of it on stderr, and
+write it as a JSON trace. When it is not enabled, nothing is hooked anywhere.
+
+Independently, the `GIT_REPO_PROFILE` environment variable runs the command
+within a Python profiler, see `profile()`.
+'''
+
+import logging
+log = logging.getLogger('git_repo.instrumentation')
+
+import os
+import re
+import sys
+import json
+import time
+import threading
+
+from collections import OrderedDict
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+from .services.ratelimit import RateLimiter
+
+# the import phase starts with the import of this module, that the runner does before any other
+started = time.perf_counter()
+
+'''collector of the running command, None when the instrumentation is disabled'''
+collector = None
+
+# (pattern, replacement) making endpoints out of the paths of the APIs, the
+# identifiers of users, repositories and objects being replaced by placeholders
+ENDPOINT_RULES = [(re.compile(pattern), replacement) for pattern, replacement in (
+    (r'/(repos|repositories)/[^/]+/[^/]+', r'/\1/{owner}/{repo}'),
+    (r'/(users|orgs|groups|teams|org)/[^/]+', r'/\1/{name}'),
+    (r'/(projects|gists|snippets)/[^/]+', r'/\1/{id}'),
+    (r'/\d+(?=/|$)', r'/{id}'),
+    (r'/[0-9a-f]{40}(?=/|$)', r'/{sha}'),
+)]
+
+
+def endpoint(method, url):
+    '''Name of the endpoint of the API that is requested, like `GET api.github.com/users/{name}/repos`'''
+    url = urlsplit(url)
+    path = url.path.rstrip('/') or '/'
+    for pattern, replacement in ENDPOINT_RULES:
+        path = pattern.sub(replacement, path)
+    return '{} {}{}'.format(method, url.netloc, path)
+
+
+def git_command(command):
+    '''Name of the git command run by a git-python command line'''
+    if isinstance(command, str):
+        command = command.split()
+    words = iter(command[1:])
+    for word in words:
+        if word == '-c':
+            next(words, None)
+        elif not word.startswith('-'):
+            return 'git {}'.format(word)
+    return 'git'
+
+
+class Stats:
+    '''Collector of the HTTP requests, git commands and phases of a command'''
+
+    def __init__(self):
+        self.created = time.perf_counter()
+        # where to print a summary and to write a trace, set by the options
+        self.summary = False
+        self.trace_path = None
+        self.phases = OrderedDict([('import', self.created - started)])
+        self.http = []
+        self.git = []
+        self.rate_limit = {}
+        self._processes = {}
+        self._lock = threading.Lock()
+        self._git_hooks = None
+
+    '''Recording'''
+
+    def record_http(self, method, url, status, size, duration, headers):
+        '''Records a request that has been answered'''
+        remaining = next((headers[name] for name, _ in RateLimiter.headers if name in headers), None)
+        with self._lock:
+            self.http.append(OrderedDict([
+                ('endpoint', endpoint(method, url)),
+                ('url', url),
+                ('status', status),
+                ('bytes', size),
+                ('time', duration),
+                ('at', time.perf_counter() - self.created - duration),
+            ]))
+            if remaining is not None:
+                self.rate_limit[urlsplit(url).netloc] = int(remaining)
+
+    def on_response(self, response, *args, **kwarg):
+        '''Response hook of `requests` sessions'''
+        size = response.headers.get('Content-Length')
+        if size is None and not kwarg.get('stream'):
+            size = len(response.content)
+        self.record_http(response.request.method, response.url, response.status_code,
+                         int(size or 0), response.elapsed.total_seconds(), response.headers)
+        return response
+
+    def install(self, session):
+        '''Registers the collector on a `requests` session, once'''
+        if self.on_response not in session.hooks['response']:
+            session.hooks['response'].append(self.on_response)
+        return session
+
+    def record_git(self, command, start):
+        duration = time.perf_counter() - start
+        with self._lock:
+            self.git.append(OrderedDict([
+                ('command', git_command(command)),
+                ('args', [str(arg) for arg in command]),
+                ('time', duration),
+                ('at', start - self.created),
+            ]))
+
+    def install_git(self):
+        '''Times the git commands run by git-python, until `uninstall_git()`'''
+        from git import Git
+        if self._git_hooks:
+            return
+        execute, wait = Git.execute, Git.AutoInterrupt.wait
+        stats = self
+
+        def timed_execute(git, command, *args, **kwarg):
+            start = time.perf_counter()
+            try:
+                process = execute(git, command, *args, **kwarg)
+            except Exception:
+                stats.record_git(command, start)
+                raise
+            if kwarg.get('as_process'):
+                # the command runs until the process is waited for
+                with stats._lock:
+                    stats._processes[id(process)] = (command, start)
+            else:
+                stats.record_git(command, start)
+            return process
+
+        def timed_wait(process, *args, **kwarg):
+            try:
+                return wait(process, *args, **kwarg)
+            finally:
+                with stats._lock:
+                    command, start = stats._processes.pop(id(process), (None, None))
+                if command is not None:
+                    stats.record_git(command, start)
+
+        Git.execute, Git.AutoInterrupt.wait = timed_execute, timed_wait
+        self._git_hooks = execute, wait
+
+    def uninstall_git(self):
+        from git import Git
+        if self._git_hooks:
+            Git.execute, Git.AutoInterrupt.wait = self._git_hooks
+            self._git_hooks = None
+
+    @contextmanager
+    def phase(self, name):
+        '''Adds the time spent within the block to the given phase'''
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0) + time.perf_counter() - start
+
+    '''Reporting'''
+
+    def finish(self):
+        '''Closes the phases: the action is all the time the instrumentation ran outside of the others'''
+        elapsed = time.perf_counter() - self.created
+        self.phases['action'] = elapsed - sum(duration for name, duration in self.phases.items()
+                                              if name not in ('import', 'action'))
+        self.phases['total'] = self.phases['import'] + elapsed
+
+    def endpoints(self):
+        '''(endpoint, count, bytes, time) of the HTTP requests, by endpoint'''
+        totals = OrderedDict()
+        for request in self.http:
+            count, size, duration = totals.get(request['endpoint'], (0, 0, 0))
+            totals[request['endpoint']] = count + 1, size + request['bytes'], duration + request['time']
+        return [(name,) + total for name, total in sorted(totals.items(), key=lambda item: -item[1][2])]
+
+    def commands(self):
+        '''(command, count, time) of the git commands, by command'''
+        totals = OrderedDict()
+        for command in self.git:
+            count, duration = totals.get(command['command'], (0, 0))
+            totals[command['command']] = count + 1, duration + command['time']
+        return [(name,) + total for name, total in sorted(totals.items(), key=lambda item: -item[1][1])]
+
+    def format_summary(self):
+        '''Lines of the summary printed by `--stats`'''
+        lines = []
+        endpoints = self.endpoints()
+        if endpoints:
+            width = max(len(name) for name, *_ in endpoints)
+            lines.append('{:<{}}  {:>8}  {:>12}  {:>9}'.format('HTTP requests', width, 'Count', 'Bytes', 'Time'))
+            for name, count, size, duration in endpoints:
+                lines.append('{:<{}}  {:>8}  {:>12}  {:>8.3f}s'.format(name, width, count, size, duration))
+            lines.append('{:<{}}  {:>8}  {:>12}  {:>8.3f}s'.format(
+                'Total', width, len(self.http), sum(request['bytes'] for request in self.http),
+                sum(request['time'] for request in self.http)))
+        for host, remaining in sorted(self.rate_limit.items()):
+            lines.append('Rate limit budget left on {}: {}'.format(host, remaining))
+        commands = self.commands()
+        if commands:
+            width = max(len(name) for name, *_ in commands)
+            lines.append('{:<{}}  {:>8}  {:>9}'.format('git commands', width, 'Count', 'Time'))
+            for name, count, duration in commands:
+                lines.append('{:<{}}  {:>8}  {:>8.3f}s'.format(name, width, count, duration))
+        lines.append('Time: ' + ', '.join('{} {:.3f}s'.format(name, duration)
+                                          for name, duration in self.phases.items()))
+        return lines
+
+    def to_json(self):
+        return OrderedDict([
+            ('phases', self.phases),
+            ('endpoints', [OrderedDict(zip(('endpoint', 'count', 'bytes', 'time'), row)) for row in self.endpoints()]),
+            ('rate_limit', self.rate_limit),
+            ('http', self.http),
+            ('git', self.git),
+        ])
+
+
+def enable():
+    '''Starts collecting, if not already, and gives the collector'''
+    global collector
+    if collector is None:
+        collector = Stats()
+        collector.install_git()
+    return collector
+
+
+@contextmanager
+def phase(name):
+    '''Adds the time spent within the block to the given phase, when collecting'''
+    if collector is None:
+        yield
+    else:
+        with collector.phase(name):
+            yield
+
+
+def report():
+    '''Stops collecting, then prints the summary and writes the trace that were asked for'''
+    global collector
+    if collector is None:
+        return
+    stats, collector = collector, None
+    stats.uninstall_git()
+    stats.finish()
+    if stats.summary:
+        for line in stats.format_summary():
+            print(line, file=sys.stderr)
+    if stats.trace_path:
+        try:
+            with open(stats.trace_path, 'w') as trace:
+                json.dump(stats.to_json(), trace, indent=2)
+        except OSError as err:
+            log.error('Cannot write the profile to {}: {}'.format(stats.trace_path, err))
+
+
+'''Profilers of the Python code, by name'''
+profilers = dict()
+
+def register_profiler(name):
+    '''Decorator to register a profiler by name
+
+    A profiler is a function taking the path to write the profile to, the
+    function to profile and its arguments, and giving the result of the function.
+    '''
+    def decorate(profiler):
+        profilers[name] = profiler
+        return profiler
+    return decorate
+
+@register_profiler('cprofile')
+def cprofile_profiler(path, function, *args):
+    '''Deterministic profiling, written as pstats'''
+    import cProfile
+    profiler = cProfile.Profile()
+    try:
+        return profiler.runcall(function, *args)
+    finally:
+        profiler.dump_stats(path)
+
+@register_profiler('pyinstrument')
+def pyinstrument_profiler(path, function, *args):
+    '''Sampling profiling, written as speedscope JSON'''
+    try:
+        from pyinstrument import Profiler
+        from pyinstrument.renderers import SpeedscopeRenderer
+    except ImportError as err:
+        raise ValueError('The pyinstrument profiler needs the pyinstrument package to be installed, '
+                         'see the profile extra of git-repo.') from err
+    profiler = Profiler()
+    profiler.start()
+    try:
+        return function(*args)
+    finally:
+        profiler.stop()
+        with open(path, 'w') as output:
+            output.write(profiler.output(SpeedscopeRenderer()))
+
+
+def profile(function, *args):
+    '''Runs the function, within a profiler when `GIT_REPO_PROFILE` is set
+
+    `GIT_REPO_PROFILE` is the path of the file to write the profile to, and
+    `GIT_REPO_PROFILER` the name of the profiler to use (default: cprofile).
+    '''
+    path = os.environ.get('GIT_REPO_PROFILE')
+    if not path:
+        return function(*args)
+    name = os.environ.get('GIT_REPO_PROFILER', 'cprofile')
+    if name not in profilers:
+        raise ValueError('Unknown profiler: {}. Choose one of: {}.'.format(
+            name, ', '.join(sorted(profilers))))
+    result = profilers[name](path, function, *args)
+    log.info('Profile written to {}'.format(path))
+    return result
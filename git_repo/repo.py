@@ -2,36 +2,41 @@
 
 '''
 Usage:
-    {self} [--path=<path>] [-v...] <target> fork [--branch=<branch>]
-    {self} [--path=<path>] [-v...] <target> create [--add]
-    {self} [--path=<path>] [-v...] <target> delete [-f]
-    {self} [--path=<path>] [-v...] <target> open
-    {self} [--path=<path>] [-v...] <target> (list|ls) [-l] <user>
-    {self} [--path=<path>] [-v...] <target> fork <namespace>/<repo> [--branch=<branch>]
-    {self} [--path=<path>] [-v...] <target> fork <namespace>/<repo> <repo> [--branch=<branch>]
-    {self} [--path=<path>] [-v...] <target> create <namespace>/<repo> [--add]
-    {self} [--path=<path>] [-v...] <target> delete <namespace>/<repo> [-f]
-    {self} [--path=<path>] [-v...] <target> open <namespace>/<repo>
-    {self} [--path=<path>] [-v...] <target> clone <namespace>/<repo> [<repo> [<branch>]]
-    {self} [--path=<path>] [-v...] <target> add
-    {self} [--path=<path>] [-v...] <target> add <namespace>/<repo> [<name>] [--tracking=<branch>] [-a]
-    {self} [--path=<path>] [-v...] <target> request (list|ls)
-    {self} [--path=<path>] [-v...] <target> request fetch <request> [-f]
-    {self} [--path=<path>] [-v...] <target> request create [--title=<title>] [--message=<message>]
-    {self} [--path=<path>] [-v...] <target> request create <local_branch> [--title=<title>] [--message=<message>]
-    {self} [--path=<path>] [-v...] <target> request create <remote_branch> <local_branch> [--title=<title>] [--message=<message>]
-    {self} [--path=<path>] [-v...] <target> request <namespace>/<repo> (list|ls)
-    {self} [--path=<path>] [-v...] <target> request <namespace>/<repo> fetch <request> [-f]
-    {self} [--path=<path>] [-v...] <target> request <namespace>/<repo> create [--title=<title>] [--branch=<remote>] [--message=<message>]
-    {self} [--path=<path>] [-v...] <target> request <namespace>/<repo> create <local_branch> [--title=<title>] [--branch=<remote>] [--message=<message>]
-    {self} [--path=<path>] [-v...] <target> request <namespace>/<repo> create <remote_branch> <local_branch> [--title=<title>] [--branch=<remote>] [--message=<message>]
-    {self} [--path=<path>] [-v...] <target> (gist|snippet) (list|ls) [<gist>]
-    {self} [--path=<path>] [-v...] <target> (gist|snippet) clone <gist>
-    {self} [--path=<path>] [-v...] <target> (gist|snippet) fetch <gist> [<gist_file>]
-    {self} [--path=<path>] [-v...] <target> (gist|snippet) create [--secret] <description> [<gist_path> <gist_path>...]
-    {self} [--path=<path>] [-v...] <target> (gist|snippet) delete <gist> [-f]
-    {self} [--path=<path>] [-v...] <target> config [--config=<gitconfig>]
+    {self} [--path=<path>] [-v...] [--no-cache] [--stats] [--profile=<file>] <target> fork [--branch=<branch>]
+    {self} [--path=<path>] [-v...] [--no-cache] [--stats] [--profile=<file>] <target> create [--add]
+    {self} [--path=<path>] [-v...] [--no-cache] [--stats] [--profile=<file>] <target> delete [-f]
+    {self} [--path=<path>] [-v...] [--no-cache] [--stats] [--profile=<file>] <target> open
+    {self} [--path=<path>] [-v...] [--no-cache] [--stats] [--profile=<file>] <target> (list|ls) [-l] [--jobs=<jobs>] [--format=<format>] <user>
+    {self} [--path=<path>] [-v...] [--no-cache] [--stats] [--profile=<file>] <target> fork <namespace>/<repo> [--branch=<branch>]
+    {self} [--path=<path>] [-v...] [--no-cache] [--stats] [--profile=<file>] <target> fork <namespace>/<repo> <repo> [--branch=<branch>]
+    {self} [--path=<path>] [-v...] [--no-cache] [--stats] [--profile=<file>] <target> create <namespace>/<repo> [--add]
+    {self} [--path=<path>] [-v...] [--no-cache] [--stats] [--profile=<file>] <target> delete <namespace>/<repo> [-f]
+    {self} [--path=<path>] [-v...] [--no-cache] [--stats] [--profile=<file>] <target> open <namespace>/<repo>
+    {self} [--path=<path>] [-v...] [--no-cache] [--stats] [--profile=<file>] <target> clone <namespace>/<repo> [<repo> [<branch>]]
+    {self} [--path=<path>] [-v...] [--no-cache] [--stats] [--profile=<file>] <target> clone --all <user> [--jobs=<jobs>]
+    {self} [--path=<path>] [-v...] [--no-cache] [--stats] [--profile=<file>] <target> clone --from=<file> [--jobs=<jobs>]
+    {self} [--path=<path>] [-v...] [--no-cache] [--stats] [--profile=<file>] <target> add
+    {self} [--path=<path>] [-v...] [--no-cache] [--stats] [--profile=<file>] <target> add <namespace>/<repo> [<name>] [--tracking=<branch>] [-a]
+    {self} [--path=<path>] [-v...] [--no-cache] [--stats] [--profile=<file>] <target> request (list|ls) [--format=<format>]
+    {self} [--path=<path>] [-v...] [--no-cache] [--stats] [--profile=<file>] <target> request (list|ls) <user> [--jobs=<jobs>] [--format=<format>]
+    {self} [--path=<path>] [-v...] [--no-cache] [--stats] [--profile=<file>] <target> request fetch <request> [-f]
+    {self} [--path=<path>] [-v...] [--no-cache] [--stats] [--profile=<file>] <target> request create [--title=<title>] [--message=<message>]
+    {self} [--path=<path>] [-v...] [--no-cache] [--stats] [--profile=<file>] <target> request create <local_branch> [--title=<title>] [--message=<message>]
+    {self} [--path=<path>] [-v...] [--no-cache] [--stats] [--profile=<file>] <target> request create <remote_branch> <local_branch> [--title=<title>] [--message=<message>]
+    {self} [--path=<path>] [-v...] [--no-cache] [--stats] [--profile=<file>] <target> request <namespace>/<repo> (list|ls) [--format=<format>]
+    {self} [--path=<path>] [-v...] [--no-cache] [--stats] [--profile=<file>] <target> request <namespace>/<repo> fetch <request> [-f]
+    {self} [--path=<path>] [-v...] [--no-cache] [--stats] [--profile=<file>] <target> request <namespace>/<repo> create [--title=<title>] [--branch=<remote>] [--message=<message>]
+    {self} [--path=<path>] [-v...] [--no-cache] [--stats] [--profile=<file>] <target> request <namespace>/<repo> create <local_branch> [--title=<title>] [--branch=<remote>] [--message=<message>]
+    {self} [--path=<path>] [-v...] [--no-cache] [--stats] [--profile=<file>] <target> request <namespace>/<repo> create <remote_branch> <local_branch> [--title=<title>] [--branch=<remote>] [--message=<message>]
+    {self} [--path=<path>] [-v...] [--no-cache] [--stats] [--profile=<file>] <target> (gist|snippet) (list|ls) [<gist>] [--format=<format>]
+    {self} [--path=<path>] [-v...] [--no-cache] [--stats] [--profile=<file>] <target> (gist|snippet) clone <gist>
+    {self} [--path=<path>] [-v...] [--no-cache] [--stats] [--profile=<file>] <target> (gist|snippet) fetch <gist> [<gist_file>]
+    {self} [--path=<path>] [-v...] [--no-cache] [--stats] [--profile=<file>] <target> (gist|snippet) create [--secret] <description> [<gist_path> <gist_path>...]
+    {self} [--path=<path>] [-v...] [--no-cache] [--stats] [--profile=<file>] <target> (gist|snippet) delete <gist> [-f]
+    {self} [--path=<path>] [-v...] [--no-cache] [--stats] [--profile=<file>] <target> config [--config=<gitconfig>]
     {self} [-v...] config [--config=<gitconfig>]
+    {self} [--path=<path>] [-v...] [--stats] [--profile=<file>] push-all [<refspec>] [--jobs=<jobs>]
+    {self} [-v...] [--stats] [--profile=<file>] sync [<dir>] [--jobs=<jobs>] [--per-host=<limit>] [--pull]
     {self} --help
 
 Tool for managing remote repository services.
@@ -47,10 +52,20 @@ Commands:
     request                  Handles requests for merge
     open                     Open the given or current repository in a browser
     config                   Run authentication process and configure the tool
+    push-all                 Push to all the URLs of the `all` remote in parallel
+    sync                     Fetch the remotes of all the repositories within a directory
 
 Options:
     <namespace>/<repo>       Repository to work with
     -p,--path=<path>         Path to work on [default: .]
+    -j,--jobs=<jobs>         Number of requests to run in parallel
+    --format=<format>        Output format of listings: text, tsv, jsonl or json
+                             [default: text]
+    --no-cache               Do not use the HTTP cache for this command
+    --stats                  Print a summary of the HTTP requests, git commands and
+                             time spent by the command on stderr
+    --profile=<file>         Write a JSON trace of the HTTP requests, git commands and
+                             time spent by the command to <file>
     -v,--verbose             Makes it more chatty (repeat twice to see git commands)
     -h,--help                Shows this message
 
@@ -70,6 +85,9 @@ Option for both clone and fork:
 
 Options for clone:
     <branch>                 Branch to pull [default: master]
+    --all                    Clone all the repositories of <user> in parallel
+    --from=<file>            Clone in parallel the repositories listed in <file>,
+                             one <namespace>/<repo> per line (- for stdin)
 
 Options for fork:
     --branch=<branch>        Branch to pull [default: master]
@@ -89,6 +107,14 @@ Options for gist:
                              from them will be pushed.
     --secret                 Do not publicize gist when pushing
 
+Options for push-all:
+    <refspec>                Branch to push (defaults to the current branch)
+
+Options for sync:
+    <dir>                    Directory holding the repositories (defaults to current directory)
+    --per-host=<limit>       Number of git commands run in parallel against a host (default: 4)
+    --pull                   Fast-forward the branches that are behind their upstream
+
 Options for request:
     -t,--title=<title>       Title to give to the request for merge
     -m,--message=<message>   Description for the request for merge
@@ -97,6 +123,9 @@ Configuration options:
     alias                    Name to use for the git remote
     fqdn                     URL of the repository
     type                     Name of the service to use (github, gitlab, bitbucket)
+    jobs                     Number of requests to run in parallel (default: 8)
+    cache                    Cache the responses of the service's API (default: false)
+    cache-size               Size of the HTTP cache, in MiB (default: 50)
 
 Configuration example:
 
@@ -115,6 +144,8 @@ read the LICENSE file available in the sources, or check
 out: http://www.gnu.org/licenses/gpl-2.0.txt
 '''
 
+from . import instrumentation
+
 from docopt import docopt
 from getpass import getpass
 
@@ -123,9 +154,7 @@ import sys
 import json
 import shutil
 import logging
-import pkg_resources
 
-__version__ = pkg_resources.require('git-repo')[0].version
 __author__ = 'Bernard `Guyzmo` Pratz <guyzmo+git_repo@m0g.net>'
 __contributors__ = []
 
@@ -137,23 +166,59 @@ if sys.version_info.major < 3:  # pragma: no cover
     sys.exit(1)
 
 from .exceptions import ArgumentError, ResourceNotFoundError
-from .services.service import RepositoryService, EXTRACT_URL_RE
+from .services.service import RepositoryService, BatchProgressBar, EXTRACT_URL_RE
 
-from .tools import print_tty, print_iter, loop_input, confirm
+from .tools import print_tty, print_iter, loop_input, confirm, parallel_map, error_message
+from .workspace import find_repositories, sync_repository, HostLimiter
 from .kwargparse import KeywordArgumentParser, store_parameter, register_action
 
-from git import Repo, Git
+from git import Repo, Git, RemoteProgress
 from git.exc import InvalidGitRepositoryError, NoSuchPathError, BadName
 
+
+def get_version():
+    '''Version of the installed git-repo distribution
+
+    It is only looked up when rendering the help, as scanning the installed
+    distributions is slow.
+    '''
+    try:
+        from importlib.metadata import version
+    except ImportError:  # pragma: no cover
+        try:
+            from importlib_metadata import version
+        except ImportError:
+            import pkg_resources
+            return pkg_resources.require('git-repo')[0].version
+    return version('git-repo')
+
+
 class GitRepoRunner(KeywordArgumentParser):
+    jobs = None
+    use_cache = None
+    clone_all = False
+    slugs_file = None
+    sync_path = '.'
+    per_host = 4
+    pull_updates = False
+    refspec = None
+    output = 'text'
 
     def init(self):  # pragma: no cover
         if 'GIT_WORK_TREE' in os.environ.keys() or 'GIT_DIR' in os.environ.keys():
             del os.environ['GIT_WORK_TREE']
 
     def get_service(self, lookup_repository=True, resolve_targets=None):
+        with instrumentation.phase('connect'):
+            return self._get_service(lookup_repository, resolve_targets)
+
+    def build_service(self, repository=None):
+        '''Service of the target, with the settings given on the command line'''
+        return RepositoryService.get_service(repository, self.target, jobs=self.jobs, use_cache=self.use_cache)
+
+    def _get_service(self, lookup_repository, resolve_targets):
         if not lookup_repository:
-            service = RepositoryService.get_service(None, self.target)
+            service = self.build_service()
             service.connect()
         else:
             # Try to resolve existing repository path
@@ -164,7 +229,7 @@ class GitRepoRunner(KeywordArgumentParser):
                     repository = Repo(self.path, search_parent_directories=True)
             except InvalidGitRepositoryError:
                 raise FileNotFoundError('Cannot find path to the repository.')
-            service = RepositoryService.get_service(repository, self.target)
+            service = self.build_service(repository)
             if not self.repo_name:
                 repo_slug = RepositoryService.guess_repo_slug(
                         repository, service, resolve_targets
@@ -201,6 +266,55 @@ class GitRepoRunner(KeywordArgumentParser):
 
         log.addHandler(logging.StreamHandler())
 
+    @store_parameter('--jobs')
+    def set_jobs(self, jobs):
+        self.jobs = int(jobs) if jobs else None
+
+    @store_parameter('--format')
+    def set_output(self, output):
+        output = output or 'text'
+        if output not in ('text', 'tsv', 'jsonl', 'json'):
+            raise ArgumentError('Unknown output format: {}.'.format(output))
+        self.output = output
+
+    @store_parameter('--all')
+    def set_clone_all(self, clone_all):
+        self.clone_all = clone_all
+
+    @store_parameter('--from')
+    def set_slugs_file(self, slugs_file):
+        self.slugs_file = slugs_file
+
+    @store_parameter('<dir>')
+    def set_sync_path(self, sync_path):
+        self.sync_path = sync_path or '.'
+
+    @store_parameter('--per-host')
+    def set_per_host(self, per_host):
+        self.per_host = int(per_host) if per_host else 4
+
+    @store_parameter('--pull')
+    def set_pull_updates(self, pull_updates):
+        self.pull_updates = pull_updates
+
+    @store_parameter('<refspec>')
+    def set_refspec(self, refspec):
+        self.refspec = refspec
+
+    @store_parameter('--no-cache')
+    def set_no_cache(self, no_cache):
+        self.use_cache = False if no_cache else None
+
+    @store_parameter('--stats')
+    def set_stats(self, stats):
+        if stats:
+            instrumentation.enable().summary = True
+
+    @store_parameter('--profile')
+    def set_profile(self, profile):
+        if profile:
+            instrumentation.enable().trace_path = profile
+
     @store_parameter('<namespace>/<repo>')
     def set_repo_slug(self, repo_slug, auto=False):
         self.repo_slug = EXTRACT_URL_RE.sub('', repo_slug) if repo_slug else repo_slug
@@ -214,7 +328,7 @@ class GitRepoRunner(KeywordArgumentParser):
             self.namespace = '/'.join(namespace)
 
             # This needs to be manually plucked because otherwise it'll be unset for some commands.
-            service = RepositoryService.get_service(None, self.target)
+            service = self.build_service()
             if len(namespace) > service._max_nested_namespaces:
                 raise ArgumentError('Too many slashes.'
                                     'The maximum depth of namespaces is: {}'.format(service._max_nested_namespaces))
@@ -252,7 +366,7 @@ class GitRepoRunner(KeywordArgumentParser):
     @register_action('ls')
     @register_action('list')
     def do_list(self):
-        print_iter(self.get_service(False).list(self.user, self.long))
+        print_iter(self.get_service(False).list(self.user, self.long), self.output)
         return 0
 
     @register_action('add')
@@ -292,7 +406,7 @@ class GitRepoRunner(KeywordArgumentParser):
             else:
                 repo_path = os.path.join(self.path, self.target_repo)
                 try:
-                    service = RepositoryService.get_service(Repo(repo_path), self.target)
+                    service = self.build_service(Repo(repo_path))
                 except (InvalidGitRepositoryError, NoSuchPathError):
                     service = self.get_service(lookup_repository=False)
                     # if the repository does not exists at given path, clone upstream into that path
@@ -308,6 +422,8 @@ class GitRepoRunner(KeywordArgumentParser):
 
     @register_action('clone')
     def do_clone(self, service=None, repo_path=None):
+        if self.clone_all or self.slugs_file:
+            return self.do_clone_batch()
         service = service or self.get_service(lookup_repository=False)
         repo_path = repo_path or os.path.join(self.path, self.target_repo or self.repo_name)
         if os.path.exists(repo_path) and os.listdir(repo_path) != []:
@@ -316,7 +432,7 @@ class GitRepoRunner(KeywordArgumentParser):
                                   'is not an empty directory!'.format(repo_path))
         try:
             repository = Repo.init(repo_path)
-            service = RepositoryService.get_service(repository, self.target)
+            service = self.build_service(repository)
             service.clone(self.namespace, self.repo_name, self.branch)
             log.info('Successfully cloned `{}` into `{}`!'.format(
                 service.format_path(self.repo_slug),
@@ -328,6 +444,140 @@ class GitRepoRunner(KeywordArgumentParser):
                 shutil.rmtree(repo_path)
             raise ResourceNotFoundError(err.args[2].decode('utf-8')) from err
 
+    def do_clone_batch(self):
+        service = self.get_service(lookup_repository=False)
+        if self.slugs_file:
+            if self.slugs_file == '-':
+                lines = sys.stdin.readlines()
+            else:
+                with open(self.slugs_file) as f:
+                    lines = f.readlines()
+            slugs = [EXTRACT_URL_RE.sub('', line.strip()) for line in lines
+                        if line.strip() and not line.startswith('#')]
+        else:
+            slugs = list(service.get_repository_slugs(self.user))
+
+        # repositories are cloned in a folder named after them, whatever their
+        # namespace: only the first of the slugs sharing a folder is cloned
+        targets = {}
+        for slug in slugs:
+            targets.setdefault(os.path.join(self.path, slug.split('/')[-1]), slug)
+
+        def clone(slug):
+            repo_path = os.path.join(self.path, slug.split('/')[-1])
+            if targets[repo_path] != slug:
+                progress.start(slug)
+                progress.finish(slug, success=False)
+                return slug, repo_path, 'the folder {} is where {} is cloned'.format(repo_path, targets[repo_path])
+            return self.clone_one(service, slug, progress)
+
+        os.makedirs(self.path, exist_ok=True)
+        progress = BatchProgressBar('Cloning', len(slugs))
+        try:
+            results = list(parallel_map(clone, slugs, service.jobs))
+        finally:
+            progress.close()
+            service.close()
+
+        def summary():
+            yield '{}\t{}\t{}'
+            yield ('Status', 'Repository', 'Path')
+            for slug, repo_path, error in results:
+                yield ('failed', slug, error) if error else ('ok', slug, repo_path)
+        print_iter(summary())
+
+        failed = len([error for *_, error in results if error])
+        log.info('Cloned {} repositories out of {}.'.format(len(results) - failed, len(results)))
+        return 1 if failed else 0
+
+    def clone_one(self, service, repo_slug, progress):
+        '''Clones a repository in the workspace of a batch clone
+
+        :param service: connected service of the batch
+        :param repo_slug: namespace/repository slug of the repository to clone
+        :param progress: BatchProgressBar instance reporting the batch
+        :return: (slug, path, error message or None)
+        '''
+        *namespace, repo_name = repo_slug.split('/')
+        repo_path = os.path.join(self.path, repo_name)
+        progress.start(repo_slug)
+        error = None
+        try:
+            # the folder is claimed atomically, and only removed by whoever created it
+            try:
+                os.mkdir(repo_path)
+                created = True
+            except FileExistsError:
+                if not os.path.isdir(repo_path) or os.listdir(repo_path) != []:
+                    raise FileExistsError('a folder named {} already exists and '
+                                          'is not an empty directory!'.format(repo_path))
+                created = False
+            try:
+                repo_service = service.for_repository(Repo.init(repo_path))
+                try:
+                    # progress is shown for the whole batch, not for each git command
+                    repo_service.progress = RemoteProgress()
+                    repo_service.clone('/'.join(namespace), repo_name)
+                finally:
+                    repo_service.close()
+            except Exception:
+                if created:
+                    shutil.rmtree(repo_path, ignore_errors=True)
+                raise
+        except Exception as err:
+            log.debug('Failed to clone {}: {}'.format(repo_slug, err))
+            error = error_message(err)
+        finally:
+            progress.finish(repo_slug, success=error is None)
+        return repo_slug, repo_path, error
+
+    @register_action('push-all')
+    def do_push_all(self):
+        try:
+            repository = Repo(self.path, search_parent_directories=True)
+        except InvalidGitRepositoryError:
+            raise FileNotFoundError('Cannot find path to the repository.')
+        results = RepositoryService.push_all(repository, self.refspec, self.jobs)
+        failed = len([success for _, success, _ in results if not success])
+        if failed:
+            log.error('Failed to push to {} remote URLs out of {}.'.format(failed, len(results)))
+            return 1
+        log.info('Successfully pushed to {} remote URLs.'.format(len(results)))
+        return 0
+
+    @register_action('sync')
+    def do_sync(self):
+        paths = list(find_repositories(self.sync_path))
+        limiter = HostLimiter(self.per_host)
+        progress = BatchProgressBar('Syncing', len(paths))
+
+        def sync(path):
+            progress.start(path)
+            try:
+                result = sync_repository(path, limiter, pull=self.pull_updates)
+            except Exception as err:
+                log.debug('Failed to sync {}: {}'.format(path, err))
+                result = ('failed', '', '', '', error_message(err))
+            progress.finish(path, success=result[0] != 'failed')
+            return (os.path.relpath(path, self.sync_path),) + result
+
+        try:
+            results = list(parallel_map(sync, paths, self.jobs or RepositoryService.jobs))
+        finally:
+            progress.close()
+
+        def summary():
+            yield '{}\t{}\t{}\t{}\t{}\t{}'
+            yield ('Status', 'Ahead', 'Behind', 'Branch', 'Repository', 'Error')
+            for path, status, ahead, behind, branch, error in results:
+                yield (status, ahead, behind, branch, path, error or '')
+        print_iter(summary())
+
+        statuses = [result[1] for result in results]
+        log.info('Synchronized {} repositories: {} behind, {} diverged, {} failed.'.format(
+            len(results), statuses.count('behind'), statuses.count('diverged'), statuses.count('failed')))
+        return 1 if 'failed' in statuses else 0
+
     @register_action('create')
     def do_create(self):
         service = self.get_service(lookup_repository=self.repo_slug == None or self.add)
@@ -371,9 +621,15 @@ class GitRepoRunner(KeywordArgumentParser):
     @register_action('request', 'ls')
     @register_action('request', 'list')
     def do_request_list(self):
+        if self.user and not self.repo_slug:
+            # all the requests of a namespace, the most recently updated first
+            service = self.get_service(lookup_repository=False)
+            print_tty('List of open requests to merge within {}:'.format(self.user))
+            print_iter(service.namespace_request_list(self.user), self.output)
+            return 0
         service = self.get_service(lookup_repository=self.repo_slug == None)
         print_tty('List of open requests to merge:')
-        print_iter(service.request_list(self.namespace, self.repo_name))
+        print_iter(service.request_list(self.namespace, self.repo_name), self.output)
         return 0
 
     @register_action('request', 'create')
@@ -457,7 +713,7 @@ class GitRepoRunner(KeywordArgumentParser):
     @register_action('snippet', 'list')
     def do_gist_list(self):
         service = self.get_service(lookup_repository=False)
-        print_iter(service.gist_list(self.gist_ref or None))
+        print_iter(service.gist_list(self.gist_ref or None), self.output)
         return 0
 
     @register_action('gist', 'clone')
@@ -579,17 +835,25 @@ class GitRepoRunner(KeywordArgumentParser):
 
 def main(args):
     try:
-        return GitRepoRunner(args).run()
+        return instrumentation.profile(GitRepoRunner(args).run)
     except Exception as err:
         log.error('Fatal error: {}'.format(err))
         if log_root.level == logging.DEBUG:
             log.exception('------------------------------------')
         return 2
+    finally:
+        instrumentation.report()
 
 
 def cli():  # pragma: no cover
+    name = sys.argv[0].split(os.path.sep)[-1]
     try:
-        sys.exit(main(docopt(__doc__.format(self=sys.argv[0].split(os.path.sep)[-1], version=__version__))))
+        # the help is rendered here, as it is the only place needing the version
+        args = docopt(__doc__.format(self=name, version='{version}'), help=False)
+        if args['--help']:
+            print(__doc__.format(self=name, version=get_version()).strip('\n'))
+            sys.exit(0)
+        sys.exit(main(args))
     finally:
         # Whatever happens, make sure that the cursor reappears with some ANSI voodoo
         if sys.stdout.isatty():
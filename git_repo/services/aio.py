@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+
+import logging
+log = logging.getLogger('git_repo.aio')
+
+import ssl
+import json
+import time
+import asyncio
+
+from requests.utils import parse_header_links
+
+from ..exceptions import ResourceError, ResourceNotFoundError
+from ..tools import columnize
+from .. import instrumentation
+from .service import RepositoryService
+
+
+def register_async(service):
+    '''Decorator to register a class as the async implementation of a service'''
+    def decorate(klass):
+        service.async_service = klass
+        return klass
+    return decorate
+
+
+class AsyncRepositoryService:
+    '''Base class for the non-blocking implementations of the services
+
+    An async service talks to the API of a service through a single aiohttp
+    client, shared by all its coroutines, so that a process can have as many
+    requests in flight as the service accepts, without a thread per request.
+    It is built from the blocking service, of which it reuses the configuration
+    (host, credentials, certificates, proxies) and the rate limit handling.
+
+    The listings return their rows at once, in the same form as the generators
+    of `RepositoryService`, and the rows of long listings are all fetched
+    concurrently.
+    '''
+
+    list_format = "{}\t{}\t{}\t{}\t{}\t{}\t{}\t{}\t{}\t{:12}\t{}"
+    list_header = ['Status', 'Commits', 'Reqs', 'Issues', 'Forks', 'Coders', 'Watch', 'Likes', 'Lang', 'Modif', 'Name']
+
+    def __init__(self, service):
+        '''
+        :param service: the blocking service instance
+        '''
+        self.service = service
+        self.client = None
+        self._throttle = None
+
+    '''HTTP client'''
+
+    @property
+    def api_url(self):
+        '''URL of the root of the API'''
+        raise NotImplementedError
+
+    @property
+    def headers(self):
+        '''Headers sent along all the requests, like the authentication ones'''
+        return dict(Accept='application/json')
+
+    def get_ssl(self):
+        if self.service.session_certificate:
+            return ssl.create_default_context(cafile=self.service.session_certificate)
+        return False if self.service.session_insecure else None
+
+    async def connect(self):
+        try:
+            import aiohttp
+        except ImportError as err:
+            raise ValueError('The async API needs the aiohttp package to be installed, '
+                             'see the async extra of git-repo.') from err
+        self._throttle = asyncio.Lock()
+        self.client = aiohttp.ClientSession(
+                headers=self.headers,
+                connector=aiohttp.TCPConnector(limit=self.service.connections, ssl=self.get_ssl()),
+                trust_env=True)
+
+    async def close(self):
+        if self.client is not None:
+            await self.client.close()
+            self.client = None
+
+    async def request(self, method, path, params=None, data=None):
+        '''Issues a request to the API
+
+        :param path: path within the API, or URL
+        :return: (decoded content, headers, links of the `Link` header by relation)
+        '''
+        url = path if '://' in path else '/'.join([self.api_url, path.lstrip('/')])
+        limiter = self.service.rate_limiter
+        retries = 0
+        while True:
+            # while a coroutine waits for the rate limit reset, the others are held back
+            async with self._throttle:
+                delay = limiter.delay()
+                if delay:
+                    log.warning('API rate limit almost reached, waiting {:.0f}s…'.format(delay))
+                    await asyncio.sleep(delay)
+            started = time.perf_counter()
+            async with self.client.request(method, url, params=params, json=data,
+                                           proxy=self.service.session_proxy.get(url.split(':')[0])) as response:
+                limiter.update(response)
+                if response.status == 429 and retries < limiter.max_retries:
+                    delay = response.headers.get('Retry-After', '')
+                    delay = int(delay) if delay.isdigit() else 2**retries
+                    log.warning('API rate limit reached, retrying in {}s…'.format(delay))
+                    await asyncio.sleep(delay)
+                    retries += 1
+                    continue
+                if response.status == 404:
+                    raise ResourceNotFoundError('Not found: {}'.format(url))
+                if response.status >= 400:
+                    raise ResourceError('{} {}: {}'.format(response.status, url, await response.text()))
+                text = await response.text()
+                if instrumentation.collector is not None:
+                    instrumentation.collector.record_http(
+                        method, str(response.url), response.status, response.content_length or len(text.encode('utf-8')),
+                        time.perf_counter() - started, response.headers)
+                links = {link['rel']: link for link in parse_header_links(response.headers.get('Link', ''))
+                         if 'rel' in link}
+                return json.loads(text) if text else None, response.headers, links
+
+    async def get(self, path, params=None):
+        return (await self.request('GET', path, params=params))[0]
+
+    async def paginate(self, path, params=None, page_size=100):
+        '''Fetches all the objects of a collection
+
+        The first page gives the number of pages, then all the other pages are
+        fetched concurrently. When the service does not tell the number of pages,
+        they are fetched one after the other.
+        '''
+        params = dict(params or {}, per_page=page_size)
+        page, headers, links = await self.request('GET', path, params=params)
+        # a collection can be answered without content, like the contributors of an empty repository
+        objects = list(page or [])
+        last = None
+        if headers.get('X-Total-Pages', '').isdigit():
+            last = int(headers['X-Total-Pages'])
+        elif 'last' in links:
+            last = RepositoryService.get_total({}, {'last': links['last']}, None)
+        if last:
+            pages = await asyncio.gather(*(self.get(path, dict(params, page=number))
+                                           for number in range(2, last + 1)))
+            for page in pages:
+                objects.extend(page or [])
+            return objects
+        while 'next' in links:
+            page, headers, links = await self.request('GET', links['next']['url'])
+            objects.extend(page or [])
+        return objects
+
+    async def count(self, path, params=None):
+        '''Counts the objects of a collection with a single request, see `RepositoryService.count_objects()`'''
+        page, headers, links = await self.request('GET', path, params=dict(params or {}, per_page=1))
+        total = RepositoryService.get_total(headers, links, page or [])
+        if total is None:
+            total = len(await self.paginate(path, params))
+        return total
+
+    '''Identity'''
+
+    async def get_user(self):
+        '''Asks the service for the name of the authenticated user'''
+        raise NotImplementedError
+
+    async def user(self):
+        '''Name of the authenticated user, memoized like the blocking service's'''
+        if not self.service._privatekey:
+            return await self.get_user()
+        cache, key = self.service.get_identity_cache()
+        username = cache.get(key)
+        if username is None:
+            username = await self.get_user()
+            if username is not None:
+                cache.set(key, username)
+        return username
+
+    '''Repositories'''
+
+    async def get_repositories(self, user):
+        '''Lists the repositories of a namespace, as decoded by the API'''
+        raise NotImplementedError
+
+    async def get_repository(self, user, repo):
+        '''Repository of the namespace, as decoded by the API'''
+        raise NotImplementedError
+
+    async def get_parent_project_url(self, user, repo, rw=True):
+        '''URL of the project a repository has been forked from, or None'''
+        raise NotImplementedError
+
+    def get_slug(self, repository):
+        '''Slug of a repository, as listed by `get_repositories()`'''
+        raise NotImplementedError
+
+    async def get_repository_slugs(self, user):
+        return [self.get_slug(repository) for repository in await self.get_repositories(user)]
+
+    async def get_list_row(self, user, repository):
+        '''Row of the long listing for a repository, as listed by `get_repositories()`'''
+        raise NotImplementedError
+
+    async def list(self, user, _long=False):
+        repositories = await self.get_repositories(user)
+        if not _long:
+            return [columnize, ('Name',)] + [(self.get_slug(repository),) for repository in repositories]
+        rows = await asyncio.gather(*(self.get_list_row(user, repository) for repository in repositories))
+        return [self.list_format, self.list_header] + list(rows)
+
+    '''Requests and gists'''
+
+    async def request_list(self, user, repo):
+        '''Lists the open requests of a repository, as (id, title, URL) rows'''
+        raise NotImplementedError
+
+    async def gist_list(self):
+        '''Lists the gists of the authenticated user, as (title, URL) rows'''
+        raise NotImplementedError
+
+
+class SyncRepositoryService:
+    '''Runs the async implementation of a service behind the blocking interface
+
+    The listings and lookups that have an async implementation are run on an
+    event loop of their own, within the lifetime of a shared client, all other
+    operations and attributes are those of the blocking service. This is what
+    the `async` option of a service gives to `git repo`.
+    '''
+
+    def __init__(self, service):
+        '''
+        :param service: the blocking service instance
+        '''
+        self.__dict__.update(
+                service=service,
+                async_service=service.async_service(service),
+                loop=asyncio.new_event_loop())
+
+    def __getattr__(self, name):
+        return getattr(self.service, name)
+
+    def __setattr__(self, name, value):
+        setattr(self.service, name, value)
+
+    def for_repository(self, repository):
+        # each copy runs its own event loop, as copies are used from several threads
+        return SyncRepositoryService(self.service.for_repository(repository))
+
+    def run(self, coroutine):
+        async def run():
+            await self.async_service.connect()
+            try:
+                return await coroutine
+            finally:
+                await self.async_service.close()
+        return self.loop.run_until_complete(run())
+
+    def close(self):
+        self.loop.close()
+        self.service.close()
+
+    def list(self, user, _long=False):
+        fmt, header, *rows = self.run(self.async_service.list(user, _long))
+        yield fmt
+        yield header
+        yield from rows
+        if not _long:
+            return "Total repositories: {}".format(len(rows))
+
+    def get_repository_slugs(self, user):
+        yield from self.run(self.async_service.get_repository_slugs(user))
+
+    def get_parent_project_url(self, user, repo, rw=True):
+        return self.run(self.async_service.get_parent_project_url(user, repo, rw))
+
+    def request_list(self, user, repo):
+        yield "{}\t{:<60}\t{}"
+        yield ('id', 'title', 'URL')
+        yield from self.run(self.async_service.request_list(user, repo))
+
+    def gist_list(self, gist=None):
+        if gist:
+            yield from self.service.gist_list(gist)
+            return
+        yield "{:45.45} {}"
+        yield ('title', 'url')
+        yield from self.run(self.async_service.gist_list())
@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+
+import logging
+log = logging.getLogger('git_repo.cache')
+
+import os
+import json
+import base64
+import time
+import hashlib
+import tempfile
+import threading
+
+from requests.adapters import BaseAdapter
+from requests.models import Response
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+class HTTPCache:
+    '''Persistent cache of API responses, revalidated with conditional requests
+
+    Responses carrying an `ETag` or a `Last-Modified` header are stored on disk,
+    keyed by method, URL and the identity used to authenticate. When the same
+    request is issued again, it is sent with `If-None-Match`/`If-Modified-Since`
+    and a `304 Not Modified` answer is served from the cache. The least recently
+    used responses are evicted when the cache grows over `max_size` bytes.
+
+    The size of the cache is only measured on the first write, then kept up to
+    date by the writes, so the entries are only listed again when it grows over
+    `max_size`. Writes of other processes are accounted for on the next eviction.
+    '''
+
+    # request headers that make a response depend on who is asking for it
+    identity_headers = ('Authorization', 'PRIVATE-TOKEN', 'Cookie', 'Accept')
+
+    # response headers that do not make sense anymore once the content is stored
+    dropped_headers = ('Content-Encoding', 'Content-Length', 'Transfer-Encoding')
+
+    def __init__(self, path, max_size=50*1024*1024):
+        self.path = path
+        self.max_size = max_size
+        # bytes of the entries, None until measured
+        self.size = None
+        self._lock = threading.Lock()
+        os.makedirs(self.path, exist_ok=True)
+
+    def install(self, session):
+        '''Puts the cache in front of all the adapters of the session'''
+        for prefix, adapter in list(session.adapters.items()):
+            if not isinstance(adapter, CachingAdapter):
+                session.mount(prefix, CachingAdapter(self, adapter))
+        return session
+
+    def key(self, request):
+        identity = [request.method, request.url]
+        identity += [request.headers.get(header, '') for header in self.identity_headers]
+        return hashlib.sha256('\n'.join(identity).encode('utf-8')).hexdigest()
+
+    def _entry_path(self, key):
+        return os.path.join(self.path, '{}.json'.format(key))
+
+    def get(self, key):
+        try:
+            with open(self._entry_path(key), 'r') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        # refresh last use, for the eviction policy
+        os.utime(self._entry_path(key))
+        return entry
+
+    def set(self, key, response):
+        entry = dict(
+            url=response.url,
+            status=response.status_code,
+            reason=response.reason,
+            headers={k: v for k, v in response.headers.items() if k not in self.dropped_headers},
+            content=base64.b64encode(response.content).decode('ascii'),
+        )
+        # write in a temporary file then rename, so concurrent readers never see partial entries
+        fd, tmp_path = tempfile.mkstemp(dir=self.path, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(entry, f)
+        size = os.path.getsize(tmp_path)
+        try:
+            size -= os.path.getsize(self._entry_path(key))
+        except OSError:
+            pass
+        os.replace(tmp_path, self._entry_path(key))
+        with self._lock:
+            if self.size is not None:
+                self.size += size
+            full = self.size is None or self.size > self.max_size
+        if full:
+            self.evict()
+
+    def evict(self):
+        '''Removes the least recently used entries until the cache fits in `max_size`'''
+        entries = []
+        for entry in os.scandir(self.path):
+            if entry.name.endswith('.json'):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        size = sum(entry[1] for entry in entries)
+        for _, entry_size, entry_path in sorted(entries):
+            if size <= self.max_size:
+                break
+            try:
+                os.remove(entry_path)
+            except OSError:
+                pass
+            size -= entry_size
+        with self._lock:
+            self.size = size
+
+    def clear(self):
+        for entry in os.scandir(self.path):
+            if entry.name.endswith('.json'):
+                os.remove(entry.path)
+        with self._lock:
+            self.size = 0
+
+
+class CachingAdapter(BaseAdapter):
+    '''Transport adapter serving the responses of an HTTPCache'''
+
+    def __init__(self, cache, adapter):
+        super().__init__()
+        self.cache = cache
+        self.adapter = adapter
+
+    def send(self, request, stream=False, **kwarg):
+        if request.method != 'GET' or stream:
+            return self.adapter.send(request, stream=stream, **kwarg)
+
+        key = self.cache.key(request)
+        entry = self.cache.get(key)
+        if entry:
+            if 'ETag' in entry['headers']:
+                request.headers['If-None-Match'] = entry['headers']['ETag']
+            if 'Last-Modified' in entry['headers']:
+                request.headers['If-Modified-Since'] = entry['headers']['Last-Modified']
+
+        response = self.adapter.send(request, stream=stream, **kwarg)
+
+        if entry and response.status_code == 304:
+            log.debug('Cache hit for {}'.format(request.url))
+            return self.build_response(request, entry, response)
+        if response.status_code == 200 and ('ETag' in response.headers or 'Last-Modified' in response.headers):
+            self.cache.set(key, response)
+        return response
+
+    def build_response(self, request, entry, revalidation):
+        response = Response()
+        response.status_code = entry['status']
+        response.reason = entry['reason']
+        response.headers = CaseInsensitiveDict(entry['headers'])
+        # keep fresh metadata, like the rate limit budget, from the revalidation
+        for header, value in revalidation.headers.items():
+            if header not in HTTPCache.dropped_headers:
+                response.headers[header] = value
+        response._content = base64.b64decode(entry['content'])
+        response.encoding = get_encoding_from_headers(response.headers)
+        response.url = entry['url']
+        response.request = request
+        response.connection = self
+        response.from_cache = True
+        return response
+
+    def close(self):
+        self.adapter.close()
+
+
+class IdentityCache:
+    '''Memoizes the user authenticated by the credentials of a service
+
+    Identities are keyed by service, host and a hash of the credentials, so the
+    credentials themselves are never stored. They are kept for the lifetime of
+    the process, and, when a path is given, on disk for `ttl` seconds, so that
+    the following invocations do not ask the service who they are talking to.
+    '''
+
+    # shared by all the services of the process
+    _identities = dict()
+    _lock = threading.Lock()
+
+    def __init__(self, path=None, ttl=3600):
+        self.path = path
+        self.ttl = ttl
+        if self.path:
+            os.makedirs(self.path, exist_ok=True)
+
+    @staticmethod
+    def key(service, fqdn, *credentials):
+        secret = '\n'.join(str(credential) for credential in credentials)
+        return '{}@{}:{}'.format(service, fqdn, hashlib.sha256(secret.encode('utf-8')).hexdigest())
+
+    def _entry_path(self, key):
+        return os.path.join(self.path, '{}.json'.format(hashlib.sha256(key.encode('utf-8')).hexdigest()))
+
+    def get(self, key):
+        with self._lock:
+            if key in self._identities:
+                return self._identities[key]
+        if not self.path:
+            return None
+        try:
+            with open(self._entry_path(key), 'r') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if entry.get('key') != key or time.time() - entry.get('time', 0) > self.ttl:
+            return None
+        with self._lock:
+            self._identities[key] = entry['identity']
+        return entry['identity']
+
+    def set(self, key, identity):
+        with self._lock:
+            self._identities[key] = identity
+        if self.path:
+            # write in a temporary file then rename, so concurrent readers never see partial entries
+            fd, tmp_path = tempfile.mkstemp(dir=self.path, suffix='.tmp')
+            with os.fdopen(fd, 'w') as f:
+                json.dump(dict(key=key, identity=identity, time=time.time()), f)
+            os.replace(tmp_path, self._entry_path(key))
+
+    def invalidate(self, key):
+        with self._lock:
+            self._identities.pop(key, None)
+        if self.path:
+            try:
+                os.remove(self._entry_path(key))
+            except OSError:
+                pass
+
+    def lookup(self, key, fetch):
+        '''Returns the cached identity, or the one returned by fetch(), which is then cached'''
+        identity = self.get(key)
+        if identity is None:
+            identity = fetch()
+            if identity is not None:
+                self.set(key, identity)
+        return identity
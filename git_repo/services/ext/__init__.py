@@ -1,6 +1,18 @@
 #!/usr/bin/env python3
 
-import os, pkgutil
+'''
+Registry of the service modules
 
-__all__ = list(module for _, module, _ in pkgutil.iter_modules([os.path.split(__file__)[0]]))
+Each entry maps the name of a service to its git alias command and to the module
+implementing it. The modules are only imported when the service is used, so running
+a command does not load the client libraries of all the other services.
+'''
 
+services = {
+    'bitbucket': ('bb', 'bitbucket'),
+    'gerrit': ('gerrit', 'gerrit'),
+    'gitbucket': ('bucket', 'gitbucket'),
+    'github': ('hub', 'github'),
+    'gitlab': ('lab', 'gitlab'),
+    'gogs': ('gg', 'gogs'),
+}
@@ -5,7 +5,7 @@ log = logging.getLogger('git_repo.bitbucket')
 
 from ..service import register_target, RepositoryService, ProgressBar
 from ...exceptions import ResourceError, ResourceExistsError, ResourceNotFoundError
-from ...tools import columnize
+from ...tools import columnize, parallel_map
 
 from pybitbucket.bitbucket import Client, Bitbucket
 from pybitbucket.auth import BasicAuthenticator
@@ -23,6 +23,7 @@ from requests.exceptions import HTTPError
 from git.exc import GitCommandError
 
 from lxml import html
+import dateutil.parser
 import os, json, platform
 
 
@@ -47,8 +48,9 @@ class BitbucketService(RepositoryService):
         auth = BasicAuthenticator(login, password, 'z+git-repo+pub@m0g.net')
         self.bb.client.config = auth
         self.bb.client.session = self.bb.client.config.session = auth.start_http_session(self.bb.client.session)
+        self.configure_session(self.bb.client.session)
         try:
-            _ = self.bb.client.config.who_am_i()
+            self.username = self.get_identity(self.bb.client.config.who_am_i)
         except ResourceError as err:
             raise ConnectionError('Could not connect to BitBucket. Not authorized, wrong credentials.') from err
 
@@ -95,61 +97,91 @@ class BitbucketService(RepositoryService):
                 raise ResourceNotFoundError("Cannot delete: repository {}/{} does not exists.".format(user, repo)) from err
             raise ResourceError("Couldn't complete deletion: {}".format(err)) from err
 
-    def list(self, user, _long=False):
+    def _get_user(self, user):
         try:
-            user = User.find_user_by_username(user)
+            return User.find_user_by_username(user)
         except HTTPError as err:
             raise ResourceNotFoundError("User {} does not exists.".format(user)) from err
 
-        repositories = user.repositories()
+    def get_repository_slugs(self, user):
+        user = self._get_user(user)
+        for repo in user.repositories():
+            yield "/".join([user.username, repo.name])
+
+    def list(self, user, _long=False):
         if not _long:
-            yield "{}"
-            repositories = list(repositories)
-            yield ("Total repositories: {}".format(len(repositories)),)
-            yield from columnize(["/".join([user.username, repo.name]) for repo in repositories])
+            yield columnize
+            yield ('Name',)
+            total = 0
+            for total, slug in enumerate(self.get_repository_slugs(user), 1):
+                yield (slug,)
+            return "Total repositories: {}".format(total)
         else:
+            user = self._get_user(user)
+            repositories = user.repositories()
             yield "{}\t{}\t{}\t{}\t{}\t{}\t{}\t{}\t{}\t{:12}\t{}"
             yield ['Status', 'Commits', 'Reqs', 'Issues', 'Forks', 'Coders', 'Watch', 'Likes', 'Lang', 'Modif', 'Name']
-            for repo in repositories:
-                # if repo.updated_at.year < datetime.now().year:
-                #     date_fmt = "%b %d %Y"
-                # else:
-                #     date_fmt = "%b %d %H:%M"
-
-                status = ''.join([
-                    'F' if getattr(repo, 'parent', None) else ' ', # is a fork?
-                    'P' if repo.is_private else ' ',               # is private?
-                ])
-                yield [
-                    # status
-                    status,
-                    # stats
-                    str(len(list(repo.commits()))),       # number of commits
-                    str(len(list(repo.pullrequests()))),  # number of pulls
-                    str('N.A.'),                          # number of issues
-                    str(len(list(repo.forks()))),         # number of forks
-                    str('N.A.'),                          # number of contributors
-                    str(len(list(repo.watchers()))),      # number of subscribers
-                    str('N.A.'),                          # number of ♥
-                    # info
-                    repo.language or '?',                 # language
-                    repo.updated_on,                      # date
-                    '/'.join([user.username, repo.name]), # name
-                ]
+            # statistics of each repository are fetched in parallel, rows
+            # are kept in the same order as the repositories listing
+            yield from parallel_map(lambda repo: self._list_long_row(user, repo), repositories, self.jobs)
+
+    def _list_long_row(self, user, repo):
+        status = ''.join([
+            'F' if getattr(repo, 'parent', None) else ' ', # is a fork?
+            'P' if repo.is_private else ' ',               # is private?
+        ])
+        return [
+            # status
+            status,
+            # stats
+            self._count(repo, 'commits'),         # number of commits
+            self._count(repo, 'pullrequests'),    # number of pulls
+            None,                                 # number of issues
+            self._count(repo, 'forks'),           # number of forks
+            None,                                 # number of contributors
+            self._count(repo, 'watchers'),        # number of subscribers
+            None,                                 # number of ♥
+            # info
+            repo.language or '?',                 # language
+            dateutil.parser.parse(repo.updated_on),  # date
+            '/'.join([user.username, repo.name]), # name
+        ]
+
+    def _count(self, repo, collection):
+        # paginated collections give their total in the `size` field of the page
+        url = repo.links[collection]['href']
+        return self.count_objects(self.bb.client.session, url, params=dict(pagelen=1),
+                                  fallback=lambda: self._count_pages(url))
+
+    def _count_pages(self, url):
+        # collections without a size, like the commits, are walked with the largest pages served
+        total = 0
+        params = dict(pagelen=100)
+        while url:
+            response = self.bb.client.session.get(url, params=params)
+            response.raise_for_status()
+            page = response.json()
+            total += len(page.get('values', []))
+            url, params = page.get('next'), None
+        return total
 
     def _format_gist(self, gist):
         return gist.split('/')[-1] if gist.startswith('http') else gist
 
     def gist_list(self, gist=None):
         if not gist:
+            yield "{:45.45} {}"
+            yield 'url', 'title'
             for snippet in list(self.bb.snippetByOwner(owner=self.user)):
                 if isinstance(snippet, Snippet):
                     yield (snippet.links['html']['href'], snippet.title)
         else:
             try:
                 snippet = next(self.bb.snippetByOwnerAndSnippetId(owner=self.user, snippet_id=self._format_gist(gist)))
+                yield "{:15}\t{:7}\t{}"
+                yield 'language', 'size', 'name'
                 for snippet_file in snippet.filenames:
-                    yield ('N.A.',
+                    yield (None,
                             0,
                             snippet_file)
             except HTTPError as err:
@@ -312,9 +344,11 @@ class BitbucketService(RepositoryService):
             raise ResourceError("Couldn't create request: {}".format(err)) from err
 
     def request_list(self, user, repo):
+        yield "{}\t{:<60}\t{}"
+        yield 'id', 'title', 'URL'
         requests = set(
             (
-                str(r.id),
+                r.id,
                 r.title,
                 r.links['html']['href']
             ) for r in self.bb.repositoryPullRequestsInState(
@@ -329,6 +363,11 @@ class BitbucketService(RepositoryService):
             except Exception as err:
                 log.warn('Error while fetching request information: {}'.format(pull))
 
+    def get_requests(self, user, repo):
+        for r in self.bb.repositoryPullRequestsInState(owner=user, repository_name=repo, state='open'):
+            if not isinstance(r, dict): # if no PR is empty, result is a dict
+                yield r.id, r.title, dateutil.parser.parse(r.updated_on), r.links['html']['href']
+
     def request_fetch(self, user, repo, request, pull=False):
         if pull:
             raise NotImplementedError('Pull operation on requests for merge are not yet supported')
@@ -471,8 +510,7 @@ class BitbucketService(RepositoryService):
     @property
     def user(self):
         try:
-            user = next(self.bb.userForMyself()).username
-            return user
+            return self.get_identity(lambda: next(self.bb.userForMyself()).username)
         except (HTTPError, AttributeError) as err:
             raise ResourceError("Couldn't find the current user: {}".format(err)) from err
 
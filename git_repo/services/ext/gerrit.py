@@ -3,6 +3,8 @@
 from ...exceptions import ResourceNotFoundError
 from ..service import register_target, RepositoryService
 
+from datetime import datetime, timezone
+
 from gerritclient import client
 from gerritclient.error import HTTPError
 
@@ -18,7 +20,7 @@ class GerritService(RepositoryService):
     def create_connection(self):
         self.connection = client.connect(self.url_ro, auth_type=self.auth_type,
                                     username=self._username, password=self._privatekey)
-        self._session = self.connection.session
+        self._session = self.configure_session(self.connection.session)
 
     def connect(self):
         if not hasattr(self, 'connection'):
@@ -164,3 +166,26 @@ class GerritService(RepositoryService):
         yield ['id', 'branch', 'subject', 'url']
         for change in changes:
             yield [change['_number'], change['branch'], change['subject'], '{}/{}'.format(self.url_ro, change['_number'])]
+
+    @staticmethod
+    def _parse_date(date):
+        # dates are given in UTC, with nanoseconds
+        return datetime.strptime(date[:26], '%Y-%m-%d %H:%M:%S.%f').replace(tzinfo=timezone.utc)
+
+    def get_requests(self, user, repo):
+        for change in self.change_client.get_all(['project:{} status:open'.format(self.repo_name(user, repo))]):
+            yield (change['_number'], change['subject'], self._parse_date(change['updated']),
+                   '{}/{}'.format(self.url_ro, change['_number']))
+
+    def get_namespace_requests(self, namespace):
+        # changes are sorted by last update, and given by pages
+        query = 'status:open projects:{}/'.format(namespace)
+        skip = 0
+        while True:
+            changes = self.change_client.get_all([query], limit=100, skip=skip)
+            for change in changes:
+                yield (change['project'], change['_number'], change['subject'],
+                       self._parse_date(change['updated']), '{}/{}'.format(self.url_ro, change['_number']))
+            if not changes or not changes[-1].get('_more_changes', False):
+                break
+            skip += len(changes)
@@ -14,6 +14,9 @@ class GitbucketService(GithubService):
     fqdn = "localhost"
     port = 8080
 
+    # GitBucket only implements the REST API of GitHub
+    graphql_api = False
+
     def __init__(self, *args, **kwarg):
         super(GitbucketService, self).__init__(*args, **kwarg)
 
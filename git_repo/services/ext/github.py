@@ -4,25 +4,58 @@ import logging
 log = logging.getLogger('git_repo.github')
 
 from ..service import register_target, RepositoryService, os
+from ..aio import register_async, AsyncRepositoryService
 from ...exceptions import ResourceError, ResourceExistsError, ResourceNotFoundError, ArgumentError
-from ...tools import columnize
+from ...tools import columnize, parallel_map
 
 import github3
+import asyncio
+import requests
+import dateutil.parser
 
 from git.exc import GitCommandError
 
-from datetime import datetime
 
 GITHUB_COM_FQDN = 'github.com'
 
+# statistics of the repositories of an owner, for the long listing
+GRAPHQL_LIST_QUERY = '''
+query($login: String!, $first: Int!, $cursor: String) {
+  repositoryOwner(login: $login) {
+    repositories(first: $first, after: $cursor, ownerAffiliations: OWNER, orderBy: {field: NAME, direction: ASC}) {
+      pageInfo { hasNextPage endCursor }
+      nodes {
+        name isFork isPrivate isEmpty forkCount updatedAt
+        primaryLanguage { name }
+        stargazers { totalCount }
+        watchers { totalCount }
+        issues(states: OPEN) { totalCount }
+        pullRequests(states: OPEN) { totalCount }
+        defaultBranchRef { target { ... on Commit { history { totalCount } } } }
+      }
+    }
+  }
+}
+'''
+
 @register_target('hub', 'github')
 class GithubService(RepositoryService):
     fqdn = GITHUB_COM_FQDN
 
+    # whether the service has the GraphQL API
+    graphql_api = True
+    # number of repositories asked for in each GraphQL query, at most 100
+    graphql_page_size = 100
+
     def __init__(self, *args, **kwarg):
         self.gh = github3.GitHub()
         super(GithubService, self).__init__(*args, **kwarg)
 
+    def load_configuration(self, c, hc=[]):
+        CONFIG_TRUE=('on', 'true', 'yes', '1')
+        super(GithubService, self).load_configuration(c, hc)
+        self.graphql = self.graphql_api and c.get('graphql', 'false').lower() in CONFIG_TRUE
+
     def connect(self):
         if self.fqdn != GITHUB_COM_FQDN:
             # upgrade self.gh from a GitHub object to a GitHubEnterprise object
@@ -30,11 +63,10 @@ class GithubService(RepositoryService):
             self.gh._session.base_url = gh._session.base_url
             gh._session = self.gh._session
             self.gh = gh
-            # propagate ssl certificate parameter
-            self.gh._session.verify = self.session_certificate or not self.session_insecure
+        self.configure_session(self.gh._session)
         try:
             self.gh.login(token=self._privatekey)
-            self.username = self.gh.user().login
+            self.username = self.user
         except github3.models.GitHubError as err:
             if 401 == err.code:
                 if not self._privatekey:
@@ -87,68 +119,184 @@ class GithubService(RepositoryService):
                                               'Check the namespace or the private token\'s privileges') from err
             raise ResourceError('Unhandled exception: {}'.format(err)) from err
 
-    def list(self, user, _long=False):
+    def _get_repositories(self, user):
         if not self.gh.user(user):
             raise ResourceNotFoundError("User {} does not exists.".format(user))
+        return self.gh.iter_user_repos(user)
+
+    def get_repository_slugs(self, user):
+        for repo in self._get_repositories(user):
+            yield "/".join([user, repo.name])
 
-        repositories = self.gh.iter_user_repos(user)
+    def list(self, user, _long=False):
         if not _long:
-            repositories = list(["/".join([user, repo.name]) for repo in repositories])
-            yield "{}"
-            yield ("Total repositories: {}".format(len(repositories)),)
-            yield from columnize(repositories)
+            yield columnize
+            yield ('Name',)
+            total = 0
+            for total, slug in enumerate(self.get_repository_slugs(user), 1):
+                yield (slug,)
+            return "Total repositories: {}".format(total)
         else:
+            rows = self._get_graphql_rows(user) if self.graphql else None
+            if rows is None:
+                repositories = self._get_repositories(user)
+                # statistics of each repository are fetched in parallel, rows
+                # are kept in the same order as the repositories listing
+                rows = parallel_map(lambda repo: self._list_long_row(user, repo), repositories, self.jobs)
             yield "{}\t{}\t{}\t{}\t{}\t{}\t{}\t{}\t{}\t{:12}\t{}"
             yield ['Status', 'Commits', 'Reqs', 'Issues', 'Forks', 'Coders', 'Watch', 'Likes', 'Lang', 'Modif', 'Name']
-            for repo in repositories:
+            for row in rows:
+                if row:
+                    yield row
+
+    @property
+    def graphql_url(self):
+        if self.fqdn == GITHUB_COM_FQDN:
+            return 'https://api.github.com/graphql'
+        return '{}/api/graphql'.format(RepositoryService.build_url(self))
+
+    def _query_graphql(self, query, **variables):
+        response = self.gh._session.post(self.graphql_url, json=dict(query=query, variables=variables))
+        response.raise_for_status()
+        result = response.json()
+        if result.get('errors'):
+            raise ResourceError('GraphQL query failed: {}'.format(
+                '; '.join(error.get('message', '?') for error in result['errors'])))
+        return result['data']
+
+    def _get_graphql_rows(self, user):
+        '''Rows of the long listing, for a page of repositories per query
+
+        Gives None when the first query fails, for the listing to go through the
+        REST API instead.
+        '''
+        def query(cursor):
+            return self._query_graphql(GRAPHQL_LIST_QUERY, login=user, first=self.graphql_page_size,
+                                       cursor=cursor)['repositoryOwner']
+        try:
+            owner = query(None)
+        except (requests.RequestException, ResourceError, ValueError) as err:
+            log.debug('Cannot list the repositories through GraphQL, using REST: {}'.format(err))
+            return None
+        if owner is None:
+            # let the REST API tell what is wrong with that namespace
+            return None
+
+        def rows(owner):
+            listed = set()
+            while True:
+                repositories = owner['repositories']
+                for repo in repositories['nodes']:
+                    listed.add(repo['name'])
+                    yield self._graphql_row(user, repo)
+                if not repositories['pageInfo']['hasNextPage']:
+                    return
                 try:
-                    if repo.updated_at.year < datetime.now().year:
-                        date_fmt = "%b %d %Y"
-                    else:
-                        date_fmt = "%b %d %H:%M"
-
-                    status = ''.join([
-                        'F' if repo.fork else ' ',               # is a fork?
-                        'P' if repo.private else ' ',            # is private?
-                    ])
-                    nb_pulls = len(list(repo.iter_pulls()))
-                    nb_issues = len(list(repo.iter_issues())) - nb_pulls
-                    yield [
-                        # status
-                        status,
-                        # stats
-                        str(len(list(repo.iter_commits()))),          # number of commits
-                        str(nb_pulls),                                # number of pulls
-                        str(nb_issues),                               # number of issues
-                        str(repo.forks),                              # number of forks
-                        str(len(list(repo.iter_contributors()))),     # number of contributors
-                        str(repo.watchers),                           # number of subscribers
-                        str(repo.stargazers or 0),                    # number of ♥
-                        # info
-                        repo.language or '?',                      # language
-                        repo.updated_at.strftime(date_fmt),      # date
-                        '/'.join([user, repo.name]),             # name
-                    ]
-                except Exception as err:
-                    if 'Git Repository is empty.' == err.args[0].json()['message']:
-                        yield [
-                            # status
-                            'E',
-                            # stats
-                            'ø',     # number of commits
-                            'ø',     # number of pulls
-                            'ø',     # number of issues
-                            'ø',     # number of forks
-                            'ø',     # number of contributors
-                            'ø',     # number of subscribers
-                            'ø',     # number of ♥
-                            # info
-                            '?',     # language
-                            repo.updated_at.strftime(date_fmt),      # date
-                            '/'.join([user, repo.name]),             # name
-                        ]
-                    else:
-                        print("Cannot show repository {}: {}".format('/'.join([user, repo.name]), err))
+                    owner = query(repositories['pageInfo']['endCursor'])
+                    if owner is None:
+                        raise ResourceError('GraphQL query failed: {} is gone'.format(user))
+                except (requests.RequestException, ResourceError, ValueError) as err:
+                    # the repositories that are not listed yet are listed through REST
+                    log.warning('Cannot list the repositories through GraphQL, using REST: {}'.format(err))
+                    repositories = (repo for repo in self._get_repositories(user) if repo.name not in listed)
+                    yield from parallel_map(lambda repo: self._list_long_row(user, repo), repositories, self.jobs)
+                    return
+        return rows(owner)
+
+    def _graphql_row(self, user, repo):
+        branch = repo['defaultBranchRef']
+        if repo['isEmpty'] or not branch:
+            return [
+                # status
+                'E',
+                # stats
+                None,    # number of commits
+                None,    # number of pulls
+                None,    # number of issues
+                None,    # number of forks
+                None,    # number of contributors
+                None,    # number of subscribers
+                None,    # number of ♥
+                # info
+                '?',     # language
+                dateutil.parser.parse(repo['updatedAt']),   # date
+                '/'.join([user, repo['name']]),             # name
+            ]
+        return [
+            # status
+            ''.join([
+                'F' if repo['isFork'] else ' ',            # is a fork?
+                'P' if repo['isPrivate'] else ' ',         # is private?
+            ]),
+            # stats
+            branch['target']['history']['totalCount'],     # number of commits
+            repo['pullRequests']['totalCount'],            # number of pulls
+            repo['issues']['totalCount'],                  # number of issues
+            repo['forkCount'],                             # number of forks
+            None,                                          # number of contributors
+            repo['watchers']['totalCount'],                # number of subscribers
+            repo['stargazers']['totalCount'],              # number of ♥
+            # info
+            (repo['primaryLanguage'] or {}).get('name') or '?',  # language
+            dateutil.parser.parse(repo['updatedAt']),      # date
+            '/'.join([user, repo['name']]),                # name
+        ]
+
+    def _list_long_row(self, user, repo):
+        try:
+            status = ''.join([
+                'F' if repo.fork else ' ',               # is a fork?
+                'P' if repo.private else ' ',            # is private?
+            ])
+            nb_pulls = self._count(repo, 'pulls', lambda: len(list(repo.iter_pulls())))
+            nb_issues = self._count(repo, 'issues', lambda: len(list(repo.iter_issues()))) - nb_pulls
+            return [
+                # status
+                status,
+                # stats
+                self._count(repo, 'commits', lambda: len(list(repo.iter_commits()))),            # number of commits
+                nb_pulls,                                     # number of pulls
+                nb_issues,                                    # number of issues
+                repo.forks,                                   # number of forks
+                self._count(repo, 'contributors', lambda: len(list(repo.iter_contributors()))),  # number of contributors
+                repo.watchers,                                # number of subscribers
+                repo.stargazers or 0,                         # number of ♥
+                # info
+                repo.language or '?',                      # language
+                repo.updated_at,                         # date
+                '/'.join([user, repo.name]),             # name
+            ]
+        except (github3.models.GitHubError, requests.RequestException) as err:
+            # the counts fail on empty repositories. Other failures skip the repository,
+            # instead of stopping the rows made by the other workers of the listing
+            response = getattr(err, 'response', None)
+            try:
+                message = response.json().get('message') if response is not None else None
+            except (ValueError, AttributeError):
+                message = None
+            if 'Git Repository is empty.' == message:
+                return [
+                    # status
+                    'E',
+                    # stats
+                    None,    # number of commits
+                    None,    # number of pulls
+                    None,    # number of issues
+                    None,    # number of forks
+                    None,    # number of contributors
+                    None,    # number of subscribers
+                    None,    # number of ♥
+                    # info
+                    '?',     # language
+                    repo.updated_at,                         # date
+                    '/'.join([user, repo.name]),             # name
+                ]
+            log.warning("Cannot show repository {}: {}".format('/'.join([user, repo.name]), err))
+
+    def _count(self, repo, collection, fallback):
+        # ask for a single object per page, so the page number of the last page is the total
+        return self.count_objects(self.gh._session, '/'.join([repo._api, collection]),
+                                  params=dict(per_page=1), fallback=fallback)
 
     def _format_gist(self, gist):
         return gist.split('https://gist.github.com/')[-1].split('.git')[0]
@@ -157,7 +305,7 @@ class GithubService(RepositoryService):
         if not gist:
             yield "{:45.45} {}"
             yield 'title', 'url'
-            for gist in self.gh.iter_gists(self.gh.user().login):
+            for gist in self.gh.iter_gists(self.user):
                 yield gist.description, gist.html_url
         else:
             gist = self.gh.gist(self._format_gist(gist))
@@ -307,7 +455,39 @@ class GithubService(RepositoryService):
         yield "{}\t{:<60}\t{}"
         yield 'id', 'title', 'URL'
         for pull in repository.iter_pulls():
-            yield str(pull.number), pull.title, pull.links['html']
+            yield pull.number, pull.title, pull.links['html']
+
+    def get_requests(self, user, repo):
+        repository = self.gh.repository(user, repo)
+        if not repository:
+            raise ResourceNotFoundError('Repository {}/{} does not exists.'.format(user, repo))
+        for pull in repository.iter_pulls(state='open'):
+            yield pull.number, pull.title, pull.updated_at, pull.links['html']
+
+    # the search API does not give more results than that for a query
+    _max_search_results = 1000
+
+    def get_namespace_requests(self, namespace):
+        # the user qualifier matches the repositories of organizations as well
+        response = self.gh._session.get(self.gh._build_url('search', 'issues'), params=dict(
+            q='is:pr is:open user:{}'.format(namespace), sort='updated', order='desc', per_page=100))
+        if response.status_code == 422:
+            raise ResourceNotFoundError("User {} does not exists.".format(namespace))
+        response.raise_for_status()
+        if response.json()['total_count'] > self._max_search_results:
+            yield from super().get_namespace_requests(namespace)
+            return
+        while True:
+            for issue in response.json()['items']:
+                yield (issue['repository_url'].split('/repos/')[-1],
+                       issue['number'],
+                       issue['title'],
+                       dateutil.parser.parse(issue['updated_at']),
+                       issue['html_url'])
+            if 'next' not in response.links:
+                break
+            response = self.gh._session.get(response.links['next']['url'])
+            response.raise_for_status()
 
     def request_fetch(self, user, repo, request, pull=False, force=False):
         if pull:
@@ -362,7 +542,7 @@ class GithubService(RepositoryService):
 
     @property
     def user(self):
-        return self.gh.user().login
+        return self.get_identity(lambda: self.gh.user().login)
 
     def get_repository(self, user, repo):
         repository = self.gh.repository(user, repo)
@@ -378,3 +558,84 @@ class GithubService(RepositoryService):
     def get_project_default_branch(project):
        return project.default_branch or 'master'
 
+
+@register_async(GithubService)
+class AsyncGithubService(AsyncRepositoryService):
+    '''Non-blocking implementation of the GitHub v3 API'''
+
+    @property
+    def api_url(self):
+        if self.service.fqdn == GITHUB_COM_FQDN:
+            return 'https://api.github.com'
+        return '/'.join([RepositoryService.build_url(self.service), 'api', 'v3'])
+
+    @property
+    def headers(self):
+        headers = dict(Accept='application/vnd.github.v3+json')
+        if self.service._privatekey:
+            headers['Authorization'] = 'token {}'.format(self.service._privatekey)
+        return headers
+
+    async def get_user(self):
+        return (await self.get('user'))['login']
+
+    async def get_repositories(self, user):
+        try:
+            await self.get('users/{}'.format(user))
+        except ResourceNotFoundError as err:
+            raise ResourceNotFoundError("User {} does not exists.".format(user)) from err
+        return await self.paginate('users/{}/repos'.format(user))
+
+    async def get_repository(self, user, repo):
+        try:
+            return await self.get('repos/{}/{}'.format(user, repo))
+        except ResourceNotFoundError as err:
+            raise ResourceNotFoundError('Repository {}/{} does not exists.'.format(user, repo)) from err
+
+    async def get_parent_project_url(self, user, repo, rw=True):
+        parent = (await self.get_repository(user, repo)).get('parent', None)
+        if not parent:
+            return None
+        return self.service.format_path(
+                repository=parent['name'],
+                namespace=parent['owner']['login'],
+                rw=rw)
+
+    def get_slug(self, repository):
+        return repository['full_name']
+
+    async def get_list_row(self, user, repository):
+        status = ''.join([
+            'F' if repository['fork'] else ' ',      # is a fork?
+            'P' if repository['private'] else ' ',   # is private?
+        ])
+        path = 'repos/{}'.format(repository['full_name'])
+        try:
+            commits, pulls, issues, contributors = await asyncio.gather(*(
+                self.count('/'.join([path, collection]))
+                for collection in ('commits', 'pulls', 'issues', 'contributors')))
+        except ResourceError as err:
+            if 'Git Repository is empty.' not in str(err):
+                raise
+            status, commits, pulls, issues, contributors = 'E', None, None, None, None
+        return [
+            status,
+            commits,                                     # number of commits
+            pulls,                                       # number of pulls
+            issues - pulls if issues is not None else None,  # number of issues
+            repository['forks_count'],                   # number of forks
+            contributors,                                # number of contributors
+            repository['watchers_count'],                # number of subscribers
+            repository['stargazers_count'] or 0,         # number of ♥
+            repository['language'] or '?',               # language
+            dateutil.parser.parse(repository['updated_at']),  # date
+            repository['full_name'],                     # name
+        ]
+
+    async def request_list(self, user, repo):
+        return [(pull['number'], pull['title'], pull['html_url'])
+                for pull in await self.paginate('repos/{}/{}/pulls'.format(user, repo))]
+
+    async def gist_list(self):
+        return [(gist['description'], gist['html_url'])
+                for gist in await self.paginate('users/{}/gists'.format(await self.user()))]
@@ -4,6 +4,7 @@ import logging
 log = logging.getLogger('git_repo.gitlab')
 
 from ..service import register_target, RepositoryService
+from ..aio import register_async, AsyncRepositoryService
 from ...exceptions import ArgumentError, ResourceError, ResourceExistsError, ResourceNotFoundError
 from ...tools import columnize
 
@@ -13,9 +14,12 @@ from gitlab.exceptions import GitlabListError, GitlabCreateError, GitlabGetError
 from git.exc import GitCommandError
 
 import os
-import json, time
+import re
+import json
+import asyncio
 import dateutil.parser
-from datetime import datetime
+
+from urllib.parse import quote_plus, urlparse
 
 @register_target('lab', 'gitlab')
 class GitlabService(RepositoryService):
@@ -28,18 +32,20 @@ class GitlabService(RepositoryService):
         super().__init__(*args, **kwarg)
 
     def connect(self):
-        if self.session_proxy:
-            self.gl.session.proxies.update(self.session_proxy)
-
         self.gl = gitlab.Gitlab(self.url_ro,
                 session=self.session,
                 private_token=self._privatekey
         )
 
-        self.gl.ssl_verify = self.session_certificate or not self.session_insecure
+        # python-gitlab passes its own verify setting along every request
+        self.gl.ssl_verify = self.configure_session(self.session).verify
 
-        self.gl.auth()
-        self.username = self.gl.user.username
+        self.username = self.user
+
+    @property
+    def api_url(self):
+        '''Base URL of the requests made without python-gitlab, which go to the v4 API whatever version the client uses'''
+        return '/'.join([self.url_ro, 'api', 'v4'])
 
     def create(self, user, repo, add=False):
         try:
@@ -82,48 +88,81 @@ class GitlabService(RepositoryService):
         except Exception as err:
             raise ResourceError("Unhandled exception: {}".format(err)) from err
 
-    def list(self, user, _long=False):
-        if not self.gl.users.search(user):
-            raise ResourceNotFoundError("User {} does not exists.".format(user))
+    def _get_repositories(self, user, simple=False):
+        # a namespace is either a user or a group, whose projects are listed
+        # from the oldest, page by page, as the pages come
+        params = dict(order_by='id', sort='asc', per_page=100, pagination='keyset')
+        if simple:
+            params['simple'] = 'true'
+        for kind in ('users', 'groups'):
+            url = '{}/{}/{}/projects'.format(self.api_url, kind, quote_plus(user))
+            response = self._get_projects_page(url, params)
+            if response.status_code != 404:
+                break
+        else:
+            raise ResourceNotFoundError("Namespace {} does not exists.".format(user))
+        while True:
+            response.raise_for_status()
+            yield from response.json()
+            if 'next' not in response.links:
+                break
+            response = self._get_projects_page(response.links['next']['url'])
+
+    def _get_projects_page(self, url, params=None):
+        response = self.session.get(url, params=params, headers=self.gl.headers, verify=self.gl.ssl_verify)
+        # the keyset pagination is not available on all the endpoints and
+        # versions, the offset pagination is used there instead
+        if response.status_code in (400, 405) and params and 'pagination' in params:
+            params = {name: value for name, value in params.items() if name != 'pagination'}
+            response = self.session.get(url, params=params, headers=self.gl.headers, verify=self.gl.ssl_verify)
+        return response
+
+    def get_repository_slugs(self, user):
+        for repo in self._get_repositories(user, simple=True):
+            yield repo['path_with_namespace']
 
-        repositories = self.gl.projects.list(author=user, safe_all=True)
+    def list(self, user, _long=False):
         if not _long:
-            repositories = list([repo.path_with_namespace for repo in repositories])
-            yield "{}"
-            yield ("Total repositories: {}".format(len(repositories)),)
-            yield from columnize(repositories)
+            yield columnize
+            yield ('Name',)
+            total = 0
+            for total, slug in enumerate(self.get_repository_slugs(user), 1):
+                yield (slug,)
+            return "Total repositories: {}".format(total)
         else:
+            repositories = self._get_repositories(user)
             yield "{}\t{}\t{}\t{}\t{}\t{}\t{}\t{}\t{}\t{:12}\t{}"
             yield ['Status', 'Commits', 'Reqs', 'Issues', 'Forks', 'Coders', 'Watch', 'Likes', 'Lang', 'Modif\t', 'Name']
             for repo in repositories:
-                time.sleep(0.5)
-                repo_last_activity_at = dateutil.parser.parse(repo.last_activity_at)
-                if repo_last_activity_at.year < datetime.now().year:
-                    date_fmt = "%b %d %Y"
-                else:
-                    date_fmt = "%b %d %H:%M"
-
                 status = ''.join([
-                    'F' if False else ' ',               # is a fork?
-                    'P' if repo.visibility_level == 0 else ' ',            # is private?
+                    'F' if repo.get('forked_from_project') else ' ',    # is a fork?
+                    'P' if repo.get('visibility') == 'private' else ' ',  # is private?
                 ])
+                project = lambda: self.gl.projects.get(repo['id'])
                 yield [
                                                                # status
                     status,
                                                                # stats
-                    str(len(repo.commits.list(all=True))),       # number of commits
-                    str(len(repo.mergerequests.list(all=True))), # number of pulls
-                    str(len(repo.issues.list(all=True))),        # number of issues
-                    str(repo.forks_count),                     # number of forks
-                    str(len(repo.members.list(all=True))),       # number of contributors
-                    'N.A.',                                    # number of subscribers
-                    str(repo.star_count),                      # number of ♥
+                    self._count(repo, 'repository/commits', lambda: len(project().commits.list(all=True))),    # number of commits
+                    self._count(repo, 'merge_requests', lambda: len(project().mergerequests.list(all=True))),  # number of pulls
+                    self._count(repo, 'issues', lambda: len(project().issues.list(all=True))),                 # number of issues
+                    repo['forks_count'],                       # number of forks
+                    self._count(repo, 'members', lambda: len(project().members.list(all=True))),               # number of contributors
+                    None,                                      # number of subscribers
+                    repo['star_count'],                        # number of ♥
                                                                # info
-                    'N.A.',                                    # language
-                    repo_last_activity_at.strftime(date_fmt),  # date
-                    repo.name_with_namespace,                  # name
+                    None,                                      # language
+                    dateutil.parser.parse(repo['last_activity_at']),  # date
+                    repo['name_with_namespace'],               # name
                 ]
 
+    def _count(self, repo, collection, fallback):
+        # ask for a single object per page, the total is given by the X-Total header
+        return self.count_objects(self.session,
+                                  '{}/projects/{}/{}'.format(self.api_url, repo['id'], collection),
+                                  params=dict(per_page=1), fallback=fallback,
+                                  headers=self.gl.headers, verify=self.gl.ssl_verify)
+
     @classmethod
     def get_auth_token(cls, login, password, prompt=None):
         gl = gitlab.Gitlab(url='https://{}'.format(cls.fqdn), email=login, password=password)
@@ -332,11 +371,37 @@ class GitlabService(RepositoryService):
         yield "{:>3}\t{:<60}\t{:2}"
         yield ('id', 'title', 'URL')
         for mr in self.gl.project_mergerequests.list(project_id=project.id):
-            yield ( str(mr.iid),
+            yield ( mr.iid,
                     mr.title,
                     mr.web_url
                     )
 
+    def get_requests(self, user, repo):
+        project = self.gl.projects.get('/'.join([user, repo]))
+        for mr in self.gl.project_mergerequests.list(project_id=project.id, state='opened', all=True):
+            yield mr.iid, mr.title, dateutil.parser.parse(mr.updated_at), mr.web_url
+
+    def get_namespace_requests(self, namespace):
+        url = '{}/groups/{}/merge_requests'.format(self.api_url, quote_plus(namespace))
+        params = dict(state='opened', scope='all', order_by='updated_at', sort='desc', per_page=100)
+        response = self.session.get(url, params=params, headers=self.gl.headers, verify=self.gl.ssl_verify)
+        if response.status_code == 404:
+            # not a group, or a server that cannot list the requests of a group
+            yield from super().get_namespace_requests(namespace)
+            return
+        response.raise_for_status()
+        while True:
+            for mr in response.json():
+                yield (re.sub(r'(/-)?/merge_requests/\d+$', '', urlparse(mr['web_url']).path).strip('/'),
+                       mr['iid'],
+                       mr['title'],
+                       dateutil.parser.parse(mr['updated_at']),
+                       mr['web_url'])
+            if 'next' not in response.links:
+                break
+            response = self.session.get(response.links['next']['url'], headers=self.gl.headers, verify=self.gl.ssl_verify)
+            response.raise_for_status()
+
     def request_fetch(self, user, repo, request, pull=False, force=False):
         if pull:
             raise NotImplementedError('Pull operation on requests for merge are not yet supported')
@@ -372,7 +437,10 @@ class GitlabService(RepositoryService):
 
     @property
     def user(self):
-        return self.gl.user.username
+        def lookup():
+            self.gl.auth()
+            return self.gl.user.username
+        return self.get_identity(lookup)
 
     def get_repository(self, user, repo):
         try:
@@ -393,3 +461,83 @@ class GitlabService(RepositoryService):
         except gitlab.exceptions.GitlabGetError:
             return False
 
+
+@register_async(GitlabService)
+class AsyncGitlabService(AsyncRepositoryService):
+    '''Non-blocking implementation of the GitLab v4 API'''
+
+    list_header = ['Status', 'Commits', 'Reqs', 'Issues', 'Forks', 'Coders', 'Watch', 'Likes', 'Lang', 'Modif\t', 'Name']
+
+    @property
+    def api_url(self):
+        return self.service.api_url
+
+    @property
+    def headers(self):
+        headers = dict(Accept='application/json')
+        if self.service._privatekey:
+            headers['PRIVATE-TOKEN'] = self.service._privatekey
+        return headers
+
+    async def get_user(self):
+        return (await self.get('user'))['username']
+
+    async def get_repositories(self, user):
+        # a namespace is either a user or a group
+        try:
+            return await self.paginate('users/{}/projects'.format(quote_plus(user)))
+        except ResourceNotFoundError:
+            pass
+        try:
+            return await self.paginate('groups/{}/projects'.format(quote_plus(user)))
+        except ResourceNotFoundError as err:
+            raise ResourceNotFoundError("Namespace {} does not exists.".format(user)) from err
+
+    async def get_repository(self, user, repo):
+        try:
+            return await self.get('projects/{}'.format(quote_plus('/'.join([user, repo]))))
+        except ResourceNotFoundError as err:
+            raise ResourceNotFoundError("Cannot get: repository {}/{} does not exists.".format(user, repo)) from err
+
+    async def get_parent_project_url(self, user, repo, rw=True):
+        parent = (await self.get_repository(user, repo)).get('forked_from_project', None)
+        if not parent:
+            return None
+        return self.service.format_path(
+                repository=parent['path'],
+                namespace=parent['namespace']['full_path'],
+                rw=rw)
+
+    def get_slug(self, repository):
+        return repository['path_with_namespace']
+
+    async def get_list_row(self, user, repository):
+        status = ''.join([
+            'F' if repository.get('forked_from_project') else ' ',   # is a fork?
+            'P' if repository.get('visibility') == 'private' else ' ',  # is private?
+        ])
+        path = 'projects/{}'.format(repository['id'])
+        commits, requests, issues, members = await asyncio.gather(*(
+            self.count('/'.join([path, collection]))
+            for collection in ('repository/commits', 'merge_requests', 'issues', 'members')))
+        return [
+            status,
+            commits,                                     # number of commits
+            requests,                                    # number of pulls
+            issues,                                      # number of issues
+            repository.get('forks_count'),               # number of forks
+            members,                                     # number of contributors
+            None,                                        # number of subscribers
+            repository.get('star_count'),                # number of ♥
+            None,                                        # language
+            dateutil.parser.parse(repository['last_activity_at']),  # date
+            repository['name_with_namespace'],           # name
+        ]
+
+    async def request_list(self, user, repo):
+        project = quote_plus('/'.join([user, repo]))
+        return [(request['iid'], request['title'], request['web_url'])
+                for request in await self.paginate('projects/{}/merge_requests'.format(project), dict(state='opened'))]
+
+    async def gist_list(self):
+        return [(snippet['title'], snippet['web_url']) for snippet in await self.paginate('snippets')]
@@ -5,12 +5,11 @@ log = logging.getLogger('git_repo.gogs')
 
 from ..service import register_target, RepositoryService, os
 from ...exceptions import ResourceError, ResourceExistsError, ResourceNotFoundError
-from ...tools import columnize
+from ...tools import columnize, parallel_map
 
 from gogs_client import GogsApi, GogsRepo, Token, UsernamePassword, ApiFailure
 from requests import Session, HTTPError
 from urllib.parse import urlparse, urlunparse
-from datetime import datetime
 import dateutil.parser
 import functools
 
@@ -20,6 +19,8 @@ from git.exc import GitCommandError
 class GogsClient(GogsApi):
     def __init__(self):
         self.session = Session()
+        # largest page seen of each collection, see GogsService._count()
+        self.page_lengths = dict()
 
     def setup(self, *args, **kwarg):
         super().__init__(*args, session=self.session, **kwarg)
@@ -30,9 +31,7 @@ class GogsClient(GogsApi):
     def set_default_private(self, p):
         self.default_private = p
 
-    def setup_session(self, ssl_config, proxy=dict()):
-        self.session.verify = ssl_config
-        self.session.proxies.update(proxy)
+    def setup_session(self):
         # this is required to detect fresh GoGS server that redirects everything to /install
         self.session.max_redirects = 0
 
@@ -65,11 +64,22 @@ class GogsClient(GogsApi):
     def repository(self, user, repo):
         return self.get_repo(self.auth, user, repo)
 
+    # number of objects asked for in each page, that Gogs ignores
+    page_size = 50
+
     def repositories(self, user):
-        r = self._get('/user/repos', auth=self.auth)
-        repositories = self._check_ok(r).json()
-        repositories = [repo for repo in repositories if repo['owner']['username'] == user]
-        return repositories
+        # the private repositories of an organization are only listed by its own endpoint
+        if user != self.username and user in self.orgs():
+            path = '/orgs/{}/repos'.format(user)
+        else:
+            path = '/users/{}/repos'.format(user)
+        params = dict(limit=self.page_size)
+        # Gitea pages the repositories, Gogs gives them all at once
+        while path:
+            response = self._check_ok(self._get(path, auth=self.auth, params=params))
+            # the authenticated user is also given the repositories they collaborate on
+            yield from (repo for repo in response.json() if repo['owner']['username'] == user)
+            path, params = response.links.get('next', {}).get('url'), {}
 
 @register_target('gg', 'gogs')
 class GogsService(RepositoryService):
@@ -84,9 +94,8 @@ class GogsService(RepositoryService):
         self.gg.setup(self.url_ro)
         self.gg.set_token(self._privatekey)
         self.gg.set_default_private(self.default_create_private)
-        self.gg.setup_session(
-                self.session_certificate or not self.session_insecure,
-                self.session_proxy)
+        self.gg.setup_session()
+        self.configure_session(self.gg.session)
         try:
             self.username = self.user  # Call to self.gg.authenticated_user()
         except HTTPError as err:
@@ -118,7 +127,10 @@ class GogsService(RepositoryService):
 
     @property
     def user(self):
-        return self.gg.username
+        username = self.get_identity(lambda: self.gg.username)
+        # spare the client its own lookup
+        self.gg._username = username
+        return username
 
     def create(self, user, repo, add=False):
         try:
@@ -152,48 +164,87 @@ class GogsService(RepositoryService):
         except Exception as err:
             raise ResourceError("Unhandled exception: {}".format(err)) from err
 
+    def _get_repositories(self, user):
+        try:
+            yield from self.gg.repositories(user)
+        except ApiFailure as err:
+            if err.status_code == 404:
+                raise ResourceNotFoundError("User {} does not exists.".format(user)) from err
+            raise ResourceError("Unhandled error: {}".format(err)) from err
+
+    def get_repository_slugs(self, user):
+        for repo in self._get_repositories(user):
+            yield repo['full_name']
+
     def list(self, user, _long=False):
-        repositories = self.gg.repositories(user)
-        if user != self.username and not repositories and user not in self.orgs:
-            raise ResourceNotFoundError("Unable to list namespace {} - only authenticated user and orgs available for listing.".format(user))
         if not _long:
-            repositories = list([repo['full_name'] for repo in repositories])
-            yield "{}"
-            yield ("Total repositories: {}".format(len(repositories)),)
-            yield from columnize(repositories)
+            yield columnize
+            yield ('Name',)
+            total = 0
+            for total, slug in enumerate(self.get_repository_slugs(user), 1):
+                yield (slug,)
+            return "Total repositories: {}".format(total)
         else:
+            repositories = self._get_repositories(user)
             yield "{}\t{}\t{}\t{}\t{}\t{}\t{}\t{}\t{}\t{:12}\t{}"
             yield ['Status', 'Commits', 'Reqs', 'Issues', 'Forks', 'Coders', 'Watch', 'Likes', 'Lang', 'Modif\t', 'Name']
-            for repo in repositories:
-                repo_updated_at = dateutil.parser.parse(repo['updated_at'])
-                if repo_updated_at.year < datetime.now().year:
-                    date_fmt = "%b %d %Y"
-                else:
-                    date_fmt = "%b %d %H:%M"
-                status = ''.join([
-                    'F' if repo['fork'] else ' ',          # is a fork?
-                    'P' if repo['private'] else ' ',       # is private?
-                ])
-                try:
-                    issues = self.gg._check_ok(self.gg._get('/repos/{}/issues'.format(repo['full_name']), auth=self.auth)).json()
-                except Exception:
-                    issues = []
-                yield [
-                    # status
-                    status,
-                    # stats
-                    str(len(list(()))),                    # number of commits
-                    str(len(list(()))),                    # number of pulls
-                    str(len(list(issues))),                # number of issues
-                    str(repo.get('forks_count') or 0),     # number of forks
-                    str(len(list(()))),                    # number of contributors
-                    str(repo.get('watchers_count') or 0),  # number of subscribers
-                    str(repo.get('stars_count') or 0),     # number of ♥
-                    # info
-                    repo.get('language') or '?',           # language
-                    repo_updated_at.strftime(date_fmt),    # date
-                    repo['full_name'],                     # name
-                ]
+            # statistics of each repository are fetched in parallel, rows
+            # are kept in the same order as the repositories listing
+            yield from parallel_map(self._list_long_row, repositories, self.jobs)
+
+    def _list_long_row(self, repo):
+        status = ''.join([
+            'F' if repo['fork'] else ' ',          # is a fork?
+            'P' if repo['private'] else ' ',       # is private?
+        ])
+        return [
+            # status
+            status,
+            # stats
+            self._count(repo, 'commits'),          # number of commits
+            self._count(repo, 'pulls', state='open'),                  # number of pulls
+            self._count(repo, 'issues', state='open', type='issues'),  # number of issues
+            repo.get('forks_count') or 0,          # number of forks
+            None,                                  # number of contributors
+            repo.get('watchers_count') or 0,       # number of subscribers
+            repo.get('stars_count') or 0,          # number of ♥
+            # info
+            repo.get('language') or '?',           # language
+            dateutil.parser.parse(repo['updated_at']),  # date
+            repo['full_name'],                     # name
+        ]
+
+    def _count(self, repo, collection, **params):
+        # Gitea gives the total in a header, otherwise the pages are walked until
+        # one falls short, Gogs serving pages of its own size whatever the limit.
+        # Gogs has no API to list the commits and pulls, so they are not counted.
+        path = '/repos/{}/{}'.format(repo['full_name'], collection)
+        params = dict(params, limit=self.gg.page_size, page=1)
+        total, previous = 0, None
+        while True:
+            response = self.gg._get(path, auth=self.gg.auth, params=params)
+            if response.status_code == 404:
+                return None
+            # Gitea has no commits to give for empty repositories
+            if response.status_code == 409:
+                return 0
+            response.raise_for_status()
+            count = self.get_total(response.headers, {}, None)
+            if count is not None:
+                return count
+            page = response.json()
+            # a server ignoring the page asked for gives the same page again
+            if not page or page == previous:
+                return total
+            total += len(page)
+            # no page is larger than those of the server, so a page smaller than any
+            # seen before, for any repository, is the last one
+            largest = self.gg.page_lengths.get(collection, 0)
+            self.gg.page_lengths[collection] = max(largest, len(page))
+            if len(page) < largest:
+                return total
+            previous = page
+            params['page'] += 1
 
     def gist_list(self, gist=None):
         raise NotImplementedError
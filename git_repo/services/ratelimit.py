@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+
+import logging
+log = logging.getLogger('git_repo.ratelimit')
+
+import time
+import threading
+
+class RateLimiter:
+    '''Throttles the requests of a session based on the rate limit headers
+
+    The limiter is installed as a response hook on a `requests.Session`, and
+    reads the remaining budget and its reset time from the responses. It only
+    pauses when the budget is about to run out, until the budget is reset by
+    the service. Throttled responses (429) are retried after the delay asked
+    by the service.
+    '''
+
+    # (remaining, reset) header pairs, as sent by GitLab, GitHub and Gogs/Gitea
+    headers = (
+        ('RateLimit-Remaining', 'RateLimit-Reset'),
+        ('X-RateLimit-Remaining', 'X-RateLimit-Reset'),
+    )
+
+    # reset values smaller than that are a delay in seconds, not a timestamp
+    _max_reset_delay = 10**9
+
+    def __init__(self, threshold=5, max_retries=3):
+        '''
+        :param threshold: remaining budget under which the requests are paused
+        :param max_retries: number of times a throttled request is retried
+        '''
+        self.threshold = threshold
+        self.max_retries = max_retries
+        self.remaining = None
+        self.reset = None
+        self._lock = threading.Lock()
+
+    def install(self, session):
+        '''Registers the limiter on the session, once'''
+        if self.on_response not in session.hooks['response']:
+            session.hooks['response'].append(self.on_response)
+        return session
+
+    def update(self, response):
+        for remaining, reset in self.headers:
+            if remaining in response.headers:
+                try:
+                    remaining = int(response.headers[remaining])
+                    reset = float(response.headers.get(reset, 0)) or None
+                except ValueError:
+                    return
+                if reset and reset < self._max_reset_delay:
+                    reset += time.time()
+                with self._lock:
+                    self.remaining = remaining
+                    self.reset = reset
+                return
+
+    def _delay(self):
+        if self.remaining is None or self.remaining > self.threshold or not self.reset:
+            return 0
+        delay = max(self.reset - time.time(), 0)
+        self.remaining = None
+        self.reset = None
+        return delay
+
+    def delay(self):
+        '''Seconds to wait for the reset if the budget is about to run out, for non-blocking clients'''
+        with self._lock:
+            return self._delay()
+
+    def wait(self):
+        '''Sleeps until reset if the budget is about to run out'''
+        with self._lock:
+            delay = self._delay()
+            if delay > 0:
+                log.warning('API rate limit almost reached, waiting {:.0f}s…'.format(delay))
+                time.sleep(delay)
+
+    def on_response(self, response, *args, **kwarg):
+        self.update(response)
+        retries = 0
+        while response.status_code == 429 and retries < self.max_retries:
+            delay = response.headers.get('Retry-After', '')
+            delay = int(delay) if delay.isdigit() else 2**retries
+            log.warning('API rate limit reached, retrying in {}s…'.format(delay))
+            time.sleep(delay)
+            response = response.connection.send(response.request, **kwarg)
+            self.update(response)
+            retries += 1
+        self.wait()
+        return response
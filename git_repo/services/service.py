@@ -6,13 +6,16 @@ log = logging.getLogger('git_repo.base')
 import re
 import os
 import sys
+import copy
+import importlib
+import threading
 import webbrowser
 
-from git import RemoteProgress, config as git_config
+from git import RemoteProgress, PushInfo, Remote, config as git_config
 from progress.bar import IncrementalBar as Bar
 
 from enum import Enum
-from urllib.parse import ParseResult
+from urllib.parse import ParseResult, urlparse, parse_qs
 from subprocess import call
 
 from ..exceptions import (
@@ -21,6 +24,11 @@ from ..exceptions import (
         ResourceNotFoundError,
         ResourceExistsError
 )
+from ..tools import parallel_map, error_message
+from .. import instrumentation
+from .ratelimit import RateLimiter
+from .cache import HTTPCache, IdentityCache
+from .transport import Transport
 
 '''select open command'''
 
@@ -54,6 +62,142 @@ class ProgressBar(RemoteProgress): # pragma: no cover
         self.bar.goto(int(cur_count))
 
 
+class BatchProgressBar: # pragma: no cover
+    '''Single progress bar for git commands running in parallel on many repositories'''
+
+    def __init__(self, message, total):
+        self.bar = Bar(message=message, max=total, suffix='%(index)d/%(max)d')
+        self.lock = threading.Lock()
+        self.running = 0
+        self.failed = 0
+
+    def start(self, name):
+        with self.lock:
+            self.running += 1
+            self.update()
+
+    def finish(self, name, success=True):
+        with self.lock:
+            self.running -= 1
+            if not success:
+                self.failed += 1
+            self.bar.index += 1
+            self.update()
+
+    def update(self):
+        suffix = ['%(index)d/%(max)d']
+        if self.running:
+            suffix.append('{} running'.format(self.running))
+        if self.failed:
+            suffix.append('{} failed'.format(self.failed))
+        self.bar.suffix = ', '.join(suffix)
+        self.bar.update()
+
+    def close(self):
+        self.bar.finish()
+
+
+class ProgressLines: # pragma: no cover
+    '''One progress line for each of the git commands running in parallel'''
+
+    class Line(RemoteProgress):
+        stages = {
+            RemoteProgress.COUNTING: 'counting',
+            RemoteProgress.COMPRESSING: 'compressing',
+            RemoteProgress.WRITING: 'writing',
+            RemoteProgress.RECEIVING: 'receiving',
+            RemoteProgress.RESOLVING: 'resolving',
+        }
+
+        def __init__(self, lines, index):
+            super(ProgressLines.Line, self).__init__()
+            self.lines = lines
+            self.index = index
+
+        def update(self, op_code, cur_count, max_count=None, message=''):
+            stage = self.stages.get(op_code & RemoteProgress.OP_MASK, '')
+            percent = '{:.0%}'.format(float(cur_count)/float(max_count)) if max_count else ''
+            self.lines.set(self.index, ' '.join([stage, percent, message]).strip())
+
+    def __init__(self, names, file=None):
+        self.names = names
+        self.texts = ['' for _ in names]
+        self.width = max([len(name) for name in names] or [0])
+        self.file = file or sys.stderr
+        self.tty = self.file.isatty()
+        self.lock = threading.Lock()
+        if self.tty:
+            for index in range(len(names)):
+                print(self.format(index), file=self.file)
+
+    def format(self, index):
+        return '{:<{width}}  {}'.format(self.names[index], self.texts[index], width=self.width)
+
+    def line(self, index):
+        return ProgressLines.Line(self, index)
+
+    def set(self, index, text, final=False):
+        with self.lock:
+            self.texts[index] = text
+            if self.tty:
+                # go up to the line of the command, rewrite it, and go back down
+                up = len(self.names) - index
+                self.file.write('\033[{0}A\r\033[K{1}\033[{0}B\r'.format(up, self.format(index)))
+                self.file.flush()
+            elif final:
+                print(self.format(index), file=self.file)
+
+
+class ServiceMap(dict):
+    '''Registry of the service classes, importing their module on first access
+
+    Services registered with `register_module()` are known by name, but their
+    module is only imported, and their class registered by `register_target()`,
+    when the service is looked up.
+    '''
+    def __init__(self):
+        super(ServiceMap, self).__init__()
+        self.modules = dict()
+
+    def __missing__(self, name):
+        if name in self.modules:
+            log.debug('Loading service module: {}'.format(self.modules[name]))
+            importlib.import_module(self.modules[name], __package__)
+            if dict.__contains__(self, name):
+                return dict.__getitem__(self, name)
+        raise KeyError(name)
+
+    def __contains__(self, name):
+        return dict.__contains__(self, name) or name in self.modules
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
+
+    def get(self, name, default=None):
+        try:
+            return self[name]
+        except KeyError:
+            return default
+
+    def keys(self):
+        return sorted(set(dict.keys(self)) | set(self.modules))
+
+    def values(self):
+        return [self[name] for name in self.keys()]
+
+    def items(self):
+        return [(name, self[name]) for name in self.keys()]
+
+
+def register_module(repo_cmd, repo_service, module):
+    """Registers the module of a service, to be imported when the service is used"""
+    RepositoryService.service_map.modules[repo_service] = module
+    RepositoryService.command_map[repo_cmd] = repo_service
+
+
 def register_target(repo_cmd, repo_service):
     """Decorator to register a class with an repo_service"""
     def decorate(klass):
@@ -68,7 +212,7 @@ def register_target(repo_cmd, repo_service):
 
 class RepositoryService:
     '''Base class for all repository services'''
-    service_map = dict()
+    service_map = ServiceMap()
     command_map = dict()
 
     # this symbol is made available for testing purposes
@@ -77,9 +221,25 @@ class RepositoryService:
     config_options = [
             'type', 'token', 'alias', 'fqdn', 'remote',
             'port', 'scheme', 'insecure', 'name', 'command',
-            'server-cert'
+            'server-cert', 'jobs', 'cache', 'cache-size', 'transport',
+            'identity-ttl', 'async', 'connections', 'graphql'
             ]
 
+    '''number of API requests the service may run in parallel'''
+    jobs = 8
+
+    '''switch for the HTTP cache, when None it follows the service's configuration'''
+    use_cache = None
+
+    '''connections kept alive per host, when None it follows the number of jobs'''
+    pool_size = None
+
+    '''non-blocking implementation of the service, see `services.aio`'''
+    async_service = None
+
+    '''git progress reporter, when None a progress bar is shown for each git command'''
+    progress = None
+
     _max_nested_namespaces = 1
     _min_nested_namespaces = 1
 
@@ -98,6 +258,15 @@ class RepositoryService:
                 return config
         raise ResourceNotFoundError('User\'s Git configuration file not found!')
 
+    @staticmethod
+    def get_cache_path(*path):
+        home_dir = os.path.expanduser('~')
+        try:
+            from xdg.BaseDirectory import xdg_cache_home
+        except ImportError:
+            xdg_cache_home = os.path.join(home_dir, ".cache")
+        return os.path.join(xdg_cache_home, 'git-repo', *path)
+
     @staticmethod
     def convert_url_into_slug(url):
         if url.endswith('.git'):
@@ -148,11 +317,12 @@ class RepositoryService:
             config.set_value('alias', cls.command, 'repo {}'.format(cls.command))
 
     @classmethod
-    def get_service(cls, repository, command):
+    def get_service(cls, repository, command, **kwarg):
         '''Accessor for a repository given a command
 
         :param repository: git-python repository instance
         :param command: aliased name of the service
+        :param kwarg: settings overriding the configuration, see `__init__()`
         :return: instance for using the service
         '''
         if not repository:
@@ -186,9 +356,30 @@ class RepositoryService:
                 raise ValueError('Service type {} does not exists.'.format(config['type']))
             service = cls.service_map.get(config['type'], cls)
 
-        cls._current = service(repository, config, http_section)
+        cls._current = service(repository, config, http_section, **kwarg)
+        if cls._current.session_async and cls._current.async_service:
+            from .aio import SyncRepositoryService
+            cls._current = SyncRepositoryService(cls._current)
         return cls._current
 
+    def for_repository(self, repository):
+        '''Copy of the connected service, working on another local repository
+
+        :param repository: git-python repository instance
+        :return: instance for using the service on that repository
+
+        The copy shares the clients and sessions of the service, so it neither
+        reads the configuration nor connects again, which is what the commands
+        working on many repositories at once need.
+        '''
+        service = copy.copy(self)
+        service.repository = repository
+        return service
+
+    def close(self):
+        '''Releases what the service holds beyond its HTTP sessions'''
+        pass
+
     @classmethod
     def get_auth_token(cls, login, password, prompt=None):
         raise NotImplementedError
@@ -224,13 +415,25 @@ class RepositoryService:
         self.ssh_url = c.get('ssh-url', self.fqdn)
 
         self.session_insecure = c.get('insecure', 'false').lower() in CONFIG_TRUE
-        self.session_certificate = c.get('certificate', None)
+        self.session_certificate = c.get('server-cert', c.get('certificate', None))
         self.session_proxy = {cf['__name__']: cf['proxy'] for cf in hc if cf.get('proxy', None)}
 
-    def __init__(self, r=None, c=None, hc=[]):
+        self.jobs = int(c.get('jobs', self.jobs))
+
+        self.session_cache = c.get('cache', 'false').lower() in CONFIG_TRUE
+        self.session_cache_size = int(c.get('cache-size', 50))
+        self.session_transport = c.get('transport', 'http/1.1')
+        self.identity_ttl = int(c.get('identity-ttl', 3600))
+
+        self.session_async = c.get('async', 'false').lower() in CONFIG_TRUE
+        self.connections = int(c.get('connections', 100))
+
+    def __init__(self, r=None, c=None, hc=[], jobs=None, use_cache=None):
         '''
         :param r: git-python repository instance
         :param c: configuration data
+        :param jobs: number of API requests run in parallel, over the configuration
+        :param use_cache: switch for the HTTP cache, over the configuration
 
         Build a repository service instance, store configuration and parameters
         And launch the connection to the service
@@ -238,13 +441,71 @@ class RepositoryService:
 
         self.repository = r
         self.config = c
+        self.rate_limiter = RateLimiter()
 
         self.load_configuration(c, hc)
+        # the settings of the command line are set before connecting, as they size the session
+        if jobs:
+            self.jobs = jobs
+        if use_cache is not None:
+            self.use_cache = use_cache
 
         # if service has a repository configured, connect
         if r:
             self.connect()
 
+    def configure_session(self, session):
+        '''Setup the HTTP session used to talk with the service's API
+
+        :param session: requests session instance of the service's client
+        :return: the session
+
+        Meant to be called by subclasses when connecting, so all services
+        share the same behaviour over HTTP: the certificate checks and proxies
+        from the configuration, connection pools sized for the parallel requests,
+        the rate limit handling, the cache and the instrumentation.
+        '''
+        session.verify = self.session_certificate or not self.session_insecure
+        session.proxies.update(self.session_proxy)
+        Transport(self.session_transport, self.pool_size or self.jobs).install(session)
+        self.rate_limiter.install(session)
+        if self.cache_enabled:
+            HTTPCache(self.get_cache_path('http'),
+                      max_size=self.session_cache_size*1024*1024).install(session)
+        if instrumentation.collector is not None:
+            instrumentation.collector.install(session)
+        return session
+
+    @property
+    def cache_enabled(self):
+        '''Whether the API responses and identities can be kept on disk'''
+        return self.use_cache is not False and bool(self.use_cache or self.session_cache)
+
+    def get_identity(self, lookup):
+        '''Name of the user authenticated by the service's credentials
+
+        :param lookup: callable asking the service for the name of the user
+        :return: the name of the user
+
+        The name is memoized for the process, and on disk when the cache is
+        enabled, so the credentials are only checked against the service
+        when they have not been seen recently.
+        '''
+        if not self._privatekey:
+            return lookup()
+        cache, key = self.get_identity_cache()
+        return cache.lookup(key, lookup)
+
+    def get_identity_cache(self):
+        '''Cache of the identities, and the key of the service's credentials in it
+
+        Shared by the blocking and async clients, so that they memoize the
+        identities the same way.
+        '''
+        cache = IdentityCache(self.get_cache_path('identity') if self.cache_enabled else None,
+                              ttl=self.identity_ttl)
+        return cache, IdentityCache.key(self.name, self.fqdn, self._username, self._privatekey)
+
     '''URL handling'''
 
     '''name of the git user to use for SSH remotes'''
@@ -309,18 +570,79 @@ class RepositoryService:
         else:
             raise ArgumentError("Cannot tell how to handle this url: `{}/{}`!".format(namespace, repo))
 
+    '''Statistics'''
+
+    @staticmethod
+    def count_objects(session, url, params=None, fallback=None, **kwarg):
+        '''Count the objects of a paginated API collection with a single request
+
+        :param session: requests session to use for the request
+        :param url: URL of the collection
+        :param params: query parameters, that shall ask for one object per page
+        :param fallback: callable counting the objects by iterating over the collection
+        :return: the number of objects in the collection
+
+        The total is taken from the `X-Total` (GitLab) or `X-Total-Count` (Gitea)
+        headers, from the page number of the `Link: rel="last"` header (GitHub,
+        Gitea), or from the `size` field of the page (Bitbucket). When the service
+        gives no total, the fallback is called.
+        '''
+        response = session.get(url, params=params, **kwarg)
+        response.raise_for_status()
+        total = RepositoryService.get_total(response.headers, response.links, response.json())
+        if total is not None:
+            return total
+        if fallback:
+            return fallback()
+        raise ResourceError('Cannot count objects of {}'.format(url))
+
+    @staticmethod
+    def get_total(headers, links, page):
+        '''Number of objects of a collection, from its first page of one object
+
+        :param headers: headers of the response
+        :param links: `Link` header of the response, parsed by relation
+        :param page: decoded content of the response
+        :return: the number of objects, or None when the service does not tell
+        '''
+        for header in ('X-Total', 'X-Total-Count'):
+            if headers.get(header, '').isdigit():
+                return int(headers[header])
+        if 'last' in links:
+            last = parse_qs(urlparse(links['last']['url']).query).get('page', None)
+            if last:
+                return int(last[0])
+        if isinstance(page, dict) and 'size' in page:
+            return int(page['size'])
+        # no total given, but everything fits within a single page
+        if isinstance(page, list) and 'next' not in links:
+            return len(page)
+        return None
+
+    def get_progress(self, action=ProgressBar.Action.PULL):
+        '''Progress reporter for a git command
+
+        :param action: kind of git command
+        :return: the progress reporter set for the service, or a new progress bar
+        '''
+        if self.progress is not None:
+            return self.progress
+        pb = ProgressBar()
+        pb.setup(self.name, action)
+        return pb
+
     def pull(self, remote, branch=None):
         '''Pull a repository
         :param remote: git-remote instance
         :param branch: name of the branch to pull
         '''
-        pb = ProgressBar()
-        pb.setup(self.name)
+        pb = self.get_progress()
         if branch:
             remote.pull(branch, progress=pb)
         else: # pragma: no cover
             remote.pull(progress=pb)
-        print()
+        if self.progress is None:
+            print()
 
     def push(self, remote, branch=None):
         '''Push a repository
@@ -328,28 +650,70 @@ class RepositoryService:
         :param branch: name of the branch to push
         :return: PushInfo, git push output lines
         '''
-        pb = ProgressBar()
-        pb.setup(self.name, ProgressBar.Action.PUSH)
+        pb = self.get_progress(ProgressBar.Action.PUSH)
+        result = self.push_remote(remote, branch, pb)
+        if self.progress is None:
+            print()
+        return result, pb.other_lines
+
+    @staticmethod
+    def push_remote(remote, branch=None, progress=None):
         if branch:
-            result = remote.push(branch, progress=pb)
+            return remote.push(branch, progress=progress)
         else: #pragma: no cover
-            result = remote.push(progress=pb)
-        print()
-        return result, pb.other_lines
+            return remote.push(progress=progress)
+
+    @classmethod
+    def push_all(cls, repository, branch=None, jobs=None):
+        '''Push a repository to all the URLs of the `all` remote, in parallel
+
+        :param repository: git-python repository instance
+        :param branch: name of the branch to push, defaults to the current branch
+        :param jobs: number of pushes to run in parallel
+        :return: list of (destination, success, summary) tuples
+
+        Each destination is pushed through the remote holding its URL, or through
+        its URL when no remote has it. A failed push does not stop the others.
+        '''
+        try:
+            urls = list(repository.remote('all').urls)
+        except ValueError as err:
+            raise ResourceNotFoundError('No `all` remote in this repository.') from err
+        branch = branch or repository.active_branch.name
+
+        remotes = {url: remote for remote in repository.remotes if remote.name != 'all' for url in remote.urls}
+        destinations = [remotes.get(url, None) or Remote(repository, url) for url in urls]
+        lines = ProgressLines([destination.name for destination in destinations])
+
+        def push(index):
+            destination = destinations[index]
+            try:
+                infos = cls.push_remote(destination, branch, lines.line(index))
+                if not infos:
+                    raise ResourceError('Push failed.')
+                success = not any(info.flags & PushInfo.ERROR for info in infos)
+                summary = ', '.join('{} {}'.format(info.remote_ref_string, info.summary.strip()) for info in infos)
+            except Exception as err:
+                log.debug('Failed to push to {}: {}'.format(destination.name, err))
+                success, summary = False, error_message(err)
+            lines.set(index, '{} {}'.format('✓' if success else '✗', summary), final=True)
+            return destination.name, success, summary
+
+        return list(parallel_map(push, range(len(destinations)), jobs or cls.jobs))
 
     def fetch(self, remote, branch, local_branch = None, force=False):
         '''Pull a repository
         :param remote: git-remote instance
         :param branch: name of the branch to pull
         '''
-        pb = ProgressBar()
-        pb.setup(self.name)
+        pb = self.get_progress()
 
         if local_branch:
             branch = ':'.join([branch, local_branch])
 
         remote.fetch(branch, update_head_ok=True, force=force, progress=pb)
-        print()
+        if self.progress is None:
+            print()
 
     def clone(self, user, repo, branch=None, rw=True):
         '''Clones a new repository
@@ -539,6 +903,16 @@ class RepositoryService:
         '''
         raise NotImplementedError
 
+    def get_repository_slugs(self, user):
+        '''List the slugs of an user's repositories on the service
+
+        :param user: name of the user
+        :return: iterator of `namespace/repository` strings
+
+        Meant to be implemented by subclasses
+        '''
+        raise NotImplementedError
+
     def create(self, user, repo, add=False): #pragma: no cover
         '''Create a new remote repository on the service
 
@@ -603,6 +977,48 @@ class RepositoryService:
         '''
         raise NotImplementedError
 
+    def get_requests(self, user, repo):
+        '''Lists the open requests for merge of a repository
+
+        :param user: namespace of the repository
+        :param repo: name of the repository
+        :return: iterable of (id, title, date of last update, URL)
+
+        Meant to be implemented by subclasses
+        '''
+        raise NotImplementedError
+
+    def get_namespace_requests(self, namespace):
+        '''Lists the open requests for merge of all the repositories of a namespace
+
+        :param namespace: name of the user or organization
+        :return: iterable of (repository, id, title, date of last update, URL),
+                 the most recently updated first
+
+        Services that can search the requests of a whole namespace at once
+        overload it. By default, the requests of the repositories are listed
+        with `get_requests()`, `jobs` repositories at a time.
+        '''
+        def requests(slug):
+            user, repo = slug.rsplit('/', 1)
+            try:
+                return [(slug,) + tuple(request) for request in self.get_requests(user, repo)]
+            except ResourceError as err:
+                log.warning('Cannot list the requests of {}: {}'.format(slug, err))
+                return []
+        rows = [row for rows in parallel_map(requests, self.get_repository_slugs(namespace), self.jobs)
+                    for row in rows]
+        return sorted(rows, key=lambda row: row[3], reverse=True)
+
+    def namespace_request_list(self, namespace):
+        '''Lists the open requests for merge of a namespace, see `get_namespace_requests()`'''
+        yield "{}\t{}\t{:<60}\t{:12}\t{}"
+        yield ('repository', 'id', 'title', 'updated', 'URL')
+        total = 0
+        for total, request in enumerate(self.get_namespace_requests(namespace), 1):
+            yield request
+        return "Total requests: {}".format(total)
+
     def request_fetch(self, user, repo, request, pull=False, force=False): #pragma: no cover
         '''Fetches given request as a branch, and switch if pull is true
 
@@ -632,12 +1048,15 @@ class RepositoryService:
         raise NotImplementedError
 
 '''
-register all services by importing their modules, from the ext pagckage
+register all services from the ext package, without importing their modules
 
-they are registered using the `register_target()` decorator, and added
-to the `RepositorService.service_map` dictionary, and is accessed by the
+they are registered using the `register_module()` function, and imported the first
+time they are accessed in the `RepositorService.service_map` dictionary. Then the
+`register_target()` decorator adds the service class to it. It is accessed by the
 `main()` function using the `RepositoryService.get_service()` method.
 '''
 
-from .ext import *
+from .ext import services as ext_services
 
+for name, (command, module) in ext_services.items():
+    register_module(command, name, '.ext.{}'.format(module))
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+
+import logging
+log = logging.getLogger('git_repo.transport')
+
+import threading
+
+from requests.adapters import BaseAdapter, HTTPAdapter, DEFAULT_POOLSIZE
+from requests.exceptions import ConnectionError, Timeout
+from requests.models import Response
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers, select_proxy
+
+'''
+Registry of the transports that can carry the requests of the services' sessions.
+
+A transport is a callable that takes the number of connections to keep alive
+for each host, and returns a `requests` transport adapter. Other transports,
+like HTTP/2 capable ones, can be added with the `register_transport()` decorator.
+'''
+transports = dict()
+
+def register_transport(name):
+    '''Decorator to register a transport adapter factory by name'''
+    def decorate(factory):
+        transports[name] = factory
+        return factory
+    return decorate
+
+@register_transport('http/1.1')
+def http_adapter(pool_size):
+    return HTTPAdapter(pool_connections=DEFAULT_POOLSIZE, pool_maxsize=pool_size)
+
+@register_transport('http2')
+def http2_adapter(pool_size):
+    return HTTPXAdapter(pool_size)
+
+
+class HTTPXAdapter(BaseAdapter):
+    '''Transport adapter sending the requests of a `requests` session with httpx
+
+    httpx speaks HTTP/2 to the hosts that offer it, multiplexing the requests
+    over its connections, and HTTP/1.1 to the others. As httpx sets the TLS and
+    proxy settings for a whole client, a client is made for each combination of
+    them that the session asks for, all of them keeping `pool_size` connections
+    alive.
+    '''
+
+    def __init__(self, pool_size):
+        super().__init__()
+        try:
+            import httpx
+            # fails when the http2 extra of httpx is missing
+            httpx.Client(http2=True).close()
+        except ImportError as err:
+            raise ValueError('The http2 transport needs the httpx package to be installed, '
+                             'with its http2 extra.') from err
+        self.httpx = httpx
+        self.pool_size = pool_size
+        self.clients = {}
+        self._lock = threading.Lock()
+
+    def get_client(self, verify, cert, proxy):
+        key = (verify, cert, proxy)
+        with self._lock:
+            if key not in self.clients:
+                self.clients[key] = self.httpx.Client(
+                        http2=True, verify=verify, cert=cert, proxies=proxy,
+                        limits=self.httpx.Limits(max_connections=self.pool_size,
+                                                 max_keepalive_connections=self.pool_size))
+            return self.clients[key]
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        if isinstance(timeout, tuple):
+            timeout = self.httpx.Timeout(None, connect=timeout[0], read=timeout[1])
+        else:
+            timeout = self.httpx.Timeout(timeout)
+        client = self.get_client(verify, cert if not isinstance(cert, list) else tuple(cert),
+                                 select_proxy(request.url, proxies))
+        try:
+            reply = client.request(request.method, request.url, headers=dict(request.headers),
+                                   content=request.body, timeout=timeout)
+        except self.httpx.TimeoutException as err:
+            raise Timeout(err, request=request) from err
+        except self.httpx.TransportError as err:
+            raise ConnectionError(err, request=request) from err
+
+        response = Response()
+        response.status_code = reply.status_code
+        response.reason = reply.reason_phrase
+        # the content is given decoded by httpx
+        response.headers = CaseInsensitiveDict((name, value) for name, value in reply.headers.items()
+                                               if name.lower() != 'content-encoding')
+        response._content = reply.content
+        response._content_consumed = True
+        response.encoding = get_encoding_from_headers(response.headers)
+        response.url = request.url
+        response.request = request
+        response.connection = self
+        return response
+
+    def close(self):
+        with self._lock:
+            for client in self.clients.values():
+                client.close()
+            self.clients.clear()
+
+
+class Transport:
+    '''Mounts a registered transport on sessions, sized for concurrent requests
+
+    Only the default adapters of the session are replaced, so the adapters that
+    have been put in front of them, like the HTTP cache or a test recorder, are
+    left untouched. The pools keep at least as many connections alive per host
+    as there are requests running in parallel, so that they reuse the sockets
+    instead of doing a new TLS handshake for each request.
+    '''
+
+    def __init__(self, name='http/1.1', pool_size=DEFAULT_POOLSIZE):
+        if name not in transports:
+            raise ValueError('Unknown HTTP transport: {}. Choose one of: {}.'.format(
+                name, ', '.join(sorted(transports))))
+        self.name = name
+        self.pool_size = max(pool_size, DEFAULT_POOLSIZE)
+
+    def install(self, session):
+        '''Replaces the default adapters of the session, once'''
+        for prefix, adapter in list(session.adapters.items()):
+            if type(adapter) is not HTTPAdapter:
+                continue
+            if self.name == 'http/1.1' and adapter._pool_maxsize >= self.pool_size:
+                continue
+            log.debug('Mounting {} transport for {} ({} connections)'.format(self.name, prefix, self.pool_size))
+            session.mount(prefix, transports[self.name](self.pool_size))
+        return session
@@ -1,17 +1,86 @@
 #!/usr/bin/env python3
 
+import re
 import sys
+import json
 import shutil
 
+from collections import deque
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from unicodedata import combining, east_asian_width
+
 def print_tty(*args, **kwarg):
     if sys.stdout.isatty():
         print(*args, **kwarg)
 
-def print_iter(generator):
+def format_value(value):
+    '''Text rendering of the values of listings rows'''
+    if value is None:
+        return 'N.A.'
+    if isinstance(value, datetime):
+        if value.year < datetime.now().year:
+            return value.strftime("%b %d %Y")
+        return value.strftime("%b %d %H:%M")
+    return value
+
+def format_record(header, row):
+    '''
+    Record of a listing row for machine readable outputs, with the lower-cased
+    column names as keys, and the dates as ISO 8601 strings.
+    '''
+    values = [value.isoformat() if isinstance(value, datetime) else value for value in row]
+    if not header:
+        return values
+    return dict(zip((str(name).strip().lower() for name in header), values))
+
+def print_iter(generator, output='text'):
+    '''
+    Prints the rows of a listing as soon as they are generated.
+
+    The generator first yields the format of the rows, then the header (names of
+    the columns, or None), then the rows. The format is either a format string, or
+    a layout function, like `columnize()`, that turns the first column of each row
+    into lines of text. The generator can return a footer. Values within rows are
+    typed: counts are integers, dates are datetimes and None is not available.
+
+    With the 'text' output, the header and the footer are only shown on terminals.
+    The 'tsv', 'jsonl' and 'json' outputs print one record per line, and never buffer.
+    '''
     fmt = next(generator)
-    print_tty(fmt.format(*next(generator)))
-    for item in generator:
-        print(fmt.format(*item))
+    header = next(generator)
+    footer = []
+    def rows():
+        footer.append((yield from generator))
+
+    if output == 'tsv':
+        if header:
+            print('\t'.join(str(name).strip().lower() for name in header))
+        for row in rows():
+            values = format_record(None, row)
+            print('\t'.join(re.sub(r'[\t\n]', ' ', '' if value is None else str(value)) for value in values), flush=True)
+    elif output == 'jsonl':
+        for row in rows():
+            print(json.dumps(format_record(header, row)), flush=True)
+    elif output == 'json':
+        # stream the array, one record per line
+        print('[', end='')
+        separator = '\n'
+        for row in rows():
+            print(separator + json.dumps(format_record(header, row)), end='', flush=True)
+            separator = ',\n'
+        print('\n]' if separator != '\n' else ']')
+    elif callable(fmt):
+        for line in fmt(row[0] for row in rows()):
+            print(line)
+    else:
+        if header:
+            print_tty(fmt.format(*header))
+        for row in rows():
+            print(fmt.format(*map(format_value, row)))
+    if footer and footer[0] and output == 'text':
+        print_tty(footer[0])
 
 def loop_input(*args, method=input, **kwarg):
     out = ''
@@ -35,22 +104,84 @@ def confirm(what, where):
         return False
     return True
 
-def columnize(lines, indent=0, pad=2):
+def error_message(err):
+    '''
+    Gives a one line message for an exception. For failed git commands, that is
+    the first error reported by git, instead of the command line and exit code.
+    '''
+    text = str(err).strip()
+    match = re.search(r'(?:fatal|error): ([^\n]*)', text)
+    if match:
+        return match.group(1).rstrip(" '")
+    return text.splitlines()[-1] if text else repr(err)
+
+NON_ASCII_RE = re.compile('[^\x00-\x7f]')
+
+def text_width(text):
+    '''
+    Number of terminal cells taken by text: East Asian wide and fullwidth characters
+    take two cells, combining characters none.
+    '''
+    width = len(text)
+    if len(text.encode('utf-8')) == width:
+        # ASCII only
+        return width
+    for char in NON_ASCII_RE.findall(text):
+        if combining(char):
+            width -= 1
+        elif east_asian_width(char) in ('W', 'F'):
+            width += 1
+    return width
+
+def columnize(lines, indent=0, pad=2, window=100):
+    '''
+    Lays out items in columns, row by row, as they come. The width of the columns
+    is given by the widest item within a window of look-ahead items, and only
+    grows for the next windows, so the first rows are printed before all the items
+    are known.
+
+    The width of each item is measured once, as it is read, and only the items
+    of the current window are kept, so the layout runs in a single pass over the
+    items, in constant memory.
+    '''
     term_width = shutil.get_terminal_size((80, 20)).columns
-    # prints a list of items in a fashion similar to the dir command
-    # borrowed from https://gist.github.com/critiqjo/2ca84db26daaeb1715e1
-    n_lines = len(lines)
-    if n_lines == 0:
+    margin, gap = " "*indent, " "*pad
+    lines = iter(lines)
+    col_width = 0
+    # (item, width) of the items that are not laid out yet
+    cells = []
+    while True:
+        new_lines = list(islice(lines, window))
+        if new_lines:
+            # the width of ASCII items is their length, which saves measuring them one by one
+            measure = text_width if NON_ASCII_RE.search(''.join(new_lines)) else len
+            widths = list(map(measure, new_lines))
+            col_width = max(col_width, max(widths))
+            cells.extend(zip(new_lines, widths))
+        elif not cells:
+            return
+        n_cols = max(1, int((term_width + pad - indent)/(col_width + pad)))
+        # keep the items of an incomplete row for the next window, unless it's the last one
+        n_items = len(cells) - len(cells) % n_cols if new_lines else len(cells)
+        for start in range(0, n_items, n_cols):
+            yield margin + gap.join([line + " "*(col_width - width) for line, width in cells[start:start+n_cols]])
+        del cells[:n_items]
+
+def parallel_map(function, iterable, jobs=1):
+    '''
+    Applies function on each item of iterable using a pool of `jobs` threads, and
+    yields the results in the same order as the items of iterable. Only a bounded
+    window of items is scheduled ahead of the consumer, so results can be printed
+    while the iterable is still being fetched.
+    '''
+    if jobs <= 1:
+        yield from map(function, iterable)
         return
-    col_width = max(len(line) for line in lines)
-    n_cols = int((term_width + pad - indent)/(col_width + pad))
-    n_cols = min(n_lines, max(1, n_cols))
-    col_len = int(n_lines/n_cols) + (0 if n_lines % n_cols == 0 else 1)
-    if (n_cols - 1) * col_len >= n_lines:
-        n_cols -= 1
-    cols = [lines[i*col_len : i*col_len + col_len] for i in range(n_cols)]
-    rows = list(zip(*cols))
-    rows_missed = zip(*[col[len(rows):] for col in cols[:-1]])
-    rows.extend(rows_missed)
-    for row in rows:
-        yield [" "*indent + (" "*pad).join(line.ljust(col_width) for line in row)]
+    iterator = iter(iterable)
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        pending = deque(executor.submit(function, item) for item in islice(iterator, 2*jobs))
+        while pending:
+            result = pending.popleft().result()
+            for item in islice(iterator, 1):
+                pending.append(executor.submit(function, item))
+            yield result
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+
+import logging
+log = logging.getLogger('git_repo.workspace')
+
+import os
+import threading
+
+from urllib.parse import urlparse
+
+from git import Repo, RemoteProgress
+
+from .services.service import RepositoryService
+from .tools import error_message
+
+def find_repositories(path):
+    '''Yields the paths of the git repositories within path, without looking into them'''
+    for root, dirs, files in os.walk(path):
+        if '.git' in dirs or '.git' in files:
+            dirs[:] = []
+            yield root
+        else:
+            dirs[:] = sorted(d for d in dirs if not d.startswith('.'))
+
+def get_url_host(url):
+    '''Extracts the host of a git URL, or None for local paths'''
+    if '://' in url:
+        return urlparse(url).hostname
+    # scp-like syntax: [user@]host:path
+    if ':' in url and not os.path.exists(url):
+        return url.split(':', 1)[0].split('@')[-1]
+    return None
+
+
+class HostLimiter:
+    '''Bounds the number of git commands running against each host'''
+
+    def __init__(self, limit):
+        self.limit = limit
+        self._lock = threading.Lock()
+        self._semaphores = dict()
+
+    def __call__(self, host):
+        with self._lock:
+            if host not in self._semaphores:
+                self._semaphores[host] = threading.BoundedSemaphore(self.limit)
+            return self._semaphores[host]
+
+
+def get_managed_remotes(repository):
+    '''Lists the remotes of a repository that have been setup by git-repo
+
+    Those are the remotes named after a service, the `upstream` remote, and
+    the remotes that are part of the `all` remote. The `all` remote itself is
+    left out, as fetching it would fetch all the others once again.
+    '''
+    names = set(RepositoryService.service_map.keys()) | {'upstream'}
+    try:
+        all_urls = set(repository.remote('all').urls)
+    except ValueError:
+        all_urls = set()
+    return [remote for remote in repository.remotes
+                if remote.name != 'all' and (remote.name in names or set(remote.urls) & all_urls)]
+
+def sync_repository(path, limiter, pull=False):
+    '''Fetches the managed remotes of a repository and compares its branch with its upstream
+
+    :param path: path to the repository
+    :param limiter: HostLimiter instance to throttle the fetches
+    :param pull: fast-forward the branch when it is behind its upstream
+    :return: (status, ahead, behind, branch, error message or None)
+    '''
+    repository = Repo(path)
+    errors = []
+    for remote in get_managed_remotes(repository):
+        with limiter(get_url_host(remote.url)):
+            try:
+                remote.fetch(progress=RemoteProgress())
+            except Exception as err:
+                log.debug('Failed to fetch {} in {}: {}'.format(remote.name, path, err))
+                errors.append('{}: {}'.format(remote.name, error_message(err)))
+
+    if repository.head.is_detached:
+        return 'detached', '', '', '', '; '.join(errors) or None
+    branch = repository.active_branch
+    tracking = branch.tracking_branch()
+    if tracking is None:
+        return 'no upstream', '', '', branch.name, '; '.join(errors) or None
+
+    ahead, behind = map(int, repository.git.rev_list(
+        '--left-right', '--count', '{}...{}'.format(branch.path, tracking.path)).split())
+    if ahead and behind:
+        status = 'diverged'
+    elif behind and pull:
+        repository.git.merge('--ff-only', tracking.path)
+        status, behind = 'updated', 0
+    elif behind:
+        status = 'behind'
+    elif ahead:
+        status = 'ahead'
+    else:
+        status = 'up to date'
+    return 'failed' if errors else status, ahead, behind, branch.name, '; '.join(errors) or None
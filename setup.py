@@ -168,6 +168,11 @@ setup(name='git-repo',
       include_package_data = True,
       install_requires=requirements(),
       tests_require=requirements('test'),
+      extras_require={
+          'http2': ['httpx[http2]'],
+          'async': ['aiohttp>=3.0'],
+          'profile': ['pyinstrument>=4.0'],
+      },
       dependency_links=requirements_links,
       cmdclass={
           'buildout': Buildout,
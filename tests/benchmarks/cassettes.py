@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+
+'''
+Benchmarks of the services, replaying the recorded cassettes
+
+Times the operations of each service against the interactions recorded for the
+integration tests, offline, with pytest-benchmark. The operations run through
+the same helpers as the integration tests, git commands being mocked up. Each
+round gets a fresh service, session and repository, so only the operation is
+timed. Along with the wall time, the number of HTTP requests and the peak memory
+of the operation are saved in the `extra_info` of each benchmark, so that the
+regressions of the service layer show up when comparing runs:
+
+    py.test tests/benchmarks/cassettes.py --benchmark-autosave
+    py.test tests/benchmarks/cassettes.py --benchmark-compare
+
+Use `-k github` or `-k list` to select the services or the operations.
+'''
+
+import tracemalloc
+
+import pytest
+
+pytest.importorskip('pytest_benchmark')
+
+# the modules are imported rather than the test cases, for them not to be collected here
+from tests.integration import test_bitbucket, test_gerrit, test_gitbucket, test_github, test_gitlab, test_gogs
+
+
+'''(test case, name of the test that recorded the cassette, operation) by service and operation'''
+SCENARIOS = {
+    'github': (test_github.Test_Github, {
+        'list': ('test_34_list__short', lambda case: case.action_list('git-repo-test')),
+        'list_long': ('test_34_list__long', lambda case: case.action_list('git-repo-test', _long=True)),
+        'request_list': ('test_30_request_list', lambda case: case.action_request_list('guyzmo', 'git-repo')),
+        'request_fetch': ('test_31_request_fetch', lambda case: case.action_request_fetch(
+            'git-services', 'github-testing', '2', remote_branch='pull', local_branch='requests/github')),
+        'gist_list': ('test_13_gist_list', lambda case: case.action_gist_list()),
+        'clone': ('test_04_clone', lambda case: case.action_clone('git-services', 'github-testing')),
+    }),
+    'gitlab': (test_gitlab.Test_Gitlab, {
+        'request_list': ('test_18_request_list', lambda case: case.action_request_list('git-repo-test', 'git-repo')),
+        'request_fetch': ('test_19_request_fetch', lambda case: case.action_request_fetch(
+            case.local_namespace, 'git-repo', '4', remote_branch='merge-requests', local_branch='requests/gitlab')),
+        'gist_list': ('test_13_snippet_list_alone', lambda case: case.action_gist_list()),
+        'clone': ('test_04_clone', lambda case: case.action_clone('guyzmo', 'git-repo')),
+    }),
+    # the listings of bitbucket go past the recorded interactions
+    'bitbucket': (test_bitbucket.Test_BitBucket, {
+        'request_list': ('test_30_request_list', lambda case: case.action_request_list('atlassian', 'python-bitbucket')),
+        'request_fetch': ('test_31_request_fetch__good', lambda case: case.test_31_request_fetch__good()),
+        'gist_list': ('test_13_snippet_list', lambda case: case.action_gist_list()),
+        'clone': ('test_04_clone', lambda case: case.action_clone('guyzmo', 'git-repo')),
+    }),
+    'gogs': (test_gogs.Test_Gogs, {
+        'clone': ('test_04_clone', lambda case: case.action_clone(case.local_namespace, 'git-repo')),
+    }),
+    'gitbucket': (test_gitbucket.Test_Gitbucket, {
+        'clone': ('test_04_clone', lambda case: case.action_clone('root', 'repo')),
+    }),
+    'gerrit': (test_gerrit.Test_Gerrit, {
+        'request_list': ('test_06_list_patchsets', lambda case: case.action_request_list('TestUser', 'DemoRepository')),
+        'clone': ('test_00_clone', lambda case: case.action_clone('TestUser', 'DemoRepository')),
+    }),
+}
+
+
+class Replay:
+    '''Sets up a test case to replay a cassette, and counts the requests it serves'''
+    def __init__(self, test_case, test_name):
+        class Case(test_case):
+            def _make_cassette_name(case, frame_level=2):
+                return '_'.join(['test', case.service.name, test_name])
+        self.case = Case()
+        self.case.setup_method(None)
+        self.requests = 0
+        self.case.get_requests_session().hooks['response'].append(self.count)
+
+    def count(self, response, *args, **kwarg):
+        self.requests += 1
+
+    def close(self):
+        self.case.teardown_method(None)
+
+
+@pytest.mark.parametrize('service, operation', [(service, operation)
+                                                 for service, (_, operations) in sorted(SCENARIOS.items())
+                                                 for operation in sorted(operations)])
+def test_replay(benchmark, service, operation):
+    test_case, (test_name, run) = SCENARIOS[service][0], SCENARIOS[service][1][operation]
+    replays = []
+
+    def setup():
+        if replays:
+            replays.pop().close()
+        replays.append(Replay(test_case, test_name))
+        return (replays[-1].case,), {}
+
+    try:
+        benchmark.pedantic(run, setup=setup, rounds=10)
+        # the memory is traced apart, as it slows the operation down
+        setup()
+        tracemalloc.start()
+        try:
+            run(replays[-1].case)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        benchmark.extra_info.update(requests=replays[-1].requests, peak_memory=peak)
+    finally:
+        for replay in replays:
+            replay.close()
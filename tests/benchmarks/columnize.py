@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+
+'''
+Benchmark of the layout of huge `git repo <target> list` outputs
+
+Lays out the names of a namespace of many repositories, some of them with East
+Asian characters, with `columnize()` and with the implementation it replaced,
+that needed the whole list of names, and measures the throughput and the peak
+memory of each. The names are generated as they are laid out, like the rows
+of a streamed listing.
+
+    python tests/benchmarks/columnize.py [items] [runs]
+'''
+
+import sys
+import time
+import shutil
+import tracemalloc
+
+from git_repo.tools import columnize
+
+
+def legacy_columnize(lines, indent=0, pad=2):
+    term_width = shutil.get_terminal_size((80, 20)).columns
+    n_lines = len(lines)
+    if n_lines == 0:
+        return
+    col_width = max(len(line) for line in lines)
+    n_cols = int((term_width + pad - indent)/(col_width + pad))
+    n_cols = min(n_lines, max(1, n_cols))
+    col_len = int(n_lines/n_cols) + (0 if n_lines % n_cols == 0 else 1)
+    if (n_cols - 1) * col_len >= n_lines:
+        n_cols -= 1
+    cols = [lines[i*col_len : i*col_len + col_len] for i in range(n_cols)]
+    rows = list(zip(*cols))
+    rows_missed = zip(*[col[len(rows):] for col in cols[:-1]])
+    rows.extend(rows_missed)
+    for row in rows:
+        yield " "*indent + (" "*pad).join(line.ljust(col_width) for line in row)
+
+
+def names(items):
+    for x in range(items):
+        yield 'namespace/项目-{}'.format(x) if x % 10 == 0 else 'namespace/repository-{}'.format(x)
+
+LAYOUTS = (
+    ('legacy', lambda items: legacy_columnize(list(names(items)))),
+    ('streamed', lambda items: columnize(names(items))),
+)
+
+
+def measure(layout, items, runs):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        for _ in layout(items):
+            pass
+        timings.append(time.perf_counter() - start)
+    tracemalloc.start()
+    for _ in layout(items):
+        pass
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return min(timings), peak
+
+
+def main(items=50000, runs=5):
+    print('{:<10} {:>14} {:>12}'.format('columnize', 'items/s', 'peak memory'))
+    for name, layout in LAYOUTS:
+        timing, peak = measure(layout, items, runs)
+        print('{:<10} {:>14,.0f} {:>10.1f}kB'.format(name, items/timing, peak/1024))
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
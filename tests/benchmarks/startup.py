@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+
+'''
+Cold start benchmark of `git repo hub open`
+
+Runs, in fresh interpreters, the part of `git repo hub open` that happens before
+talking to the service: importing the command line module and looking up the
+service class. It is compared with loading all the services modules upfront, like
+it was done before they got loaded lazily.
+
+    python tests/benchmarks/startup.py [runs]
+'''
+
+import sys
+import statistics
+import subprocess
+import time
+
+from git_repo.services.ext import services
+
+LAZY = '''
+from git_repo.repo import RepositoryService
+RepositoryService.service_map['github']
+'''
+
+EAGER = ''.join('import git_repo.services.ext.{}\n'.format(module) for _, module in services.values()) + LAZY
+
+
+def measure(code, runs):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.check_call([sys.executable, '-c', code])
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def main(runs=10):
+    print('{:<8} {:>10} {:>10}'.format('startup', 'median', 'min'))
+    for name, code in (('eager', EAGER), ('lazy', LAZY)):
+        timings = measure(code, runs)
+        print('{:<8} {:>8.0f}ms {:>8.0f}ms'.format(name,
+                                                   statistics.median(timings)*1000,
+                                                   min(timings)*1000))
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,788 @@
+#!/usr/bin/env python3
+
+'''
+In-process fake forge, for load and scale testing
+
+A `FakeForge` serves the part of the API of GitHub (v3 and GraphQL), GitLab (v4,
+and v3 for python-gitlab), Gogs or Gitea (v1) that git-repo uses, and the git
+repositories over HTTP through `git http-backend`, for synthetic namespaces of
+any size. The objects of the namespaces are generated on demand from their
+index, so a namespace of 10k repositories and 100k requests costs nothing until
+a page of it is asked for. Latency and a rate limit can be injected in all the responses.
+
+The services are pointed at the forge through their `fqdn`, `scheme` and `port`
+configuration, as given by `FakeForge.config()`:
+
+    with FakeForge('github', [Namespace('acme', repositories=10000, requests=10)],
+                   latency=0.05, rate_limit=5000) as forge:
+        service = GithubService(c=forge.config())
+        service.connect()
+        slugs = list(service.get_repository_slugs('acme'))
+        assert 100 == forge.requests['repositories']
+
+`FakeForge.requests` counts the API requests by endpoint, and the git requests.
+'''
+
+import logging
+log = logging.getLogger('test.forge')
+
+import os
+import re
+import json
+import math
+import time
+import random
+import shutil
+import socketserver
+import subprocess
+import tempfile
+import threading
+
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import parse_qsl, quote, unquote, urlencode, urlsplit
+
+# all the dates of the forge are relative to that one, the most recent objects first
+EPOCH = datetime(2017, 1, 1, tzinfo=timezone.utc)
+
+LANGUAGES = ('Python', 'C', 'Go', 'Rust', 'JavaScript', None)
+
+
+def isoformat(date):
+    return date.strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+class Namespace:
+    '''Synthetic user or organization of a fake forge
+
+    All the repositories of a namespace have the same number of requests, issues,
+    commits and contributors, so that totals are easy to check, while their other
+    attributes are drawn from a random generator seeded with the index of the
+    repository. The repositories, and the requests of the namespace, are ordered
+    from the most recently updated.
+    '''
+    def __init__(self, name, repositories=100, requests=0, issues=0, commits=1, contributors=1,
+                 organization=False, seed=0):
+        '''
+        :param requests: number of open requests of each repository
+        :param issues: number of open issues of each repository, besides the requests
+        :param organization: whether the namespace is an organization (or group)
+        '''
+        self.name = name
+        self.repositories = repositories
+        self.requests = requests
+        self.issues = issues
+        self.commits = commits
+        self.contributors = contributors
+        self.organization = organization
+        self.seed = seed
+        # number of repositories of the namespaces before that one, set by the forge
+        self.offset = 0
+
+    def repository(self, index):
+        '''Attributes of the index-th repository of the namespace'''
+        generator = random.Random('{}/{}/{}'.format(self.seed, self.name, index))
+        return dict(
+            index=index,
+            id=self.offset + index + 1,
+            name='repo-{:05}'.format(index),
+            private=generator.random() < 0.1,
+            fork=generator.random() < 0.2,
+            language=generator.choice(LANGUAGES),
+            forks=generator.randrange(50),
+            stars=generator.randrange(500),
+            watchers=generator.randrange(50),
+            updated_at=EPOCH - timedelta(hours=index),
+        )
+
+    def find(self, name):
+        '''Attributes of the repository of the namespace called name, or None'''
+        match = re.fullmatch(r'repo-(\d{5,})', name)
+        if match and int(match.group(1)) < self.repositories:
+            return self.repository(int(match.group(1)))
+        return None
+
+    def request(self, index):
+        '''(repository, number, date of last update) of the index-th request of the namespace'''
+        return (self.repository(index // self.requests),
+                index % self.requests + 1,
+                EPOCH - timedelta(minutes=index))
+
+    def repository_request(self, repository, number):
+        '''(repository, number, date of last update) of a request of a repository'''
+        return self.request(repository['index'] * self.requests + number - 1)
+
+
+class ForgeServer(socketserver.ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class ForgeRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # the headers and the body are sent at once, kept-alive connections
+    # would otherwise wait for delayed acknowledgements
+    wbufsize = -1
+
+    def do_GET(self):
+        self.server.forge.handle(self)
+
+    do_POST = do_HEAD = do_GET
+
+    def read_body(self):
+        if self.headers.get('Transfer-Encoding', '').lower() == 'chunked':
+            chunks = []
+            while True:
+                size = int(self.rfile.readline().split(b';')[0], 16)
+                if not size:
+                    while self.rfile.readline() not in (b'\r\n', b'\n', b''):
+                        pass
+                    return b''.join(chunks)
+                chunks.append(self.rfile.read(size))
+                self.rfile.readline()
+        return self.rfile.read(int(self.headers.get('Content-Length', 0)))
+
+    def respond(self, status, body=b'', headers={}):
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        log.debug(format % args)
+
+
+class FakeForge:
+    '''Fake GitHub, GitLab, Gogs or Gitea server, running in a thread of the process'''
+
+    api_prefixes = {
+        'github': ('/api/v3', '/api'),
+        'gitlab': ('/api/v4', '/api/v3'),
+        'gogs': ('/api/v1',),
+        'gitea': ('/api/v1',),
+    }
+
+    # parameter giving the size of the pages, Gogs serving pages of a fixed size
+    page_size_params = {
+        'github': 'per_page',
+        'gitlab': 'per_page',
+        'gogs': None,
+        'gitea': 'limit',
+    }
+
+    def __init__(self, flavour, namespaces=(), user='forge', latency=0, rate_limit=None, rate_limit_window=60):
+        '''
+        :param flavour: 'github', 'gitlab', 'gogs' or 'gitea'
+        :param namespaces: `Namespace` instances served by the forge
+        :param user: name of the authenticated user, whatever the credentials
+        :param latency: seconds waited before each response
+        :param rate_limit: number of requests allowed within each window
+        :param rate_limit_window: seconds after which the rate limit is reset
+        '''
+        if flavour not in self.api_prefixes:
+            raise ValueError('Unknown forge flavour: {}'.format(flavour))
+        self.flavour = flavour
+        self.user = user
+        self.latency = latency
+        self.rate_limit = rate_limit
+        self.rate_limit_window = rate_limit_window
+        self.namespaces = {}
+        for namespace in namespaces:
+            self.add_namespace(namespace)
+        if user not in self.namespaces:
+            self.add_namespace(Namespace(user, repositories=0))
+        self.routes = [(method, re.compile(pattern), getattr(self, handler))
+                       for method, pattern, handler in self.route_table[flavour]]
+        # requests served, by handler, and by version of the API
+        self.requests = Counter()
+        self._remaining = rate_limit
+        self._reset = None
+        self._lock = threading.Lock()
+        self._git_root = None
+        self.server = None
+
+    def add_namespace(self, namespace):
+        namespace.offset = sum(other.repositories for other in self.namespaces.values())
+        self.namespaces[namespace.name] = namespace
+
+    '''Server'''
+
+    def start(self):
+        self.server = ForgeServer(('127.0.0.1', 0), ForgeRequestHandler)
+        self.server.forge = self
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+        if self._git_root:
+            self._git_root.cleanup()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    @property
+    def port(self):
+        return self.server.server_address[1]
+
+    @property
+    def url(self):
+        return 'http://127.0.0.1:{}'.format(self.port)
+
+    def config(self, **config):
+        '''Configuration of a service pointing at the forge'''
+        return dict({
+            '__name__': 'gitrepo "{}"'.format(self.flavour),
+            'fqdn': '127.0.0.1',
+            'scheme': 'http',
+            'port': str(self.port),
+            'token': 'forge-token',
+        }, **config)
+
+    '''Requests'''
+
+    def handle(self, request):
+        url = urlsplit(request.path)
+        # the body is always read, for the connection to be kept alive whatever the response
+        request.body = request.read_body()
+        request.params = dict(parse_qsl(url.query))
+        request.base_url = 'http://{}'.format(request.headers.get('Host', '127.0.0.1:{}'.format(self.port)))
+        if self.latency:
+            time.sleep(self.latency)
+        headers = self.spend_rate_limit()
+        if headers is None:
+            self.requests['throttled'] += 1
+            retry = max(1, int(self._reset - time.time() + 1))
+            return self.respond_json(request, 429, dict(message='API rate limit exceeded'),
+                                     dict(self.rate_limit_headers(), **{'Retry-After': str(retry)}))
+        for prefix in self.api_prefixes[self.flavour]:
+            if url.path.startswith(prefix + '/'):
+                request.api_url = request.base_url + prefix
+                request.api_version = prefix.split('/')[-1]
+                path = url.path[len(prefix):].rstrip('/')
+                for method, pattern, handler in self.routes:
+                    match = pattern.fullmatch(path)
+                    if match and request.command in (method, 'HEAD'):
+                        self.requests[handler.__name__] += 1
+                        self.requests[request.api_version] += 1
+                        status, body, more_headers = handler(request, **{name: unquote(value)
+                                                                         for name, value in match.groupdict().items()})
+                        return self.respond_json(request, status, body, dict(headers, **more_headers))
+                break
+        else:
+            return self.serve_git(request, url, headers)
+        self.requests['not_found'] += 1
+        return self.respond_json(request, 404, dict(message='Not Found'), headers)
+
+    def respond_json(self, request, status, body, headers):
+        request.respond(status, json.dumps(body).encode('utf-8'),
+                        dict(headers, **{'Content-Type': 'application/json'}))
+
+    def spend_rate_limit(self):
+        '''Takes a request from the budget, and gives its headers, or None when there is none left'''
+        if self.rate_limit is None:
+            return {}
+        with self._lock:
+            now = time.time()
+            if self._reset is None or now >= self._reset:
+                self._remaining = self.rate_limit
+                self._reset = math.ceil(now + self.rate_limit_window)
+            if not self._remaining:
+                return None
+            self._remaining -= 1
+            return self.rate_limit_headers()
+
+    def rate_limit_headers(self):
+        prefix = 'RateLimit-' if self.flavour == 'gitlab' else 'X-RateLimit-'
+        return {
+            prefix + 'Limit': str(self.rate_limit),
+            prefix + 'Remaining': str(self._remaining),
+            prefix + 'Reset': str(self._reset),
+        }
+
+    def paginate(self, request, count, item, page_size=30):
+        '''Gives the page asked by the request of a collection of count objects made by item(index)'''
+        name = self.page_size_params[self.flavour]
+        per_page = min(int(request.params.get(name, page_size)) if name else page_size, 100)
+        page = max(int(request.params.get('page', 1)), 1)
+        last = max(1, -(-count // per_page))
+        objects = [item(index) for index in range((page-1) * per_page, min(page * per_page, count))]
+        path = urlsplit(request.path).path
+
+        def page_url(number):
+            return '{}{}?{}'.format(request.base_url, path, urlencode(dict(request.params, page=number)))
+        links = []
+        if page < last:
+            links += [(page_url(page + 1), 'next'), (page_url(last), 'last')]
+        if page > 1:
+            links += [(page_url(1), 'first'), (page_url(page - 1), 'prev')]
+        headers = {'Link': ', '.join('<{}>; rel="{}"'.format(url, rel) for url, rel in links)} if links else {}
+        if self.flavour == 'gitea':
+            headers['X-Total-Count'] = str(count)
+        if self.flavour == 'gitlab':
+            headers.update({'X-Total': str(count), 'X-Total-Pages': str(last),
+                            'X-Page': str(page), 'X-Per-Page': str(per_page),
+                            'X-Next-Page': str(page + 1) if page < last else '',
+                            'X-Prev-Page': str(page - 1) if page > 1 else ''})
+        return 200, objects, headers
+
+    def lookup(self, name, repo=None):
+        '''(namespace, repository) of the forge, with None for the missing ones'''
+        namespace = self.namespaces.get(name)
+        if namespace is None or repo is None:
+            return namespace, None
+        return namespace, namespace.find(repo[:-4] if repo.endswith('.git') else repo)
+
+    def not_found(self):
+        return 404, dict(message='Not Found'), {}
+
+    '''git smart HTTP'''
+
+    def git_root(self):
+        '''Directory with the repository served for all the repositories, created on first use'''
+        with self._lock:
+            if self._git_root is None:
+                root = tempfile.TemporaryDirectory()
+                work = os.path.join(root.name, 'work')
+                git = ['git', '-c', 'user.name=Forge', '-c', 'user.email=forge@example.org']
+                subprocess.check_call(git + ['init', '-q', work])
+                with open(os.path.join(work, 'README'), 'w') as f:
+                    f.write('Synthetic repository of a fake forge\n')
+                subprocess.check_call(git + ['-C', work, 'add', 'README'])
+                subprocess.check_call(git + ['-C', work, 'commit', '-q', '-m', 'Initial commit'])
+                subprocess.check_call(git + ['clone', '-q', '--bare', work, os.path.join(root.name, 'repository.git')])
+                shutil.rmtree(work)
+                self._git_root = root
+            return self._git_root.name
+
+    def serve_git(self, request, url, headers):
+        match = re.fullmatch(r'/(?P<name>[^/]+)/(?P<repo>[^/]+)(?P<path>/(info/refs|HEAD|git-upload-pack|objects/.+))',
+                             url.path)
+        if not match or not self.lookup(match.group('name'), match.group('repo'))[1]:
+            self.requests['not_found'] += 1
+            return request.respond(404, b'Not Found', headers)
+        self.requests['git'] += 1
+        body = request.body
+        env = dict(os.environ,
+                   GIT_PROJECT_ROOT=self.git_root(),
+                   GIT_HTTP_EXPORT_ALL='1',
+                   PATH_INFO='/repository.git' + match.group('path'),
+                   REQUEST_METHOD=request.command,
+                   QUERY_STRING=url.query,
+                   CONTENT_TYPE=request.headers.get('Content-Type', ''),
+                   CONTENT_LENGTH=str(len(body)),
+                   REMOTE_ADDR=request.client_address[0])
+        if 'Content-Encoding' in request.headers:
+            env['HTTP_CONTENT_ENCODING'] = request.headers['Content-Encoding']
+        if 'Git-Protocol' in request.headers:
+            env['GIT_PROTOCOL'] = request.headers['Git-Protocol']
+        output = subprocess.run(['git', 'http-backend'], input=body, env=env,
+                                stdout=subprocess.PIPE, stderr=subprocess.PIPE).stdout
+        head, _, content = output.partition(b'\r\n\r\n') if b'\r\n\r\n' in output else output.partition(b'\n\n')
+        status = 200
+        for line in head.decode('latin-1').splitlines():
+            name, _, value = line.partition(':')
+            if name.lower() == 'status':
+                status = int(value.split()[0])
+            else:
+                headers[name] = value.strip()
+        request.respond(status, content, headers)
+
+    '''GitHub'''
+
+    def github_user(self, request):
+        return self.github_owner(request, self.user)
+
+    def github_owner(self, request, name):
+        namespace, _ = self.lookup(name)
+        if namespace is None:
+            return self.not_found()
+        return 200, self.github_owner_json(request, namespace), {}
+
+    def github_owner_json(self, request, namespace):
+        return dict(
+            login=namespace.name,
+            id=namespace.offset + 1,
+            type='Organization' if namespace.organization else 'User',
+            url='{}/users/{}'.format(request.api_url, namespace.name),
+            html_url='{}/{}'.format(request.base_url, namespace.name),
+        )
+
+    def github_repository_json(self, request, namespace, repository):
+        full_name = '{}/{}'.format(namespace.name, repository['name'])
+        return dict(
+            id=repository['id'],
+            name=repository['name'],
+            full_name=full_name,
+            owner=self.github_owner_json(request, namespace),
+            private=repository['private'],
+            fork=repository['fork'],
+            url='{}/repos/{}'.format(request.api_url, full_name),
+            html_url='{}/{}'.format(request.base_url, full_name),
+            clone_url='{}/{}.git'.format(request.base_url, full_name),
+            forks=repository['forks'],
+            forks_count=repository['forks'],
+            watchers=repository['watchers'],
+            watchers_count=repository['watchers'],
+            stargazers_count=repository['stars'],
+            open_issues_count=namespace.issues + namespace.requests,
+            language=repository['language'],
+            default_branch='master',
+            created_at=isoformat(EPOCH - timedelta(days=365)),
+            updated_at=isoformat(repository['updated_at']),
+            pushed_at=isoformat(repository['updated_at']),
+        )
+
+    def github_pull_json(self, request, namespace, repository, number, updated_at):
+        full_name = '{}/{}'.format(namespace.name, repository['name'])
+        return dict(
+            id=repository['id'] * 100000 + number,
+            number=number,
+            state='open',
+            title='Request #{} of {}'.format(number, full_name),
+            url='{}/repos/{}/pulls/{}'.format(request.api_url, full_name, number),
+            html_url='{}/{}/pull/{}'.format(request.base_url, full_name, number),
+            issue_url='{}/repos/{}/issues/{}'.format(request.api_url, full_name, number),
+            repository_url='{}/repos/{}'.format(request.api_url, full_name),
+            user=self.github_owner_json(request, namespace),
+            head=dict(ref='feature-{}'.format(number), label='{}:feature-{}'.format(namespace.name, number)),
+            base=dict(ref='master', label='{}:master'.format(namespace.name)),
+            created_at=isoformat(updated_at - timedelta(days=1)),
+            updated_at=isoformat(updated_at),
+        )
+
+    def github_repositories(self, request, name):
+        namespace, _ = self.lookup(name)
+        if namespace is None:
+            return self.not_found()
+        return self.paginate(request, namespace.repositories, lambda index:
+                self.github_repository_json(request, namespace, namespace.repository(index)))
+
+    def github_repository(self, request, name, repo):
+        namespace, repository = self.lookup(name, repo)
+        if repository is None:
+            return self.not_found()
+        return 200, self.github_repository_json(request, namespace, repository), {}
+
+    def github_collection(self, request, name, repo, collection):
+        namespace, repository = self.lookup(name, repo)
+        if repository is None:
+            return self.not_found()
+        if collection == 'pulls':
+            return self.paginate(request, namespace.requests, lambda index: self.github_pull_json(
+                request, namespace, *namespace.repository_request(repository, index + 1)))
+        count = dict(issues=namespace.issues + namespace.requests,
+                     commits=namespace.commits,
+                     contributors=namespace.contributors)[collection]
+        return self.paginate(request, count, lambda index: dict(id=index + 1))
+
+    def github_gists(self, request, name):
+        return self.paginate(request, 0, None)
+
+    def github_search_issues(self, request):
+        qualifiers = dict(term.split(':', 1) for term in request.params.get('q', '').split() if ':' in term)
+        namespace, _ = self.lookup(qualifiers.get('user', qualifiers.get('org', '')))
+        if namespace is None:
+            return 422, dict(message='Validation Failed'), {}
+        total = namespace.repositories * namespace.requests
+        # the search never gives more than 1000 results
+        status, items, headers = self.paginate(request, min(total, 1000), lambda index:
+                self.github_pull_json(request, namespace, *namespace.request(index)))
+        return status, dict(total_count=total, incomplete_results=False, items=items), headers
+
+    def github_graphql(self, request):
+        '''Answers the repositories query of the long listing, whatever the query'''
+        variables = json.loads(request.body.decode('utf-8')).get('variables', {})
+        namespace, _ = self.lookup(variables.get('login', ''))
+        if namespace is None:
+            return 200, dict(data=dict(repositoryOwner=None)), {}
+        first = min(int(variables.get('first', 30)), 100)
+        start = int(variables.get('cursor') or 0)
+        end = min(start + first, namespace.repositories)
+        nodes = []
+        for index in range(start, end):
+            repository = namespace.repository(index)
+            nodes.append(dict(
+                name=repository['name'],
+                isFork=repository['fork'],
+                isPrivate=repository['private'],
+                isEmpty=False,
+                forkCount=repository['forks'],
+                updatedAt=isoformat(repository['updated_at']),
+                primaryLanguage=dict(name=repository['language']) if repository['language'] else None,
+                stargazers=dict(totalCount=repository['stars']),
+                watchers=dict(totalCount=repository['watchers']),
+                issues=dict(totalCount=namespace.issues),
+                pullRequests=dict(totalCount=namespace.requests),
+                defaultBranchRef=dict(target=dict(history=dict(totalCount=namespace.commits))),
+            ))
+        repositories = dict(pageInfo=dict(hasNextPage=end < namespace.repositories, endCursor=str(end)), nodes=nodes)
+        return 200, dict(data=dict(repositoryOwner=dict(repositories=repositories))), {}
+
+    '''GitLab'''
+
+    def gitlab_user_json(self, request, namespace):
+        return dict(id=namespace.offset + 1, username=namespace.name, name=namespace.name, state='active',
+                    web_url='{}/{}'.format(request.base_url, namespace.name))
+
+    def gitlab_project_json(self, request, namespace, repository):
+        path = '{}/{}'.format(namespace.name, repository['name'])
+        return dict(
+            id=repository['id'],
+            name=repository['name'],
+            path=repository['name'],
+            path_with_namespace=path,
+            name_with_namespace='{} / {}'.format(namespace.name, repository['name']),
+            namespace=dict(id=namespace.offset + 1, name=namespace.name, path=namespace.name,
+                           kind='group' if namespace.organization else 'user'),
+            visibility='private' if repository['private'] else 'public',
+            visibility_level=0 if repository['private'] else 20,
+            forks_count=repository['forks'],
+            star_count=repository['stars'],
+            default_branch='master',
+            web_url='{}/{}'.format(request.base_url, path),
+            http_url_to_repo='{}/{}.git'.format(request.base_url, path),
+            last_activity_at=isoformat(repository['updated_at']),
+        )
+
+    def gitlab_merge_request_json(self, request, namespace, repository, number, updated_at):
+        path = '{}/{}'.format(namespace.name, repository['name'])
+        return dict(
+            id=repository['id'] * 100000 + number,
+            iid=number,
+            project_id=repository['id'],
+            state='opened',
+            title='Request !{} of {}'.format(number, path),
+            web_url='{}/{}/merge_requests/{}'.format(request.base_url, path, number),
+            source_branch='feature-{}'.format(number),
+            target_branch='master',
+            created_at=isoformat(updated_at - timedelta(days=1)),
+            updated_at=isoformat(updated_at),
+        )
+
+    def gitlab_project(self, project):
+        '''(namespace, repository) of a project given by id or path'''
+        if project.isdigit():
+            for namespace in self.namespaces.values():
+                if namespace.offset < int(project) <= namespace.offset + namespace.repositories:
+                    return namespace, namespace.repository(int(project) - namespace.offset - 1)
+            return None, None
+        return self.lookup(*project.split('/', 1)) if '/' in project else (None, None)
+
+    def gitlab_current_user(self, request):
+        return 200, self.gitlab_user_json(request, self.namespaces[self.user]), {}
+
+    def gitlab_users(self, request):
+        namespace, _ = self.lookup(request.params.get('username', request.params.get('search', '')))
+        return 200, [self.gitlab_user_json(request, namespace)] if namespace else [], {}
+
+    # fields of the projects listed with simple=true
+    gitlab_simple_fields = ('id', 'name', 'path', 'path_with_namespace', 'name_with_namespace', 'namespace',
+                            'default_branch', 'web_url', 'http_url_to_repo', 'forks_count', 'star_count',
+                            'last_activity_at')
+
+    def gitlab_projects(self, request, name=None):
+        namespace, _ = self.lookup(name or request.params.get('author', self.user))
+        if namespace is None:
+            return self.not_found()
+
+        def project(index):
+            project = self.gitlab_project_json(request, namespace, namespace.repository(index))
+            if request.params.get('simple') == 'true':
+                return {field: project[field] for field in self.gitlab_simple_fields}
+            return project
+        if request.params.get('pagination') == 'keyset':
+            return self.keyset_paginate(request, namespace, project)
+        return self.paginate(request, namespace.repositories, project, page_size=20)
+
+    def gitlab_user_projects(self, request, name):
+        namespace, _ = self.lookup(name)
+        if namespace is None or namespace.organization:
+            return self.not_found()
+        # like GitLab, which only has keyset pagination for some of the endpoints
+        if request.params.get('pagination') == 'keyset':
+            return 405, dict(message='405 Method Not Allowed'), {}
+        return self.gitlab_projects(request, name)
+
+    def gitlab_group_projects(self, request, name):
+        namespace, _ = self.lookup(name)
+        if namespace is None or not namespace.organization:
+            return self.not_found()
+        return self.gitlab_projects(request, name)
+
+    def keyset_paginate(self, request, namespace, item, page_size=20):
+        '''Gives the page of repositories after the `id_after` one, with a link to the next page only'''
+        per_page = min(int(request.params.get('per_page', page_size)), 100)
+        start = max(int(request.params.get('id_after', namespace.offset)) - namespace.offset, 0)
+        objects = [item(index) for index in range(start, min(start + per_page, namespace.repositories))]
+        headers = {}
+        if start + per_page < namespace.repositories:
+            headers['Link'] = '<{}{}?{}>; rel="next"'.format(request.base_url, urlsplit(request.path).path,
+                                                            urlencode(dict(request.params, id_after=objects[-1]['id'])))
+        return 200, objects, headers
+
+    def gitlab_get_project(self, request, project):
+        namespace, repository = self.gitlab_project(project)
+        if repository is None:
+            return self.not_found()
+        return 200, self.gitlab_project_json(request, namespace, repository), {}
+
+    def gitlab_collection(self, request, project, collection):
+        namespace, repository = self.gitlab_project(project)
+        if repository is None:
+            return self.not_found()
+        if collection == 'merge_requests':
+            return self.paginate(request, namespace.requests, lambda index: self.gitlab_merge_request_json(
+                request, namespace, *namespace.repository_request(repository, index + 1)), page_size=20)
+        count = {'issues': namespace.issues,
+                 'repository/commits': namespace.commits,
+                 'members': namespace.contributors}[collection]
+        return self.paginate(request, count, lambda index: dict(id=index + 1), page_size=20)
+
+    def gitlab_group_merge_requests(self, request, name):
+        namespace, _ = self.lookup(name)
+        if namespace is None or not namespace.organization:
+            return self.not_found()
+        return self.paginate(request, namespace.repositories * namespace.requests, lambda index:
+                self.gitlab_merge_request_json(request, namespace, *namespace.request(index)), page_size=20)
+
+    '''Gogs and Gitea'''
+
+    def gogs_user_json(self, namespace):
+        return dict(id=namespace.offset + 1, username=namespace.name, login=namespace.name,
+                    full_name=namespace.name, email='{}@example.org'.format(namespace.name))
+
+    def gogs_repository_json(self, request, namespace, repository):
+        full_name = '{}/{}'.format(namespace.name, repository['name'])
+        return dict(
+            id=repository['id'],
+            owner=self.gogs_user_json(namespace),
+            name=repository['name'],
+            full_name=full_name,
+            private=repository['private'],
+            fork=repository['fork'],
+            parent=None,
+            default_branch='master',
+            html_url='{}/{}'.format(request.base_url, full_name),
+            clone_url='{}/{}.git'.format(request.base_url, full_name),
+            ssh_url='git@127.0.0.1:{}.git'.format(full_name),
+            permissions=dict(admin=True, push=True, pull=True),
+            stars_count=repository['stars'],
+            forks_count=repository['forks'],
+            watchers_count=repository['watchers'],
+            open_issues_count=namespace.issues,
+            created_at=isoformat(EPOCH - timedelta(days=365)),
+            updated_at=isoformat(repository['updated_at']),
+        )
+
+    def gogs_repositories_json(self, request, namespace):
+        return [self.gogs_repository_json(request, namespace, namespace.repository(index))
+                for index in range(namespace.repositories)]
+
+    def gogs_current_user(self, request):
+        return 200, self.gogs_user_json(self.namespaces[self.user]), {}
+
+    def gogs_user(self, request, name):
+        namespace, _ = self.lookup(name)
+        if namespace is None:
+            return self.not_found()
+        return 200, self.gogs_user_json(namespace), {}
+
+    def gogs_orgs(self, request):
+        return 200, [self.gogs_user_json(namespace) for namespace in self.namespaces.values()
+                     if namespace.organization], {}
+
+    def gogs_own_repositories(self, request):
+        # the repositories of the user, and of the organizations, which all have the user as member
+        return 200, [repository for namespace in self.namespaces.values()
+                                if namespace.name == self.user or namespace.organization
+                                for repository in self.gogs_repositories_json(request, namespace)], {}
+
+    def gogs_repositories(self, request, name):
+        namespace, _ = self.lookup(name)
+        if namespace is None:
+            return self.not_found()
+        if self.flavour == 'gitea':
+            return self.paginate(request, namespace.repositories, lambda index:
+                    self.gogs_repository_json(request, namespace, namespace.repository(index)))
+        # Gogs does not paginate the repositories, and lists those of the other
+        # users to the authenticated user, as if they collaborated on them
+        repositories = self.gogs_repositories_json(request, namespace)
+        if namespace.name == self.user:
+            repositories += [repository for other in self.namespaces.values()
+                                        if other.name != self.user and not other.organization
+                                        for repository in self.gogs_repositories_json(request, other)]
+        return 200, repositories, {}
+
+    def gogs_repository(self, request, name, repo):
+        namespace, repository = self.lookup(name, repo)
+        if repository is None:
+            return self.not_found()
+        return 200, self.gogs_repository_json(request, namespace, repository), {}
+
+    def gogs_issues(self, request, name, repo):
+        namespace, repository = self.lookup(name, repo)
+        if repository is None:
+            return self.not_found()
+        count = namespace.issues
+        # the issues of Gitea include the pull requests, unless filtered out
+        if self.flavour == 'gitea' and request.params.get('type') != 'issues':
+            count += namespace.requests
+        return self.paginate(request, count, lambda index: dict(
+            id=repository['id'] * 100000 + index + 1, number=index + 1, state='open',
+            title='Issue #{}'.format(index + 1)), page_size=10)
+
+    def gitea_collection(self, request, name, repo, collection):
+        namespace, repository = self.lookup(name, repo)
+        if repository is None:
+            return self.not_found()
+        count = dict(pulls=namespace.requests, commits=namespace.commits)[collection]
+        return self.paginate(request, count, lambda index: dict(id=index + 1), page_size=30)
+
+    gogs_routes = [
+        ('GET', r'/user', 'gogs_current_user'),
+        ('GET', r'/user/orgs', 'gogs_orgs'),
+        ('GET', r'/user/repos', 'gogs_own_repositories'),
+        ('GET', r'/users/(?P<name>[^/]+)', 'gogs_user'),
+        ('GET', r'/(users|orgs)/(?P<name>[^/]+)/repos', 'gogs_repositories'),
+        ('GET', r'/repos/(?P<name>[^/]+)/(?P<repo>[^/]+)', 'gogs_repository'),
+        ('GET', r'/repos/(?P<name>[^/]+)/(?P<repo>[^/]+)/issues', 'gogs_issues'),
+    ]
+
+    '''(method, path within the API, handler) by flavour'''
+    route_table = {
+        'github': [
+            ('GET', r'/user', 'github_user'),
+            ('GET', r'/(users|orgs)/(?P<name>[^/]+)', 'github_owner'),
+            ('GET', r'/(users|orgs)/(?P<name>[^/]+)/repos', 'github_repositories'),
+            ('GET', r'/users/(?P<name>[^/]+)/gists', 'github_gists'),
+            ('GET', r'/repos/(?P<name>[^/]+)/(?P<repo>[^/]+)', 'github_repository'),
+            ('GET', r'/repos/(?P<name>[^/]+)/(?P<repo>[^/]+)/(?P<collection>pulls|issues|commits|contributors)',
+                    'github_collection'),
+            ('GET', r'/search/issues', 'github_search_issues'),
+            ('POST', r'/graphql', 'github_graphql'),
+        ],
+        'gitlab': [
+            ('GET', r'/user', 'gitlab_current_user'),
+            ('GET', r'/users', 'gitlab_users'),
+            ('GET', r'/projects', 'gitlab_projects'),
+            ('GET', r'/users/(?P<name>[^/]+)/projects', 'gitlab_user_projects'),
+            ('GET', r'/groups/(?P<name>[^/]+)/projects', 'gitlab_group_projects'),
+            ('GET', r'/groups/(?P<name>[^/]+)/merge_requests', 'gitlab_group_merge_requests'),
+            ('GET', r'/projects/(?P<project>[^/]+)', 'gitlab_get_project'),
+            ('GET', r'/projects/(?P<project>[^/]+)/(?P<collection>merge_requests|issues|repository/commits|members)',
+                    'gitlab_collection'),
+        ],
+        'gogs': gogs_routes,
+        'gitea': gogs_routes + [
+            ('GET', r'/repos/(?P<name>[^/]+)/(?P<repo>[^/]+)/(?P<collection>pulls|commits)', 'gitea_collection'),
+        ],
+    }
@@ -7,6 +7,7 @@ from testfixtures import Replace, ShouldRaise, compare
 from testfixtures.popen import MockPopen
 
 from contextlib import contextmanager
+from datetime import datetime
 
 import os
 import sys
@@ -14,6 +15,7 @@ import logging
 import betamax
 
 from git_repo.repo import RepositoryService, main
+from git_repo.services.cache import IdentityCache
 
 
 class TestGitPopenMockupMixin:
@@ -77,6 +79,11 @@ class RepositoryMockup(RepositoryService):
 
     def clone(self, *args, **kwarg):
         self._did_clone = (args, kwarg)
+        if args[1] == 'bad':
+            raise Exception('bad repository!')
+
+    def get_repository_slugs(self, user):
+        return ['{}/{}'.format(user, repo) for repo in ('repo1', 'repo2', 'repo3')]
 
     def add(self, repo, user=None, *args, **kwarg):
         self._did_add = ((user, repo)+args, kwarg)
@@ -150,6 +157,9 @@ class RepositoryMockup(RepositoryService):
         yield ('2', 'desc2', 'http://request/2')
         yield ('3', 'desc3', 'http://request/3')
 
+    def get_requests(self, user, repo):
+        yield (int(repo[-1]), 'desc', datetime(2016, 3, int(repo[-1])), 'http://{}/{}/request'.format(user, repo))
+
     def request_fetch(self, *args, **kwarg):
         self._did_request_fetch = (args, kwarg)
         if args[-1] == 'bad':
@@ -214,6 +224,7 @@ class GitRepoMainTestCase(TestGitPopenMockupMixin):
             '<branch>': None,
             '<target>': self.target,
             '<target_repo>': None,
+            '<user>': None,
             '<user>/<repo>': '',
             'add': False,
             'clone': False,
@@ -264,6 +275,13 @@ class GitRepoMainTestCase(TestGitPopenMockupMixin):
         }, args)), "Non {} result for clone".format(rc)
         return RepositoryService._current._did_clone
 
+    def main_clone_batch(self, rc=0, args={}):
+        assert rc == main(self.setup_args({
+            'clone': True,
+            '--path': self.tempdir.name
+        }, args)), "Non {} result for clone".format(rc)
+        return sorted(name for name in os.listdir(self.tempdir.name) if name != '.git')
+
     def main_create(self, repo=None, rc=0, args={}):
         if repo:
             repo_path = os.path.join(self.tempdir.name, repo.split('/')[-1])
@@ -397,6 +415,8 @@ class GitRepoTestCase(TestGitPopenMockupMixin):
         self.log.info('GitRepoTestCase.setup_method({})'.format(method))
         # build temporary directory
         self.tempdir = TemporaryDirectory()
+        # cassettes have been recorded with different accounts for the same token
+        IdentityCache._identities.clear()
         # when initiating service with no repository, the connection is not triggered
         self.service = self.get_service()
         # setup http api mockup
@@ -12,11 +12,13 @@ log = logging.getLogger('test.bitbucket')
 import os
 import sys
 import pytest
+import dateutil.parser
 
 from tests.helpers import GitRepoTestCase
 
-from git_repo.services.service import bitbucket
+from git_repo.services.ext import bitbucket
 from git_repo.exceptions import ResourceNotFoundError, ResourceError
+from git_repo.tools import columnize
 
 class Test_BitBucket(GitRepoTestCase):
     log = log
@@ -101,6 +103,8 @@ class Test_BitBucket(GitRepoTestCase):
 
     def test_13_snippet_list(self):
         s_list = [
+            '{:45.45} {}',
+            ('url', 'title'),
             ('https://bitbucket.org/snippets/guyzmo/ggd4X', 'test'),
             ('https://bitbucket.org/snippets/guyzmo/ggda9', 'test2'),
             ('https://bitbucket.org/snippets/guyzmo/77gaA', 'test3'),
@@ -211,12 +215,14 @@ class Test_BitBucket(GitRepoTestCase):
                 namespace='atlassian',
                 repository='python-bitbucket',
                 rq_list_data=[
-            ('1', 'Bugfixes for two crashes appearing during reply parsing of repository_create (output of this command is different from normal status, unfortunately). The latter appeared after I fixed the former.', 'https://bitbucket.org/atlassian/python-bitbucket/pull-requests/1'),
-            ('2', 'Attempt to fix bitbucket_create crash again, this time py3k compatible', 'https://bitbucket.org/atlassian/python-bitbucket/pull-requests/2'),
-            ('3', '[WIP] Initial support for webhooks', 'https://bitbucket.org/atlassian/python-bitbucket/pull-requests/3'),
-            ('4', 'fix: lookups for PRs based on state were calling a non existant method', 'https://bitbucket.org/atlassian/python-bitbucket/pull-requests/4'),
-            ('5', '🚧 Fork feature implementation', 'https://bitbucket.org/atlassian/python-bitbucket/pull-requests/5'),
-            ('6', '💄 Updated code style to be closer to python3 style', 'https://bitbucket.org/atlassian/python-bitbucket/pull-requests/6'),
+            '{}\t{:<60}\t{}',
+            ('id', 'title', 'URL'),
+            (1, 'Bugfixes for two crashes appearing during reply parsing of repository_create (output of this command is different from normal status, unfortunately). The latter appeared after I fixed the former.', 'https://bitbucket.org/atlassian/python-bitbucket/pull-requests/1'),
+            (2, 'Attempt to fix bitbucket_create crash again, this time py3k compatible', 'https://bitbucket.org/atlassian/python-bitbucket/pull-requests/2'),
+            (3, '[WIP] Initial support for webhooks', 'https://bitbucket.org/atlassian/python-bitbucket/pull-requests/3'),
+            (4, 'fix: lookups for PRs based on state were calling a non existant method', 'https://bitbucket.org/atlassian/python-bitbucket/pull-requests/4'),
+            (5, '🚧 Fork feature implementation', 'https://bitbucket.org/atlassian/python-bitbucket/pull-requests/5'),
+            (6, '💄 Updated code style to be closer to python3 style', 'https://bitbucket.org/atlassian/python-bitbucket/pull-requests/6'),
         ])
 
     def test_30_request_list_empty(self):
@@ -368,7 +374,7 @@ class Test_BitBucket(GitRepoTestCase):
 
     def test_34_list__short(self, caplog):
         projects = self.action_list(namespace='git-repo-test')
-        assert projects == ['{}', ('Total repositories: 1',), ['git-repo-test/git-repo']]
+        assert projects == [columnize, ('Name',), ('git-repo-test/git-repo',)]
         assert 'GET /2.0/users/git-repo-test' in caplog.text
         assert 'GET /2.0/repositories/git-repo-test HTTP/1.1' in caplog.text
 
@@ -376,7 +382,7 @@ class Test_BitBucket(GitRepoTestCase):
         projects = self.action_list(namespace='git-repo-test', _long=True)
         assert projects == ['{}\t{}\t{}\t{}\t{}\t{}\t{}\t{}\t{}\t{:12}\t{}',
                 ['Status', 'Commits', 'Reqs', 'Issues', 'Forks', 'Coders', 'Watch', 'Likes', 'Lang', 'Modif', 'Name'],
-                ['F ', '92', '1', 'N.A.', '1', 'N.A.', '1', 'N.A.', 'python', '2016-03-30T13:30:15.637449+00:00', 'git-repo-test/git-repo']]
+                ['F ', 92, 0, None, 0, None, 1, None, 'python', dateutil.parser.parse('2016-03-30T13:30:15.637449+00:00'), 'git-repo-test/git-repo']]
         assert 'GET /2.0/users/git-repo-test' in caplog.text
         assert 'GET /2.0/repositories/git-repo-test HTTP/1.1' in caplog.text
 
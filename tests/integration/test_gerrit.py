@@ -11,7 +11,7 @@ log = logging.getLogger('test.gerrit')
 
 from tests.helpers import GitRepoTestCase
 
-from git_repo.services.service import gerrit
+from git_repo.services.ext import gerrit
 
 class Test_Gerrit(GitRepoTestCase):
     log = log
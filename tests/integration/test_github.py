@@ -17,8 +17,9 @@ log = logging.getLogger('test.github')
 
 from tests.helpers import GitRepoTestCase
 
-from git_repo.services.service import github
+from git_repo.services.ext import github
 from git_repo.exceptions import ResourceExistsError, ResourceNotFoundError, ResourceError
+from git_repo.tools import columnize
 
 
 class Test_Github(GitRepoTestCase):
@@ -314,8 +315,8 @@ class Test_Github(GitRepoTestCase):
                 rq_list_data=[
             '{}\t{:<60}\t{}',
             ('id', 'title', 'URL'),
-            ('3', 'docs for fqdn > url', 'https://github.com/guyzmo/git-repo/pull/3'),
-            ('2', 'prefer gitrepo.<target>.token > privatekey, docs', 'https://github.com/guyzmo/git-repo/pull/2'),
+            (3, 'docs for fqdn > url', 'https://github.com/guyzmo/git-repo/pull/3'),
+            (2, 'prefer gitrepo.<target>.token > privatekey, docs', 'https://github.com/guyzmo/git-repo/pull/2'),
         ])
 
     def test_31_request_fetch(self):
@@ -381,14 +382,16 @@ class Test_Github(GitRepoTestCase):
 
     def test_34_list__short(self, caplog):
         projects = self.action_list(namespace='git-repo-test')
-        assert projects == ['{}', ('Total repositories: 1',), ['git-repo-test/git-repo']]
+        assert projects == [columnize, ('Name',), ('git-repo-test/git-repo',)]
         assert 'GET https://api.github.com/users/git-repo-test/repos' in caplog.text
 
     def test_34_list__long(self, caplog):
         projects = self.action_list(namespace='git-repo-test', _long=True)
-        assert projects == ['{}\t{}\t{}\t{}\t{}\t{}\t{}\t{}\t{}\t{:12}\t{}',
-                ['Status', 'Commits', 'Reqs', 'Issues', 'Forks', 'Coders', 'Watch', 'Likes', 'Lang', 'Modif', 'Name'],
-                ['F ', '92', '0', '0', '0', '1', '0', '0', 'Python', 'Mar 30 2016', 'git-repo-test/git-repo']]
+        assert projects[:2] == ['{}\t{}\t{}\t{}\t{}\t{}\t{}\t{}\t{}\t{:12}\t{}',
+                ['Status', 'Commits', 'Reqs', 'Issues', 'Forks', 'Coders', 'Watch', 'Likes', 'Lang', 'Modif', 'Name']]
+        row = projects[2]
+        assert row[:9] + row[10:] == ['F ', 92, 0, 0, 0, 1, 0, 0, 'Python', 'git-repo-test/git-repo']
+        assert (2016, 3, 30) == (row[9].year, row[9].month, row[9].day)
         assert 'GET https://api.github.com/users/git-repo-test/repos' in caplog.text
 
 
@@ -15,7 +15,7 @@ import pytest
 
 from tests.helpers import GitRepoTestCase
 
-from git_repo.services.service import gitlab
+from git_repo.services.ext import gitlab
 from git_repo.exceptions import ResourceExistsError, ResourceNotFoundError, ResourceError, ArgumentError
 
 class Test_Gitlab(GitRepoTestCase):
@@ -239,7 +239,7 @@ class Test_Gitlab(GitRepoTestCase):
                 rq_list_data=[
             '{:>3}\t{:<60}\t{:2}',
             ('id', 'title', 'URL'),
-            ('1', 'Adding gitlab gists and requests feature', 'https://gitlab.com/git-repo-test/git-repo/merge_requests/1'),
+            (1, 'Adding gitlab gists and requests feature', 'https://gitlab.com/git-repo-test/git-repo/merge_requests/1'),
         ])
 
     def test_19_request_fetch(self):
@@ -16,7 +16,7 @@ from urllib.parse import urlparse
 
 from tests.helpers import GitRepoTestCase
 
-from git_repo.services.service import gogs
+from git_repo.services.ext import gogs
 from git_repo.exceptions import ResourceExistsError, ResourceNotFoundError
 
 from betamax import Betamax
@@ -4,6 +4,9 @@ import logging
 import pytest
 import os
 
+from tempfile import TemporaryDirectory
+from git import Repo
+
 #################################################################################
 # Enable logging
 
@@ -11,7 +14,8 @@ log = logging.getLogger('test.main')
 
 #################################################################################
 
-from tests.helpers import GitRepoMainTestCase
+from git_repo.services.service import RepositoryService
+from tests.helpers import GitRepoMainTestCase, main
 
 class Test_Main(GitRepoMainTestCase):
     log = log
@@ -118,6 +122,73 @@ class Test_Main(GitRepoMainTestCase):
         repo_slug_branch, seen_args = self.main_clone('git@service.com/guyzmo/git-repo', 0)
         assert ('guyzmo', 'git-repo', 'master') == repo_slug_branch
 
+    def test_clone__all(self, capsys):
+        cloned = self.main_clone_batch(0, args={'--all': True, '<user>': 'guyzmo'})
+        assert ['repo1', 'repo2', 'repo3'] == cloned
+        out, err = capsys.readouterr()
+        assert 'ok\tguyzmo/repo2\t{}'.format(os.path.join(self.tempdir.name, 'repo2')) in out
+        assert 'Cloned 3 repositories out of 3.' in err
+
+    def test_clone__all__options(self):
+        self.main_clone_batch(0, args={'--all': True, '<user>': 'guyzmo', '--jobs': '2', '--no-cache': True})
+        # the options are the service's, not every service's of the process
+        assert 2 == RepositoryService._current.jobs
+        assert RepositoryService._current.use_cache is False
+        assert RepositoryService.use_cache is None
+        assert RepositoryService.pool_size is None
+
+    def test_clone__from_file(self, capsys):
+        slugs_file = os.path.join(self.tempdir.name, 'repositories.txt')
+        with open(slugs_file, 'w') as f:
+            f.write('# repositories to clone\nguyzmo/repo1\n\nhttps://service.com/guyzmo/bad\nguyzmo/repo3\n')
+        cloned = self.main_clone_batch(1, args={'--from': slugs_file})
+        assert ['repo1', 'repo3', 'repositories.txt'] == cloned
+        out, err = capsys.readouterr()
+        assert 'failed\tguyzmo/bad\tbad repository!' in out
+        assert 'Cloned 2 repositories out of 3.' in err
+
+    def test_clone__from_file__same_folder(self, capsys):
+        slugs_file = os.path.join(self.tempdir.name, 'repositories.txt')
+        with open(slugs_file, 'w') as f:
+            f.write('guyzmo/repo1\nguyzmo/sub/repo1\nguyzmo/bad\nother/bad\n')
+        cloned = self.main_clone_batch(1, args={'--from': slugs_file})
+        assert ['repo1', 'repositories.txt'] == cloned
+        out, err = capsys.readouterr()
+        assert 'ok\tguyzmo/repo1\t{}'.format(os.path.join(self.tempdir.name, 'repo1')) in out
+        assert 'failed\tguyzmo/sub/repo1\tthe folder {} is where guyzmo/repo1 is cloned'.format(
+            os.path.join(self.tempdir.name, 'repo1')) in out
+        assert 'failed\tother/bad\tthe folder {} is where guyzmo/bad is cloned'.format(
+            os.path.join(self.tempdir.name, 'bad')) in out
+        assert 'Cloned 1 repositories out of 4.' in err
+
+    def test_push_all(self, capsys):
+        with TemporaryDirectory() as mirrors:
+            mirror_paths = [os.path.join(mirrors, name) for name in ('mirror1', 'mirror2', 'missing')]
+            for path in mirror_paths[:2]:
+                Repo.init(path, bare=True)
+            with open(os.path.join(self.tempdir.name, 'README'), 'w') as f:
+                f.write('README')
+            self.repository.index.add(['README'])
+            commit = self.repository.index.commit('README')
+            self.repository.create_remote('github', mirror_paths[0])
+            self.repository.create_remote('all', mirror_paths[0])
+            for path in mirror_paths[1:]:
+                self.repository.git.remote('set-url', '--add', 'all', path)
+
+            assert 1 == main(self.setup_args({'push-all': True, '--path': self.tempdir.name}))
+            for path in mirror_paths[:2]:
+                assert commit == Repo(path).heads.master.commit
+            out, err = capsys.readouterr()
+            assert 'github{}  ✓ refs/heads/master [new branch]\n'.format(' '*(len(mirror_paths[1])-len('github'))) in err
+            assert "{}  ✗ '{}' does not appear to be a git repository\n".format(mirror_paths[2], mirror_paths[2]) in err
+            assert 'Failed to push to 1 remote URLs out of 3.' in err
+
+    def test_sync(self, capsys):
+        assert 0 == main(self.setup_args({'sync': True, '<dir>': self.tempdir.name}))
+        out, err = capsys.readouterr()
+        assert 'no upstream\t\t\tmaster\t.\t\n' == out
+        assert 'Synchronized 1 repositories: 0 behind, 0 diverged, 0 failed.' in err
+
     # def test_clone__too_many_slashes(self):
     #     did_clone = self.main_clone('guyzmo/git/repo', 2)
     #     assert None is did_clone
@@ -316,6 +387,22 @@ class Test_Main(GitRepoMainTestCase):
         out, err = capsys.readouterr()
         assert out ==  '1 desc1 http://request/1\n2 desc2 http://request/2\n3 desc3 http://request/3\n'
 
+    def test_request_list__namespace(self, capsys, caplog):
+        assert 0 == main(self.setup_args({
+            'request': True,
+            'list': True,
+            '<user>': 'guyzmo',
+            '<namespace>/<repo>': None,
+            '--format': 'tsv',
+        }))
+        out, err = capsys.readouterr()
+        assert out == ''.join([
+            'repository\tid\ttitle\tupdated\turl\n',
+            'guyzmo/repo3\t3\tdesc\t2016-03-03T00:00:00\thttp://guyzmo/repo3/request\n',
+            'guyzmo/repo2\t2\tdesc\t2016-03-02T00:00:00\thttp://guyzmo/repo2/request\n',
+            'guyzmo/repo1\t1\tdesc\t2016-03-01T00:00:00\thttp://guyzmo/repo1/request\n',
+        ])
+
     # Commented out because this does not work on travis CI
     # def test_request_list__no_repo_slug__git(self, capsys, caplog):
     #     from subprocess import call
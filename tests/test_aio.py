@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+
+import asyncio
+
+from datetime import datetime
+
+import pytest
+
+from git_repo.exceptions import ResourceNotFoundError
+from git_repo.services.aio import SyncRepositoryService
+from git_repo.services.cache import IdentityCache
+from git_repo.services.ext import github, gitlab
+from git_repo.tools import columnize
+
+
+class FakeAPI:
+    '''serves canned pages instead of talking to the API, with the headers of the service'''
+    def __init__(self, service, routes):
+        super().__init__(service)
+        self.routes = routes
+        self.requests = []
+
+    async def connect(self):
+        self.connected = True
+
+    async def close(self):
+        self.connected = False
+
+    async def request(self, method, path, params=None, data=None):
+        assert self.connected
+        params = params or {}
+        self.requests.append((path, params.get('page', 1)))
+        route = self.routes.get(path)
+        if route is None:
+            raise ResourceNotFoundError('Not found: {}'.format(path))
+        if callable(route):
+            return route(params)
+        return route, {}, {}
+
+class FakeGithub(FakeAPI, github.AsyncGithubService):
+    pass
+
+class FakeGitlab(FakeAPI, gitlab.AsyncGitlabService):
+    pass
+
+
+def run(coroutine):
+    return asyncio.new_event_loop().run_until_complete(coroutine)
+
+def github_pages(objects):
+    '''GitHub style pagination, with a Link header'''
+    def route(params):
+        size = params.get('per_page', 30)
+        page = params.get('page', 1)
+        last = max(1, (len(objects) + size - 1) // size)
+        links = {}
+        if page < last:
+            links['next'] = dict(url='https://api.github.com/x?per_page={}&page={}'.format(size, page + 1))
+            links['last'] = dict(url='https://api.github.com/x?per_page={}&page={}'.format(size, last))
+        return objects[(page - 1) * size:page * size], {}, links
+    return route
+
+def gitlab_pages(objects):
+    '''GitLab style pagination, with X-Total headers'''
+    def route(params):
+        size = params.get('per_page', 20)
+        page = params.get('page', 1)
+        headers = {'X-Total': str(len(objects)),
+                   'X-Total-Pages': str(max(1, (len(objects) + size - 1) // size))}
+        return objects[(page - 1) * size:page * size], headers, {}
+    return route
+
+def github_repository(name, **kwarg):
+    repository = dict(name=name, full_name='foo/{}'.format(name), fork=False, private=False,
+                      forks_count=1, watchers_count=2, stargazers_count=3, language='Python',
+                      updated_at='2016-03-30T13:32:31Z')
+    repository.update(kwarg)
+    return repository
+
+
+@pytest.fixture
+def github_service():
+    service = github.GithubService(c={'__name__': 'gitrepo "github"', 'token': 'secret'})
+    routes = {
+        'user': dict(login='foo'),
+        'users/foo': dict(login='foo'),
+        'users/foo/repos': github_pages([github_repository('repo{}'.format(x)) for x in range(250)]),
+        'users/foo/gists': github_pages([dict(description='gist', html_url='https://gist.github.com/1')]),
+        'repos/foo/repo/pulls': github_pages([dict(number=2, title='fix', html_url='https://github.com/foo/repo/pull/2')]),
+        'repos/foo/repo': github_repository('repo', parent=dict(name='repo', owner=dict(login='bar'))),
+    }
+    for x in range(250):
+        for collection, total in (('commits', 92), ('pulls', 1), ('issues', 3), ('contributors', 2)):
+            routes['repos/foo/repo{}/{}'.format(x, collection)] = github_pages([{}] * total)
+    return service, FakeGithub(service, routes)
+
+
+def test_github__paginate(github_service):
+    service, api = github_service
+    api.connected = True
+    repositories = run(api.paginate('users/foo/repos'))
+    assert ['repo{}'.format(x) for x in range(250)] == [repository['name'] for repository in repositories]
+    assert [('users/foo/repos', page) for page in (1, 2, 3)] == sorted(api.requests)
+
+def test_github__list(github_service):
+    service, api = github_service
+    api.connected = True
+    listing = run(api.list('foo'))
+    assert [columnize, ('Name',)] == listing[:2]
+    assert ('foo/repo249',) == listing[-1]
+
+def test_github__list_long(github_service):
+    service, api = github_service
+    api.connected = True
+    listing = run(api.list('foo', _long=True))
+    assert api.list_header == listing[1]
+    assert 252 == len(listing)
+    assert ['  ', 92, 1, 2, 1, 2, 2, 3, 'Python'] == listing[2][:9]
+    assert isinstance(listing[2][9], datetime)
+    assert 'foo/repo0' == listing[2][10]
+
+def test_github__count__no_content(github_service):
+    service, api = github_service
+    api.connected = True
+    # GitHub answers 204 without content for the contributors of an empty repository
+    api.routes['repos/foo/empty/contributors'] = lambda params: (None, {}, {})
+    assert 0 == run(api.count('repos/foo/empty/contributors'))
+    assert [] == run(api.paginate('repos/foo/empty/contributors'))
+
+def test_github__user(github_service):
+    service, api = github_service
+    api.connected = True
+    IdentityCache._identities.clear()
+    assert 'foo' == run(api.user())
+    # the identity is memoized for the blocking service too
+    assert 'foo' == service.get_identity(lambda: pytest.fail('the identity is already known'))
+
+def test_github__unknown_user(github_service):
+    service, api = github_service
+    api.connected = True
+    with pytest.raises(ResourceNotFoundError):
+        run(api.list('bar'))
+
+def test_github__parent(github_service):
+    service, api = github_service
+    api.connected = True
+    assert 'https://github.com/bar/repo' == run(api.get_parent_project_url('foo', 'repo', rw=False))
+
+def test_gitlab__list_long():
+    service = gitlab.GitlabService(c={'__name__': 'gitrepo "gitlab"', 'token': 'secret'})
+    routes = {
+        'users/foo/projects': gitlab_pages([dict(id=x, path_with_namespace='foo/repo{}'.format(x),
+                                                 name_with_namespace='foo / repo{}'.format(x),
+                                                 visibility='private', forks_count=0, star_count=1,
+                                                 last_activity_at='2016-03-30T13:32:31Z')
+                                            for x in range(3)]),
+    }
+    for x in range(3):
+        for collection in ('repository/commits', 'merge_requests', 'issues', 'members'):
+            routes['projects/{}/{}'.format(x, collection)] = gitlab_pages([{}] * 5)
+    api = FakeGitlab(service, routes)
+    api.connected = True
+    listing = run(api.list('foo', _long=True))
+    assert [' P', 5, 5, 5, 0, 5, None, 1, None] == listing[2][:9]
+    assert 'foo / repo2' == listing[4][10]
+
+
+def test_sync_shim(github_service):
+    service, api = github_service
+    service.async_service = lambda service: api
+    shim = SyncRepositoryService(service)
+    listing = shim.list('foo')
+    assert columnize == next(listing)
+    assert ('Name',) == next(listing)
+    assert 250 == len(list(listing))
+    assert [(2, 'fix', 'https://github.com/foo/repo/pull/2')] == list(shim.request_list('foo', 'repo'))[2:]
+    assert [('gist', 'https://gist.github.com/1')] == list(shim.gist_list())[2:]
+    # the client only lives for the operation
+    assert not api.connected
+    # everything else is the blocking service's
+    shim.jobs = 3
+    assert 3 == service.jobs
+    assert service.url_ro == shim.url_ro
+    shim.close()
+    assert shim.loop.is_closed()
+
+def test_get_service__async(monkeypatch):
+    from git_repo.services.service import RepositoryService
+    config = {'__name__': 'gitrepo "github"', 'token': 'secret', 'async': 'true'}
+    class ConfigParser:
+        _sections = {'gitrepo "github"': config}
+        def __init__(self, path):
+            pass
+        def sections(self):
+            return list(self._sections)
+    monkeypatch.setattr('git.config.GitConfigParser', ConfigParser)
+    # other tests replace the services with mockups
+    monkeypatch.setattr(RepositoryService, 'service_map', {'github': github.GithubService})
+    service = RepositoryService.get_service(None, 'github')
+    assert isinstance(service, SyncRepositoryService)
+    assert isinstance(service.async_service, github.AsyncGithubService)
+    config['async'] = 'false'
+    assert isinstance(RepositoryService.get_service(None, 'github'), github.GithubService)
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+
+import json
+
+from types import SimpleNamespace
+from urllib.parse import parse_qs, urlsplit
+
+from requests import Response, Session
+from requests.adapters import BaseAdapter
+
+from git_repo.services.ext.bitbucket import BitbucketService
+
+
+API = 'https://api.bitbucket.org/2.0/repositories/foo/{}/{}'
+
+
+class PagesAdapter(BaseAdapter):
+    '''serves Bitbucket style pages of collections of known sizes, the commits having no size'''
+    def __init__(self, sizes):
+        super().__init__()
+        self.sizes = sizes
+        self.requests = []
+
+    def send(self, request, **kwarg):
+        url = urlsplit(request.url)
+        params = {name: int(value[0]) for name, value in parse_qs(url.query).items()}
+        self.requests.append((url.path, params))
+        collection = url.path.split('/')[-1]
+        size, pagelen, page = self.sizes[collection], params.get('pagelen', 10), params.get('page', 1)
+        content = dict(pagelen=pagelen, values=[{}] * max(0, min(pagelen, size - (page - 1) * pagelen)))
+        if collection != 'commits':
+            content['size'] = size
+        if page * pagelen < size:
+            content['next'] = '{}://{}{}?pagelen={}&page={}'.format(url.scheme, url.netloc, url.path, pagelen, page + 1)
+        response = Response()
+        response.status_code = 200
+        response.url = request.url
+        response.request = request
+        response._content = json.dumps(content).encode('utf-8')
+        return response
+
+    def close(self):
+        pass
+
+
+def make_repository(name):
+    return SimpleNamespace(name=name, is_private=False, language='python', updated_on='2016-03-30T13:32:31Z',
+                           links={collection: dict(href=API.format(name, collection))
+                                  for collection in ('commits', 'pullrequests', 'forks', 'watchers')})
+
+
+def test_list_long():
+    service = BitbucketService(c={'__name__': 'gitrepo "bitbucket"', 'jobs': '4'})
+    adapter = PagesAdapter(dict(commits=250, pullrequests=42, forks=3, watchers=7))
+    service.bb.client.session = Session()
+    service.bb.client.session.mount('https://', adapter)
+    user = SimpleNamespace(username='foo', repositories=lambda: [make_repository('repo{}'.format(x)) for x in range(10)])
+    service._get_user = lambda name: user
+    rows = list(service.list('foo', _long=True))[2:]
+    assert ['foo/repo{}'.format(x) for x in range(10)] == [row[-1] for row in rows]
+    assert [[250, 42, 3, 7]] * 10 == [[row[1], row[2], row[4], row[6]] for row in rows]
+    # one request per sized collection, and pages of 100 commits once their first page tells no size
+    pulls = [params for path, params in adapter.requests if path.endswith('/repo0/pullrequests')]
+    assert [dict(pagelen=1)] == pulls
+    commits = [params for path, params in adapter.requests if path.endswith('/repo0/commits')]
+    assert [dict(pagelen=1), dict(pagelen=100), dict(pagelen=100, page=2), dict(pagelen=100, page=3)] == commits
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+
+import os
+import time
+
+from tempfile import TemporaryDirectory
+
+from requests import Session, Response
+from requests.adapters import BaseAdapter
+
+from unittest.mock import patch
+
+from git_repo.services.cache import HTTPCache, IdentityCache
+from git_repo.services.service import RepositoryService
+
+
+class ForgeAdapter(BaseAdapter):
+    '''answers with an ETag, and with a 304 when the ETag is sent back'''
+    def __init__(self):
+        super().__init__()
+        self.requests = []
+
+    def send(self, request, **kwarg):
+        self.requests.append(request)
+        response = Response()
+        response.url = request.url
+        response.request = request
+        response.headers['ETag'] = '"v1"'
+        response.headers['X-RateLimit-Remaining'] = str(5000 - len(self.requests))
+        if request.headers.get('If-None-Match') == '"v1"':
+            response.status_code = 304
+            response._content = b''
+        else:
+            response.status_code = 200
+            response._content = '{{"login": "{}"}}'.format(request.url.split('/')[-1]).encode('utf-8')
+        return response
+
+    def close(self):
+        pass
+
+
+def make_session(cache):
+    session = Session()
+    adapter = ForgeAdapter()
+    session.mount('https://', adapter)
+    cache.install(session)
+    return session, adapter
+
+def test_http_cache__revalidation():
+    with TemporaryDirectory() as path:
+        session, adapter = make_session(HTTPCache(path))
+        assert session.get('https://forge/users/foo').json() == {'login': 'foo'}
+        response = session.get('https://forge/users/foo')
+        assert response.json() == {'login': 'foo'}
+        assert response.status_code == 200
+        assert getattr(response, 'from_cache', False)
+        assert adapter.requests[1].headers['If-None-Match'] == '"v1"'
+        # metadata is refreshed from the revalidation
+        assert response.headers['X-RateLimit-Remaining'] == '4998'
+
+def test_http_cache__keyed_by_identity():
+    with TemporaryDirectory() as path:
+        session, adapter = make_session(HTTPCache(path))
+        session.get('https://forge/users/foo', headers={'Authorization': 'token a'})
+        session.get('https://forge/users/foo', headers={'Authorization': 'token b'})
+        assert 'If-None-Match' not in adapter.requests[1].headers
+
+def test_http_cache__eviction():
+    with TemporaryDirectory() as path:
+        cache = HTTPCache(path, max_size=1024)
+        session, adapter = make_session(cache)
+        for user in range(50):
+            session.get('https://forge/users/{}'.format(user))
+        assert sum(entry.stat().st_size for entry in os.scandir(path)) <= 1024
+
+def test_http_cache__size():
+    with TemporaryDirectory() as path:
+        cache = HTTPCache(path)
+        session, adapter = make_session(cache)
+        with patch('os.scandir', wraps=os.scandir) as scandir:
+            for user in range(50):
+                session.get('https://forge/users/{}'.format(user))
+        # the entries are only listed on the first write, as the cache stays small
+        assert 1 == scandir.call_count
+        assert sum(entry.stat().st_size for entry in os.scandir(path)) == cache.size
+
+
+def setup_function(function):
+    IdentityCache._identities.clear()
+
+def test_identity_cache__process():
+    lookups = []
+    def lookup():
+        lookups.append(1)
+        return 'foo'
+    key = IdentityCache.key('forge', 'forge.example.org', 'token')
+    assert 'foo' == IdentityCache().lookup(key, lookup)
+    # another instance in the same process reuses the identity
+    assert 'foo' == IdentityCache().lookup(key, lookup)
+    assert 1 == len(lookups)
+
+def test_identity_cache__keyed_by_credentials():
+    key_a = IdentityCache.key('forge', 'forge.example.org', 'token a')
+    key_b = IdentityCache.key('forge', 'forge.example.org', 'token b')
+    assert key_a != key_b
+    assert 'token' not in key_a
+    IdentityCache().set(key_a, 'foo')
+    assert IdentityCache().get(key_b) is None
+
+def test_identity_cache__disk():
+    key = IdentityCache.key('forge', 'forge.example.org', 'token')
+    with TemporaryDirectory() as path:
+        IdentityCache(path).set(key, 'foo')
+        IdentityCache._identities.clear()
+        assert 'foo' == IdentityCache(path).get(key)
+        assert not any('token' in open(entry.path).read() for entry in os.scandir(path))
+
+def test_identity_cache__ttl():
+    key = IdentityCache.key('forge', 'forge.example.org', 'token')
+    with TemporaryDirectory() as path:
+        IdentityCache(path, ttl=60).set(key, 'foo')
+        IdentityCache._identities.clear()
+        with patch('time.time', return_value=time.time() + 61):
+            assert IdentityCache(path, ttl=60).get(key) is None
+
+def test_identity_cache__invalidate():
+    key = IdentityCache.key('forge', 'forge.example.org', 'token')
+    with TemporaryDirectory() as path:
+        cache = IdentityCache(path)
+        cache.set(key, 'foo')
+        cache.invalidate(key)
+        assert cache.get(key) is None
+
+
+class ForgeService(RepositoryService):
+    name = 'forge'
+    fqdn = 'forge.example.org'
+
+def test_service_identity():
+    service = ForgeService(c={'__name__': 'gitrepo "forge"', 'token': 'secret'})
+    lookups = []
+    def lookup():
+        lookups.append(1)
+        return 'foo'
+    assert 'foo' == service.get_identity(lookup)
+    assert 'foo' == ForgeService(c={'__name__': 'gitrepo "forge"', 'token': 'secret'}).get_identity(lookup)
+    assert 'bar' == ForgeService(c={'__name__': 'gitrepo "forge"', 'token': 'other'}).get_identity(lambda: 'bar')
+    assert 1 == len(lookups)
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+
+import os
+import time
+import subprocess
+
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+import requests
+
+from git_repo.exceptions import ResourceNotFoundError
+from git_repo.services.ext.github import GithubService
+from git_repo.services.ext.gitlab import GitlabService
+from git_repo.services.ext.gogs import GogsService
+
+from tests.forge import FakeForge, Namespace
+
+
+def connected(service_class, forge):
+    service = service_class(c=forge.config())
+    service.connect()
+    return service
+
+
+def test_namespace():
+    namespace = Namespace('acme', repositories=10000, requests=10)
+    assert namespace.repository(42) == namespace.find('repo-00042')
+    assert namespace.find('repo-10000') is None
+    assert namespace.repository(0)['updated_at'] > namespace.repository(1)['updated_at']
+    repository, number, _ = namespace.request(25)
+    assert ('repo-00002', 6) == (repository['name'], number)
+    assert namespace.request(25) == namespace.repository_request(repository, number)
+
+
+def test_github__list():
+    with FakeForge('github', [Namespace('acme', repositories=250)]) as forge:
+        service = connected(GithubService, forge)
+        slugs = list(service.get_repository_slugs('acme'))
+        assert ['acme/repo-{:05}'.format(x) for x in range(250)] == slugs
+        assert 3 == forge.requests['github_repositories']
+
+
+def test_github__list_long():
+    with FakeForge('github', [Namespace('acme', repositories=3, requests=2, issues=1, commits=7,
+                                        contributors=4)]) as forge:
+        service = connected(GithubService, forge)
+        rows = list(service.list('acme', _long=True))[2:]
+        assert ['acme/repo-00000', 'acme/repo-00001', 'acme/repo-00002'] == [row[-1] for row in rows]
+        assert [[7, 2, 1, 4]] * 3 == [[row[1], row[2], row[3], row[5]] for row in rows]
+        # a request of a single object for each count, the total being in the Link header
+        assert 3 * 4 == forge.requests['github_collection']
+
+
+def test_github__list_long__failure(caplog):
+    with FakeForge('github', [Namespace('acme', repositories=3, commits=7)]) as forge:
+        service = connected(GithubService, forge)
+        count = service._count
+        def failing_count(repo, collection, fallback):
+            if repo.name == 'repo-00001':
+                raise requests.ConnectionError('connection reset')
+            return count(repo, collection, fallback)
+        service._count = failing_count
+        rows = list(service.list('acme', _long=True))[2:]
+        assert ['acme/repo-00000', 'acme/repo-00002'] == [row[-1] for row in rows]
+        assert 'Cannot show repository acme/repo-00001: connection reset' in caplog.text
+
+
+def test_github__list_long__graphql():
+    with FakeForge('github', [Namespace('acme', repositories=250, requests=2, issues=1, commits=7)]) as forge:
+        service = GithubService(c=forge.config(graphql='true'))
+        service.connect()
+        rows = list(service.list('acme', _long=True))[2:]
+        assert ['acme/repo-{:05}'.format(x) for x in range(250)] == [row[-1] for row in rows]
+        assert [[7, 2, 1, None]] * 250 == [[row[1], row[2], row[3], row[5]] for row in rows]
+        # a query for each hundred of repositories, and nothing else
+        assert 3 == forge.requests['github_graphql']
+        assert 0 == forge.requests['github_repositories'] + forge.requests['github_collection']
+
+
+def test_github__list_long__graphql_fallback():
+    # the GraphQL API of GitHub Enterprise can be missing, the REST API is used then
+    with FakeForge('github', [Namespace('acme', repositories=3, commits=7)]) as forge:
+        forge.routes = [route for route in forge.routes if route[2].__name__ != 'github_graphql']
+        service = GithubService(c=forge.config(graphql='true'))
+        service.connect()
+        rows = list(service.list('acme', _long=True))[2:]
+        assert [7] * 3 == [row[1] for row in rows]
+        assert 1 == forge.requests['github_repositories']
+
+
+def test_github__graphql_option(tmpdir):
+    config = tmpdir.join('gitconfig')
+    config.write('')
+    GithubService.store_config(str(config), graphql='true')
+    assert {'graphql': 'true'} == GithubService.get_config(str(config))
+
+
+def test_github__list_long__graphql_failure():
+    with FakeForge('github', [Namespace('acme', repositories=250, commits=7)]) as forge:
+        routes = dict((handler.__name__, (index, handler)) for index, (_, _, handler) in enumerate(forge.routes))
+        index, graphql = routes['github_graphql']
+        def failing_graphql(request, **kwarg):
+            if forge.requests['github_graphql'] > 1:
+                return 502, dict(message='Server Error'), {}
+            return graphql(request, **kwarg)
+        failing_graphql.__name__ = 'github_graphql'
+        forge.routes[index] = forge.routes[index][:2] + (failing_graphql,)
+        service = GithubService(c=forge.config(graphql='true'))
+        service.connect()
+        rows = list(service.list('acme', _long=True))[2:]
+        # the first hundred repositories come from GraphQL, the others from REST
+        assert ['acme/repo-{:05}'.format(x) for x in range(250)] == [row[-1] for row in rows]
+        assert [None] * 100 + [1] * 150 == [row[5] for row in rows]
+        assert 2 == forge.requests['github_graphql']
+
+
+def test_github__namespace_requests():
+    with FakeForge('github', [Namespace('acme', repositories=20, requests=10)]) as forge:
+        service = connected(GithubService, forge)
+        requests = list(service.get_namespace_requests('acme'))
+        assert 200 == len(requests)
+        assert ('acme/repo-00000', 1) == requests[0][:2]
+        assert ('acme/repo-00019', 10) == requests[-1][:2]
+        assert 2 == forge.requests['github_search_issues']
+        with pytest.raises(ResourceNotFoundError):
+            list(service.get_namespace_requests('nobody'))
+
+
+def test_github__namespace_requests__beyond_search():
+    with FakeForge('github', [Namespace('acme', repositories=120, requests=10)]) as forge:
+        service = connected(GithubService, forge)
+        requests = list(service.get_namespace_requests('acme'))
+        assert 1200 == len(requests)
+        # the search gives up on that many requests, and the repositories are walked instead
+        assert 1 == forge.requests['github_search_issues']
+        assert 120 == forge.requests['github_collection']
+
+
+def test_gitlab__list_long():
+    with FakeForge('gitlab', [Namespace('acme', repositories=45, requests=3, issues=2, commits=5)]) as forge:
+        service = connected(GitlabService, forge)
+        v3_requests = forge.requests['v3']
+        rows = list(service.list('acme', _long=True))[2:]
+        # the projects and their collections are all asked to the same version of the API
+        assert v3_requests == forge.requests['v3']
+        assert 45 == len(rows)
+        assert [5, 3, 2] == rows[0][1:4]
+        assert 'acme / repo-00044' == rows[-1][-1]
+        # the users' projects cannot be paged with keysets
+        assert 2 == forge.requests['gitlab_user_projects']
+
+
+def test_gitlab__list__group():
+    with FakeForge('gitlab', [Namespace('group', repositories=250, organization=True)]) as forge:
+        service = connected(GitlabService, forge)
+        slugs = list(service.get_repository_slugs('group'))
+        assert ['group/repo-{:05}'.format(x) for x in range(250)] == slugs
+        assert 3 == forge.requests['gitlab_group_projects']
+        assert 1 == forge.requests['gitlab_user_projects']
+        with pytest.raises(ResourceNotFoundError):
+            list(service.get_repository_slugs('nobody'))
+
+
+def test_gitlab__namespace_requests():
+    with FakeForge('gitlab', [Namespace('group', repositories=5, requests=30, organization=True)]) as forge:
+        service = connected(GitlabService, forge)
+        requests = list(service.get_namespace_requests('group'))
+        assert 150 == len(requests)
+        assert ('group/repo-00000', 1) == requests[0][:2]
+
+
+def test_gogs__list():
+    with FakeForge('gogs', [Namespace('forge', repositories=12, issues=3), Namespace('friend', repositories=2)]) as forge:
+        service = connected(GogsService, forge)
+        # the repositories the user collaborates on are not theirs
+        slugs = ['forge/repo-{:05}'.format(x) for x in range(12)]
+        assert slugs == list(service.get_repository_slugs('forge'))
+        assert slugs == [row[-1] for row in list(service.list('forge', _long=True))[2:]]
+
+
+def test_gitea__list():
+    namespaces = [Namespace('forge', repositories=5),
+                  Namespace('acme', repositories=120, organization=True),
+                  Namespace('other', repositories=1000)]
+    with FakeForge('gitea', namespaces) as forge:
+        service = connected(GogsService, forge)
+        slugs = list(service.get_repository_slugs('acme'))
+        assert ['acme/repo-{:05}'.format(x) for x in range(120)] == slugs
+        # only the pages of the namespace are asked for
+        assert 3 == forge.requests['gogs_repositories']
+        assert 0 == forge.requests['gogs_own_repositories']
+        with pytest.raises(ResourceNotFoundError):
+            list(service.get_repository_slugs('nobody'))
+
+
+def test_gogs__list_long():
+    # Gogs serves pages of 10 issues, whatever the limit asked, and cannot list commits nor pulls
+    with FakeForge('gogs', [Namespace('forge', repositories=3, issues=25, requests=2)]) as forge:
+        service = connected(GogsService, forge)
+        rows = list(service.list('forge', _long=True))[2:]
+        assert [[None, None, 25]] * 3 == [row[1:4] for row in rows]
+        assert 3 * 3 == forge.requests['gogs_issues']
+
+
+def test_gitea__list_long():
+    # Gitea gives the totals in a header
+    with FakeForge('gitea', [Namespace('forge', repositories=3, issues=25, requests=2, commits=70)]) as forge:
+        service = connected(GogsService, forge)
+        rows = list(service.list('forge', _long=True))[2:]
+        assert [[70, 2, 25]] * 3 == [row[1:4] for row in rows]
+        assert 3 == forge.requests['gogs_issues']
+
+
+def test_rate_limit():
+    with FakeForge('github', [Namespace('acme', repositories=1)], rate_limit=2, rate_limit_window=1) as forge:
+        session = requests.Session()
+        url = '{}/api/v3/repos/acme/repo-00000'.format(forge.url)
+        response = session.get(url)
+        assert '1' == response.headers['X-RateLimit-Remaining']
+        session.get(url)
+        response = session.get(url)
+        assert 429 == response.status_code
+        assert '0' == response.headers['X-RateLimit-Remaining']
+        assert 1 <= int(response.headers['Retry-After'])
+        time.sleep(int(response.headers['X-RateLimit-Reset']) - time.time() + 0.1)
+        assert 200 == session.get(url).status_code
+
+
+def test_latency():
+    with FakeForge('github', [Namespace('acme', repositories=10)], latency=0.2) as forge:
+        urls = ['{}/api/v3/repos/acme/repo-{:05}'.format(forge.url, x) for x in range(10)]
+        start = time.time()
+        with ThreadPoolExecutor(10) as executor:
+            assert [200] * 10 == [response.status_code for response in executor.map(requests.get, urls)]
+        # the requests are served concurrently
+        assert 0.2 <= time.time() - start < 1
+
+
+def test_clone(tmpdir):
+    with FakeForge('github', [Namespace('acme', repositories=2)]) as forge:
+        target = str(tmpdir.join('repo'))
+        subprocess.check_call(['git', 'clone', '-q', '{}/acme/repo-00001.git'.format(forge.url), target])
+        assert os.path.exists(os.path.join(target, 'README'))
+        assert 0 < forge.requests['git']
+        assert 0 != subprocess.call(['git', 'clone', '-q', '{}/acme/repo-00002'.format(forge.url),
+                                     str(tmpdir.join('missing'))], stderr=subprocess.DEVNULL)
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+
+import json
+
+from urllib.parse import parse_qs, urlsplit
+
+from requests import Response
+from requests.adapters import BaseAdapter
+
+from git_repo.services.ext.gogs import GogsService
+
+
+class IssuesAdapter(BaseAdapter):
+    '''serves Gogs style pages of issues, of 10 issues whatever the limit asked'''
+    def __init__(self, sizes, ignore_page=False):
+        super().__init__()
+        self.sizes = sizes
+        self.ignore_page = ignore_page
+        self.requests = []
+
+    def send(self, request, **kwarg):
+        url = urlsplit(request.url)
+        repo = url.path.split('/')[-2]
+        page = 1 if self.ignore_page else int(parse_qs(url.query).get('page', ['1'])[0])
+        self.requests.append((repo, page))
+        response = Response()
+        response.status_code = 200
+        response.url = request.url
+        response.request = request
+        response._content = json.dumps([dict(number=number) for number in
+                                        range((page - 1) * 10, min(page * 10, self.sizes[repo]))]).encode('utf-8')
+        return response
+
+    def close(self):
+        pass
+
+
+def make_service(adapter):
+    service = GogsService(c={'__name__': 'gitrepo "gogs"', 'token': 'secret'})
+    service.gg.setup(service.url_ro)
+    service.gg.set_token('secret')
+    service.gg.session.mount('https://', adapter)
+    return service
+
+
+def test_count():
+    adapter = IssuesAdapter(dict(big=25, small=3, round=20))
+    service = make_service(adapter)
+    assert 25 == service._count(dict(full_name='foo/big'), 'issues')
+    assert [('big', 1), ('big', 2), ('big', 3)] == adapter.requests
+    # once pages of 10 issues have been seen, a smaller page is known to be the last
+    del adapter.requests[:]
+    assert 3 == service._count(dict(full_name='foo/small'), 'issues')
+    assert [('small', 1)] == adapter.requests
+    assert 20 == service._count(dict(full_name='foo/round'), 'issues')
+
+
+def test_count__page_ignored():
+    adapter = IssuesAdapter(dict(repo=25), ignore_page=True)
+    service = make_service(adapter)
+    assert 10 == service._count(dict(full_name='foo/repo'), 'issues')
+    assert [('repo', 1), ('repo', 1)] == adapter.requests
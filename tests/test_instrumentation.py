@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+
+import json
+
+import pytest
+
+from git import Git
+
+from git_repo import instrumentation
+from git_repo.services.ext.github import GithubService
+
+from tests.forge import FakeForge, Namespace
+
+
+@pytest.fixture
+def stats():
+    stats = instrumentation.enable()
+    yield stats
+    instrumentation.report()
+
+
+def test_endpoint():
+    assert 'GET api.github.com/repos/{owner}/{repo}/pulls' == instrumentation.endpoint(
+        'GET', 'https://api.github.com/repos/guyzmo/git-repo/pulls?page=2')
+    assert 'GET api.github.com/users/{name}/repos' == instrumentation.endpoint(
+        'GET', 'https://api.github.com/users/guyzmo/repos')
+    assert 'GET gitlab.com/api/v4/projects/{id}/merge_requests/{id}' == instrumentation.endpoint(
+        'GET', 'https://gitlab.com/api/v4/projects/guyzmo%2Fgit-repo/merge_requests/12')
+
+
+def test_git_command():
+    assert 'git fetch' == instrumentation.git_command(['git', '-c', 'a.b=c', '--no-pager', 'fetch', 'origin'])
+    assert 'git' == instrumentation.git_command(['git', '--version'])
+
+
+def test_disabled():
+    assert instrumentation.collector is None
+    execute = Git.execute
+    with instrumentation.phase('connect'):
+        pass
+    instrumentation.report()
+    assert Git.execute is execute
+
+
+def test_http(stats):
+    with FakeForge('github', [Namespace('acme', repositories=150)], rate_limit=5000) as forge:
+        service = GithubService(c=forge.config())
+        with instrumentation.phase('connect'):
+            service.connect()
+        assert 150 == len(list(service.get_repository_slugs('acme')))
+    endpoints = {name: (count, size) for name, count, size, _ in stats.endpoints()}
+    assert 2 == endpoints['GET 127.0.0.1:{}/api/v3/users/{{name}}/repos'.format(forge.port)][0]
+    assert 0 < endpoints['GET 127.0.0.1:{}/api/v3/users/{{name}}/repos'.format(forge.port)][1]
+    assert {'127.0.0.1:{}'.format(forge.port): 5000 - len(stats.http)} == stats.rate_limit
+    assert 'connect' in stats.phases
+
+
+def test_git(stats):
+    Git().version()
+    assert ['git version'] == [command['command'] for command in stats.git]
+    assert 0 < stats.git[0]['time']
+
+
+def test_report(stats, tmpdir, capsys):
+    stats.summary = True
+    stats.trace_path = str(tmpdir.join('trace.json'))
+    Git().version()
+    execute = Git.execute
+    instrumentation.report()
+    assert instrumentation.collector is None
+    assert Git.execute is not execute
+    summary = capsys.readouterr()[1]
+    assert 'git version' in summary
+    assert summary.splitlines()[-1].startswith('Time: import ')
+    trace = json.load(tmpdir.join('trace.json').open())
+    assert ['import', 'action', 'total'] == list(trace['phases'])
+    assert 'git version' == trace['git'][0]['command']
+
+
+def test_profile__disabled(monkeypatch):
+    monkeypatch.delenv('GIT_REPO_PROFILE', raising=False)
+    monkeypatch.setattr(instrumentation, 'profilers', {})
+    assert 42 == instrumentation.profile(lambda answer: answer, 42)
+
+
+def test_profile__cprofile(monkeypatch, tmpdir):
+    import pstats
+    monkeypatch.setenv('GIT_REPO_PROFILE', str(tmpdir.join('git-repo.pstats')))
+    assert 42 == instrumentation.profile(lambda answer: answer, 42)
+    functions = pstats.Stats(str(tmpdir.join('git-repo.pstats'))).stats
+    assert any(name == '<lambda>' for _, _, name in functions)
+
+
+def test_profile__unknown(monkeypatch, tmpdir):
+    monkeypatch.setenv('GIT_REPO_PROFILE', str(tmpdir.join('profile')))
+    monkeypatch.setenv('GIT_REPO_PROFILER', 'nope')
+    with pytest.raises(ValueError):
+        instrumentation.profile(lambda: None)
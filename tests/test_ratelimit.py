@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+
+import time
+
+from requests import Session, Response
+from unittest.mock import Mock, patch
+
+from git_repo.services.ratelimit import RateLimiter
+
+
+def make_response(status=200, **headers):
+    response = Response()
+    response.status_code = status
+    response.headers.update(headers)
+    return response
+
+def test_rate_limiter__install_once():
+    session = Session()
+    limiter = RateLimiter()
+    limiter.install(session)
+    limiter.install(session)
+    assert session.hooks['response'] == [limiter.on_response]
+
+def test_rate_limiter__no_pause_with_budget():
+    limiter = RateLimiter()
+    with patch('time.sleep') as sleep:
+        limiter.on_response(make_response(**{
+            'X-RateLimit-Remaining': '4000',
+            'X-RateLimit-Reset': str(int(time.time()) + 3600)}))
+        assert not sleep.called
+    assert limiter.remaining == 4000
+
+def test_rate_limiter__pause_until_reset():
+    limiter = RateLimiter(threshold=5)
+    with patch('time.sleep') as sleep:
+        limiter.on_response(make_response(**{
+            'RateLimit-Remaining': '2',
+            'RateLimit-Reset': str(int(time.time()) + 30)}))
+        assert sleep.called
+        assert 25 < sleep.call_args[0][0] <= 30
+    assert limiter.remaining is None
+
+def test_rate_limiter__relative_reset():
+    limiter = RateLimiter()
+    limiter.update(make_response(**{'X-RateLimit-Remaining': '1', 'X-RateLimit-Reset': '60'}))
+    assert 55 < limiter.reset - time.time() <= 60
+
+def make_throttled(*responses):
+    response = make_response(429, **{'Retry-After': '3'})
+    response.request = object()
+    response.connection = Mock()
+    response.connection.send.side_effect = responses
+    for retried in responses:
+        retried.request = response.request
+        retried.connection = response.connection
+    return response
+
+def test_rate_limiter__retry_after():
+    limiter = RateLimiter()
+    response = make_throttled(make_response(429), make_response(200))
+    with patch('time.sleep') as sleep:
+        assert 200 == limiter.on_response(response, timeout=5).status_code
+    # Retry-After is honoured, then the delay backs off exponentially
+    assert [3, 2] == [call[0][0] for call in sleep.call_args_list]
+    assert response.connection.send.call_count == 2
+    response.connection.send.assert_called_with(response.request, timeout=5)
+
+def test_rate_limiter__max_retries():
+    limiter = RateLimiter(max_retries=2)
+    response = make_throttled(*(make_response(429) for _ in range(5)))
+    with patch('time.sleep') as sleep:
+        assert 429 == limiter.on_response(response).status_code
+    assert sleep.call_count == 2
+    assert response.connection.send.call_count == 2
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+
+import json
+
+import pytest
+
+from requests import Response, Session
+from requests.adapters import BaseAdapter
+
+from git_repo.exceptions import ResourceError
+from git_repo.services.service import RepositoryService
+
+
+class PageAdapter(BaseAdapter):
+    '''answers every request with the same page and headers'''
+    def __init__(self, page, headers=None):
+        super().__init__()
+        self.page = page
+        self.headers = headers or {}
+        self.requests = []
+
+    def send(self, request, **kwarg):
+        self.requests.append(request.url)
+        response = Response()
+        response.status_code = 200
+        response.url = request.url
+        response.request = request
+        response.headers.update(self.headers)
+        response._content = json.dumps(self.page).encode('utf-8')
+        return response
+
+    def close(self):
+        pass
+
+
+def count(page, headers=None, fallback=None):
+    session = Session()
+    adapter = PageAdapter(page, headers)
+    session.mount('https://', adapter)
+    total = RepositoryService.count_objects(session, 'https://forge/repos/foo/bar/commits',
+                                            params=dict(per_page=1), fallback=fallback)
+    assert ['https://forge/repos/foo/bar/commits?per_page=1'] == adapter.requests
+    return total
+
+
+def test_count_objects__total_header():
+    assert 42 == count([{}], {'X-Total': '42'})
+    assert 42 == count([{}], {'X-Total-Count': '42'})
+
+def test_count_objects__last_link():
+    assert 92 == count([{}], {'Link': '<https://forge/repos/foo/bar/commits?per_page=1&page=2>; rel="next", '
+                                      '<https://forge/repos/foo/bar/commits?per_page=1&page=92>; rel="last"'})
+
+def test_count_objects__size():
+    assert 7 == count(dict(pagelen=1, size=7, values=[{}]))
+    assert 0 == count(dict(pagelen=1, size=0, values=[]))
+
+def test_count_objects__single_page():
+    assert 1 == count([{}])
+    assert 0 == count([])
+
+def test_count_objects__fallback():
+    # neither a total nor a last page, a next page only
+    headers = {'Link': '<https://forge/repos/foo/bar/commits?per_page=1&page=2>; rel="next"'}
+    assert 12 == count([{}], headers, fallback=lambda: 12)
+    with pytest.raises(ResourceError):
+        count([{}], headers)
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import json
+import subprocess
+
+import pytest
+
+# the subprocesses import the package from the sources, whatever the working directory
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+backends = ('github3', 'gitlab', 'pybitbucket', 'gogs_client', 'gerritclient')
+
+def loaded_backends(code):
+    code += '\nimport sys, json\nprint(json.dumps(sorted(m for m in {} if m in sys.modules)))'.format(backends)
+    return json.loads(subprocess.check_output([sys.executable, '-c', code], cwd=root).decode('utf-8'))
+
+def test_startup__no_backend_loaded():
+    assert loaded_backends('import git_repo.repo') == []
+
+def test_startup__only_requested_backend_loaded():
+    assert loaded_backends('''
+from git_repo.repo import RepositoryService
+assert RepositoryService.service_map['gitlab'].command == 'lab'
+''') == ['gitlab']
+
+def test_startup__services_registered():
+    assert loaded_backends('''
+from git_repo.repo import RepositoryService
+assert RepositoryService.command_map['hub'] == 'github'
+assert 'gogs' in RepositoryService.service_map
+assert len(RepositoryService.service_map) == 6
+''') == []
+
+def test_startup__import_time_budget():
+    # import time of the command line module, without looking up its version
+    budget = 1.0
+    elapsed, pkg_resources_loaded = json.loads(subprocess.check_output([sys.executable, '-c', '''
+import sys, json, time
+start = time.perf_counter()
+import git_repo.repo
+print(json.dumps([time.perf_counter() - start, 'pkg_resources' in sys.modules]))
+'''], cwd=root).decode('utf-8'))
+    assert not pkg_resources_loaded
+    assert elapsed < budget
+
+def test_startup__version():
+    from git_repo.repo import get_version
+    assert get_version()
+
+def test_cli__version_only_for_help(monkeypatch, capsys):
+    from git_repo import repo
+    def no_version():
+        raise AssertionError('the version is only needed by the help')
+    monkeypatch.setattr(repo, 'get_version', no_version)
+    monkeypatch.setattr(repo, 'main', lambda args: 0)
+    monkeypatch.setattr(sys, 'argv', ['git-repo', 'hub', 'ls', 'guyzmo'])
+    with pytest.raises(SystemExit) as exit:
+        repo.cli()
+    assert 0 == exit.value.code
+    monkeypatch.setattr(repo, 'get_version', lambda: '4.2')
+    monkeypatch.setattr(sys, 'argv', ['git-repo', '--help'])
+    with pytest.raises(SystemExit) as exit:
+        repo.cli()
+    assert 0 == exit.value.code
+    assert 'git-repo version 4.2, Copyright' in capsys.readouterr()[0]
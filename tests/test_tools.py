@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+
+import os
+import time
+
+from unittest.mock import patch
+
+from datetime import datetime
+
+from git_repo.tools import parallel_map, error_message, print_iter, columnize, format_value, text_width
+
+
+def test_parallel_map__keeps_order():
+    def slow_square(x):
+        time.sleep(0.01 * (5 - x % 5))
+        return x * x
+    assert list(parallel_map(slow_square, range(20), jobs=4)) == [x * x for x in range(20)]
+
+def test_parallel_map__single_job():
+    assert list(parallel_map(str, range(3), jobs=1)) == ['0', '1', '2']
+
+def test_parallel_map__lazy_input():
+    consumed = []
+    def source():
+        for x in range(100):
+            consumed.append(x)
+            yield x
+    results = parallel_map(lambda x: x, source(), jobs=2)
+    assert next(results) == 0
+    # only a bounded window of the input is scheduled ahead of the consumer
+    assert len(consumed) < 10
+    results.close()
+
+def test_error_message():
+    from git.exc import GitCommandError
+    err = GitCommandError(['git', 'push', 'all'], 128, b"fatal: 'all' does not appear to be a git repository\nfatal: Could not read from remote repository.")
+    assert "'all' does not appear to be a git repository" == error_message(err)
+    assert 'bad repository!' == error_message(Exception('bad repository!'))
+
+def listing(consumed=None):
+    yield '{}\t{}'
+    yield ('Name', 'Count')
+    for x in range(3):
+        if consumed is not None:
+            consumed.append(x)
+        yield ('repo{}'.format(x), x)
+    return 'Total: 3'
+
+def test_print_iter__text(capsys):
+    print_iter(listing())
+    out, _ = capsys.readouterr()
+    # header and footer are only shown on terminals
+    assert 'repo0\t0\nrepo1\t1\nrepo2\t2\n' == out
+
+def test_print_iter__tsv(capsys):
+    print_iter(listing(), 'tsv')
+    out, _ = capsys.readouterr()
+    assert 'name\tcount\nrepo0\t0\nrepo1\t1\nrepo2\t2\n' == out
+
+def test_print_iter__jsonl(capsys):
+    print_iter(listing(), 'jsonl')
+    out, _ = capsys.readouterr()
+    assert '{"name": "repo0", "count": 0}\n' == out.splitlines(True)[0]
+    assert 3 == len(out.splitlines())
+
+def test_print_iter__json(capsys):
+    import json
+    print_iter(listing(), 'json')
+    out, _ = capsys.readouterr()
+    assert [{'name': 'repo{}'.format(x), 'count': x} for x in range(3)] == json.loads(out)
+
+def test_print_iter__json_empty(capsys):
+    import json
+    def empty():
+        yield '{}'
+        yield ('Name',)
+        return
+        yield
+    print_iter(empty(), 'json')
+    out, _ = capsys.readouterr()
+    assert [] == json.loads(out)
+
+def typed_listing():
+    yield '{}\t{}\t{}'
+    yield ('Name', 'Forks', 'Last push')
+    yield ('repo', None, datetime(2015, 3, 14, 9, 26))
+
+def test_print_iter__typed_text(capsys):
+    print_iter(typed_listing())
+    out, _ = capsys.readouterr()
+    assert 'repo\tN.A.\tMar 14 2015\n' == out
+
+def test_print_iter__typed_tsv(capsys):
+    print_iter(typed_listing(), 'tsv')
+    out, _ = capsys.readouterr()
+    assert 'name\tforks\tlast push\nrepo\t\t2015-03-14T09:26:00\n' == out
+
+def test_print_iter__typed_jsonl(capsys):
+    print_iter(typed_listing(), 'jsonl')
+    out, _ = capsys.readouterr()
+    assert '{"name": "repo", "forks": null, "last push": "2015-03-14T09:26:00"}\n' == out
+
+def test_format_value():
+    assert 'N.A.' == format_value(None)
+    assert 42 == format_value(42)
+    assert 'Mar 14 2015' == format_value(datetime(2015, 3, 14, 9, 26))
+    now = datetime.now().replace(month=1, day=2, hour=3, minute=4)
+    assert 'Jan 02 03:04' == format_value(now)
+
+def test_print_iter__columns(capsys):
+    def names():
+        yield columnize
+        yield ('Name',)
+        yield from (('repo{}'.format(x),) for x in range(3))
+    print_iter(names())
+    out, _ = capsys.readouterr()
+    assert 'repo0  repo1  repo2\n' == out
+
+def test_columnize__streaming():
+    consumed = []
+    def names():
+        for x in range(1000):
+            consumed.append(x)
+            yield 'repo{:03}'.format(x)
+    lines = columnize(names(), window=50)
+    assert next(lines).startswith('repo000  repo001')
+    # rows are laid out before all the items are known
+    assert len(consumed) <= 50
+    lines = list(lines)
+    assert lines[-1].rstrip().endswith('repo999')
+
+def test_columnize__widens():
+    with patch('shutil.get_terminal_size', return_value=os.terminal_size((80, 20))):
+        lines = list(columnize(['a']*40 + ['b'*30]*4, window=40))
+    assert ['a']*27 == lines[0].split()
+    assert ['a']*2 == lines[1].split()
+    assert ['b'*30]*2 == lines[-2].split()
+
+def test_text_width():
+    assert 4 == text_width('repo')
+    assert 6 == text_width('仓库ab')
+    assert 4 == text_width('ｒｅ')
+    assert 4 == text_width('répo')
+
+def test_columnize__wide_characters():
+    with patch('shutil.get_terminal_size', return_value=os.terminal_size((20, 20))):
+        lines = list(columnize(['仓库', 'repo', '项目仓库', 'x']))
+    # columns are aligned on the cells taken on the terminal, not on the characters
+    assert ['仓库      repo    ', '项目仓库  x       '] == lines
+    assert {18} == {text_width(line) for line in lines}
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+
+import threading
+import socketserver
+
+from http.server import BaseHTTPRequestHandler
+
+import pytest
+
+from requests import Session
+from requests.adapters import BaseAdapter, HTTPAdapter
+
+from git_repo.services.service import RepositoryService
+from git_repo.services.transport import Transport, register_transport, transports
+from git_repo.tools import parallel_map
+
+
+class ForgeService(RepositoryService):
+    name = 'forge'
+    fqdn = 'forge.example.org'
+
+
+def make_service(**config):
+    config['__name__'] = 'gitrepo "forge"'
+    return ForgeService(c=config, hc=[{'__name__': 'https', 'proxy': 'http://proxy.example.org:3128'}])
+
+
+def test_transport__sizes_pools():
+    session = Transport(pool_size=32).install(Session())
+    for prefix in ('http://', 'https://'):
+        assert type(session.adapters[prefix]) is HTTPAdapter
+        assert 32 == session.adapters[prefix]._pool_maxsize
+
+def test_transport__keeps_default_pools():
+    session = Session()
+    adapter = session.adapters['https://']
+    Transport(pool_size=4).install(session)
+    assert adapter is session.adapters['https://']
+
+def test_transport__keeps_other_adapters():
+    session = Session()
+    recorder = BaseAdapter()
+    session.mount('https://', recorder)
+    Transport(pool_size=32).install(session)
+    assert recorder is session.adapters['https://']
+    assert 32 == session.adapters['http://']._pool_maxsize
+
+def test_transport__unknown():
+    with pytest.raises(ValueError):
+        Transport('carrier-pigeon')
+
+def test_transport__registered():
+    class PigeonAdapter(BaseAdapter):
+        pass
+    register_transport('pigeon')(lambda pool_size: PigeonAdapter())
+    try:
+        session = Transport('pigeon').install(Session())
+        assert isinstance(session.adapters['https://'], PigeonAdapter)
+    finally:
+        del transports['pigeon']
+
+def test_configure_session():
+    service = make_service(insecure='true', jobs='32')
+    session = service.configure_session(Session())
+    assert session.verify is False
+    assert 'http://proxy.example.org:3128' == session.proxies['https']
+    assert 32 == session.adapters['https://']._pool_maxsize
+
+def test_configure_session__certificate():
+    service = make_service(**{'server-cert': '/etc/ssl/forge.pem'})
+    assert '/etc/ssl/forge.pem' == service.configure_session(Session()).verify
+
+def test_configure_session__pool_size():
+    RepositoryService.pool_size = 24
+    try:
+        session = make_service().configure_session(Session())
+    finally:
+        RepositoryService.pool_size = None
+    assert 24 == session.adapters['https://']._pool_maxsize
+
+
+class CountingServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+    connections = 0
+
+class KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        super().setup()
+        self.server.connections += 1
+
+    def do_GET(self):
+        body = b'{}'
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+def test_configure_session__reuses_connections():
+    server = CountingServer(('127.0.0.1', 0), KeepAliveHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        url = 'http://127.0.0.1:{}/repos'.format(server.server_address[1])
+        session = make_service(jobs='16').configure_session(Session())
+        session.proxies.clear()
+        statuses = list(parallel_map(lambda _: session.get(url).status_code, range(200), 16))
+    finally:
+        server.shutdown()
+        server.server_close()
+    assert [200]*200 == statuses
+    # one connection per parallel request at most, not one per request
+    assert server.connections <= 16
+
+def test_http2_transport__reuses_connections():
+    pytest.importorskip('h2')
+    pytest.importorskip('httpx')
+    server = CountingServer(('127.0.0.1', 0), KeepAliveHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        url = 'http://127.0.0.1:{}/repos'.format(server.server_address[1])
+        session = make_service(jobs='16', transport='http2').configure_session(Session())
+        session.proxies.clear()
+        responses = list(parallel_map(lambda _: session.get(url), range(200), 16))
+        session.close()
+    finally:
+        server.shutdown()
+        server.server_close()
+    assert [{}]*200 == [response.json() for response in responses]
+    # a plain HTTP server is talked to with HTTP/1.1, within the pools sized for the jobs
+    assert server.connections <= 16
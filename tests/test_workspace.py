@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+
+import os
+
+from tempfile import TemporaryDirectory
+
+from git import Repo
+
+from git_repo.workspace import find_repositories, get_url_host, get_managed_remotes, sync_repository, HostLimiter
+
+
+def commit(repository, name):
+    path = os.path.join(repository.working_tree_dir, name)
+    with open(path, 'w') as f:
+        f.write(name)
+    repository.index.add([path])
+    repository.index.commit(name)
+
+def make_workspace(path):
+    '''creates a repository on a fake service, and a checkout of it tracking the service'''
+    service = Repo.init(os.path.join(path, 'service'))
+    commit(service, 'README')
+    checkout = Repo.init(os.path.join(path, 'workspace', 'project'))
+    remote = checkout.create_remote('github', service.working_tree_dir)
+    remote.fetch()
+    checkout.create_head('master', remote.refs.master).set_tracking_branch(remote.refs.master)
+    checkout.heads.master.checkout()
+    return service, checkout
+
+def test_get_url_host():
+    assert 'github.com' == get_url_host('https://github.com/guyzmo/git-repo')
+    assert 'github.com' == get_url_host('git@github.com:guyzmo/git-repo')
+    assert 'example.org' == get_url_host('ssh://git@example.org:2222/guyzmo/git-repo')
+    assert None is get_url_host('/srv/git/git-repo')
+
+def test_host_limiter():
+    limiter = HostLimiter(2)
+    assert limiter('github.com') is limiter('github.com')
+    assert limiter('github.com') is not limiter('gitlab.com')
+
+def test_find_repositories():
+    with TemporaryDirectory() as path:
+        Repo.init(os.path.join(path, 'a'))
+        Repo.init(os.path.join(path, 'b', 'c'))
+        os.makedirs(os.path.join(path, 'a', 'd', '.git'))
+        os.makedirs(os.path.join(path, 'e'))
+        assert [os.path.join(path, 'a'), os.path.join(path, 'b', 'c')] == list(find_repositories(path))
+
+def test_get_managed_remotes():
+    with TemporaryDirectory() as path:
+        repository = Repo.init(path)
+        repository.create_remote('github', 'git@github.com:guyzmo/git-repo')
+        repository.create_remote('mirror', 'git@example.org:guyzmo/git-repo')
+        repository.create_remote('origin', 'git@example.com:guyzmo/git-repo')
+        repository.create_remote('all', 'git@github.com:guyzmo/git-repo')
+        repository.git.remote('set-url', '--add', 'all', 'git@example.org:guyzmo/git-repo')
+        assert ['github', 'mirror'] == sorted(remote.name for remote in get_managed_remotes(repository))
+
+def test_sync_repository__behind():
+    with TemporaryDirectory() as path:
+        service, checkout = make_workspace(path)
+        assert ('up to date', 0, 0, 'master', None) == sync_repository(checkout.working_tree_dir, HostLimiter(1))
+        commit(service, 'CHANGES')
+        assert ('behind', 0, 1, 'master', None) == sync_repository(checkout.working_tree_dir, HostLimiter(1))
+        assert ('updated', 0, 0, 'master', None) == sync_repository(checkout.working_tree_dir, HostLimiter(1), pull=True)
+        assert checkout.head.commit == service.head.commit
+
+def test_sync_repository__diverged():
+    with TemporaryDirectory() as path:
+        service, checkout = make_workspace(path)
+        commit(service, 'CHANGES')
+        commit(checkout, 'TODO')
+        assert ('diverged', 1, 1, 'master', None) == sync_repository(checkout.working_tree_dir, HostLimiter(1), pull=True)
+
+def test_sync_repository__failed_fetch():
+    with TemporaryDirectory() as path:
+        service, checkout = make_workspace(path)
+        checkout.create_remote('upstream', os.path.join(path, 'missing'))
+        status, *_, error = sync_repository(checkout.working_tree_dir, HostLimiter(1))
+        assert 'failed' == status
+        assert error.startswith('upstream: ')